@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import asyncio
+import heapq
 import traceback
 from asyncio import Lock
+from collections import deque
+from copy import copy
 from datetime import datetime, timedelta
+from time import time
 from typing import Optional, Union, Any
 
 import disnake
 
 from character.player import PlayerRoster, Player
 from utils.CommandUtils import add_temp_item, destroy_crafted_item, add_market_points_for_sale
-from utils.Database import AllRings, AuctionDao, Crafted
+from tortoise.transactions import in_transaction
+
+from utils.Database import AllRings, AuctionBidLedgerDao, AuctionDao, Crafted
 from utils.DatabaseUtils import compute_market_userinfo
 from utils.EconomyUtils import add_tax_amount
 from utils.Embeds import BasicEmbeds
@@ -17,8 +24,11 @@ from utils.InventoryUtils import add_to_inventory, check_inv_weight, combine_id,
 from utils.LoggingUtils import log_event
 from utils.Styles import COLOR_LIGHT_GREEN
 from utils.base import PrerequisiteNotMetException, PlayerInputException, singleton, BaseStarfallPersistentView
+from utils.refresher import MessageRefresher
+from utils.scheduler import Scheduler
 from world.continent import Continent
 from world.compendium import ItemCompendium, ItemDefinition
+from world.leaderboard import Leaderboards
 
 MINIMUM_BID = 100_000_000
 MINIMUM_INCREMENT = 10_000_000
@@ -27,12 +37,27 @@ MAXIMUM_DURATION = 72
 DEFAULT_DURATION = 24
 
 COUNTDOWN_DURATION: timedelta = timedelta(hours=1)  # the auction will terminate once this delay pass without any new bid once the main phase ends
-EXPECTED_LOOP_DELAY_SECONDS: int = 50
 
 _CLAIM_BUTTON_LABEL = "Retrieve Item"
 _MAXIMUM_RING_CONTENT_ITEM_DISPLAY = 20
 _MAXIMUM_TIME_TO_CLAIM = timedelta(days=3)
 _SHORT_NAME: str = "auction"
+_JOB_TRANSITIONS: str = "auction.transitions"
+_TRANSITION_RETRY_DELAY: float = 60.0  # Seconds before retrying a transition that failed
+
+_MAXIMUM_BID_BATCH_SIZE: int = 100
+
+BID_OUTCOME_FIRST: str = "first"  # The first bid of the auction
+BID_OUTCOME_OUTBID: str = "outbid"  # The bidder took the lead from the previous winner
+BID_OUTCOME_DEFENDED: str = "defended"  # The previous winner kept the lead thanks to their maximum bid
+BID_OUTCOME_MAX_UPDATE: str = "max_update"  # The winner raised or lowered their maximum bid
+BID_OUTCOME_UNCHANGED: str = "unchanged"  # The winner bid again without changing anything
+BID_OUTCOME_REJECTED: str = "rejected"
+BID_OUTCOME_ERROR: str = "error"
+
+_DISPLAYED_BID_OUTCOMES: frozenset[str] = frozenset({BID_OUTCOME_FIRST, BID_OUTCOME_OUTBID, BID_OUTCOME_DEFENDED})
+_PERSISTED_BID_OUTCOMES: frozenset[str] = frozenset({BID_OUTCOME_FIRST, BID_OUTCOME_OUTBID, BID_OUTCOME_DEFENDED, BID_OUTCOME_MAX_UPDATE, BID_OUTCOME_ERROR})
+_LEDGER_FIELDS: tuple[str, ...] = ("bidder_id", "amount", "maximum_amount", "outcome", "winner_id", "winning_amount", "winning_maximum_amount", "winning_reserved_amount", "winning_tax_rate", "created_at")
 
 
 class InvalidBidException(PlayerInputException):
@@ -73,14 +98,14 @@ class Bid:
 
         return self
 
-    async def update_current_amount(self, new_current_amount) -> Bid:
+    def update_current_amount(self, new_current_amount) -> Bid:
+        # Only updates the memory, the auction persists its winning bid once the whole bid batch is resolved
         if new_current_amount > self.maximum_amount:
             raise InvalidBidException(f"You cannot bid over your maximum bid of {self.maximum_amount:,}")
 
         elif new_current_amount != self.current_amount:
             self.current_amount = new_current_amount
             self.bid_time = datetime.now()
-            await AuctionDao.filter(id=self.auction_id).update(winning_current_amount=new_current_amount, winning_bid_time=datetime.utcfromtimestamp(self.bid_time.timestamp()))
 
         return self
 
@@ -92,8 +117,8 @@ class Bid:
             old_maximum_amount = self.maximum_amount
             old_reserved_amount = self.reserved_amount
             old_tax_amount = old_reserved_amount - old_maximum_amount
-            new_tax_amount = round(new_maximum_amount * self.tax_rate / 100)
-            new_reserved_amount = new_maximum_amount + new_tax_amount
+            new_reserved_amount = compute_reserved_amount(new_maximum_amount, self.tax_rate)
+            new_tax_amount = new_reserved_amount - new_maximum_amount
 
             if new_maximum_amount > old_maximum_amount:
                 await _reserve_funds(self.bidder_id, new_maximum_amount - old_maximum_amount, new_tax_amount - old_tax_amount,
@@ -105,13 +130,55 @@ class Bid:
                 async with player:
                     player.add_funds(old_reserved_amount - new_reserved_amount)
 
+            # Only the funds are committed right away, the auction persists its winning bid once the whole bid batch is resolved
             self.maximum_amount = new_maximum_amount
             self.reserved_amount = new_reserved_amount
-            await AuctionDao.filter(id=self.auction_id).update(winning_maximum_amount=new_maximum_amount, winning_reserved_amount=self.reserved_amount)
 
         return self
 
 
+class BidRequest:
+    def __init__(self, bidder_id: int, amount: int, max_amount: int):
+        self.bidder_id: int = bidder_id
+        self.amount: int = amount
+        self.max_amount: int = max_amount
+        self.received_time: datetime = datetime.now()
+        self.outcome: Optional[str] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def __repr__(self):
+        return f"BidRequest {{bidder_id: {self.bidder_id}, amount: {self.amount:,}, max_amount: {self.max_amount:,}, outcome: {self.outcome}}}"
+
+    def __str__(self):
+        return self.__repr__()
+
+    def reject(self, error: Exception):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+    def resolve(self, changed: bool, message: str):
+        if not self.future.done():
+            self.future.set_result((changed, message))
+
+
+class AuctionReplay:
+    def __init__(self, auction_id: int, bid_count: int, winning_bid: Optional[Bid], divergences: list[str]):
+        self.auction_id: int = auction_id
+        self.bid_count: int = bid_count
+        self.winning_bid: Optional[Bid] = winning_bid
+        self.divergences: list[str] = divergences
+
+    def __repr__(self):
+        return f"AuctionReplay {{auction_id: {self.auction_id}, bids: {self.bid_count}, winning_bid: {self.winning_bid}, divergences: {len(self.divergences)}}}"
+
+    def __str__(self):
+        return self.__repr__()
+
+    @property
+    def consistent(self) -> bool:
+        return len(self.divergences) == 0
+
+
 class AuctionedItem:
     def __init__(self, auction_id: Optional[int], msg_id: Optional[int], author_id: int, system_auction: bool, item_id: str, quantity: int, minimum_bid: int, minimum_increment: int,
                  start_time: datetime, duration: int, remaining_lifespan: Optional[timedelta] = None, countdown_start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
@@ -132,6 +199,7 @@ class AuctionedItem:
         self._item_retrieved: bool = item_retrieved
         self.winning_bid: Optional[Bid] = winning_bid
         self.lock: Lock = Lock()
+        self._escrow_shortfalls: dict[int, int] = {}  # bidder_id -> part of their reserve that couldn't be taken back when rolling back a failed batch
 
     # ============================================= Special methods =============================================
 
@@ -184,6 +252,18 @@ class AuctionedItem:
     def end_time(self) -> Optional[datetime]:
         return self._end_time
 
+    @property
+    def escrow_shortfalls(self) -> dict[int, int]:
+        return dict(self._escrow_shortfalls)
+
+    @property
+    def held_reserve(self) -> int:
+        # Part of the winning bid reserve the auction house actually holds
+        if self.winning_bid is None or not self.winning_bid.bidder_id:
+            return 0
+
+        return self.winning_bid.reserved_amount - self._escrow_shortfalls.get(self.winning_bid.bidder_id, 0)
+
     @property
     def expected_end_time(self) -> datetime:
         expected_countdown_start_time: float = self.expected_countdown_start_time.timestamp()
@@ -211,6 +291,14 @@ class AuctionedItem:
         else:
             return datetime.now().timestamp() > (self._end_time + _MAXIMUM_TIME_TO_CLAIM).timestamp()
 
+    @property
+    def expiry_time(self) -> Optional[datetime]:
+        if not self.ended:
+            return None
+
+        claim_limit: datetime = self._end_time + _MAXIMUM_TIME_TO_CLAIM
+        return claim_limit if self._remaining_lifespan is None else min(claim_limit, self._end_time + self._remaining_lifespan)
+
     @property
     def id(self) -> Optional[int]:
         return self._id
@@ -236,6 +324,18 @@ class AuctionedItem:
     def minimum_increment(self) -> int:
         return self._minimum_increment
 
+    @property
+    def next_transition_time(self) -> datetime:
+        # The moment check_state will have something to do
+        if not self.countdown_started:
+            return self.expected_countdown_start_time
+        elif not self.ended:
+            return self.expected_end_time
+        elif self.completed:
+            return self._end_time
+        else:
+            return self.expiry_time
+
     @property
     def quantity(self) -> int:
         return self._quantity
@@ -259,94 +359,12 @@ class AuctionedItem:
 
     # ============================================== "Real" methods =============================================
 
-    async def bid(self, bidder_id: int, amount: int, max_amount: int = 0) -> (bool, str):
-        # Input validation
-        if amount <= 0:
-            raise InvalidBidException("You're supposed to bid something")
-
-        # Auto-adjust max bid in case of inconsistent or default valued max bid
-        max_amount = max_amount if max_amount >= amount else amount
-
-        # Thread lock to handle concurrent bid issues
-        async with self.lock:
-            biddable, txt = self.is_biddable_by(bidder_id)
-            if not biddable:
-                raise InvalidBidException(txt)
-
-            elif not self.winning_bid or not self.winning_bid.bidder_id:
-                # First bid, just make sure it's sufficient for the auctioned item parameters
-                return True, await self._handle_first_bid(bidder_id, amount, max_amount)
-
-            elif bidder_id == self.winning_bid.bidder_id:
-                # Winner is bidding again, allow only max bid update
-                return False, await self._handle_max_bid_update(bidder_id, amount, max_amount)
-
-            else:
-                # There's an existing winning bid, then the new bid has to be higher the current bid by at least the minimum increment else just reject the bid and do nothing
-                minimum_new_bid = self.winning_bid.current_amount + self._minimum_increment
-                if amount < minimum_new_bid:
-                    # The bid is insufficient, but maybe the max_bid is enough
-                    if max_amount >= minimum_new_bid:
-                        amount = minimum_new_bid
-                    else:
-                        # Nope, either the player is dumb, or someone else bid while he was placing his bid
-                        raise InvalidBidException(f"Your bid must respect the `{self._minimum_increment:,}` gold minimum increment, so the bid should be at least is `{minimum_new_bid:,}`")
-
-                # Generate a new bid with proper fund reservation, including buy tax
-                new_bid: Bid = await self._instantiate_bid(bidder_id, amount, max_amount)
-
-                # If we're here, then the bid is valid, but can still trigger a bidding battle with the currently winning bidder
-                winner_id, winning_amount = self._handle_bidding_battle((self.winning_bid.bidder_id, self.winning_bid.maximum_amount), (bidder_id, max_amount), amount)
-                if winner_id == bidder_id:
-                    # The new bidder won the bidding battle
-
-                    old_winning_bid = self.winning_bid
-
-                    new_bid.current_amount = winning_amount
-                    self.winning_bid = await new_bid.persist()
-
-                    # Reimburse the reserved funds to the incumbent
-                    player: Player = PlayerRoster().get(old_winning_bid.bidder_id)
-                    async with player:
-                        player.add_funds(old_winning_bid.reserved_amount)
-
-                    incumbent_notif = BasicEmbeds.wrong_cross(f"You have been outbid on `{self._quantity}x {self._item_id}`. The new winning bid is `{winning_amount:,}` gold."
-                                                              f"\n\nYour `{old_winning_bid.reserved_amount:,}` gold were sent back to your account.")
-                    await Continent().whisper(old_winning_bid.bidder_id, incumbent_notif)
-
-                    # Notify the bidder that his bid was accepted
-                    if winning_amount == amount:
-                        return True, self._compose_bid_accepted_msg(self.winning_bid)
-                    else:
-                        return (True, f"Your bid of `{amount:,}` gold for item {self._item_id} was immediately challenged resulting in an intense bidding war."
-                                      f"\n\nYou had to raise your bid to `{winning_amount:,}` to finally get ahead of your adversary."
-                                      f"\n\nYour bid may be automatically increased up to `{max_amount:,}` if other players attempt to outbid you."
-                                      f"\n\n{self._compose_bid_reserve_msg(self.winning_bid)}")
-
-                else:
-                    # The incumbent bidder won the battle:
-
-                    # Reimburse the reserved funds to the bidder
-                    player: Player = PlayerRoster().get(bidder_id)
-                    async with player:
-                        player.add_funds(new_bid.reserved_amount)
-
-                    # Update the current amount
-                    await self.winning_bid.update_current_amount(winning_amount)
-
-                    incumbent_notif = BasicEmbeds.exclamation(f"Your bid on `{self._quantity}x {self._item_id}` was automatically increased to `{winning_amount:,}` gold following a bidding contest with another participant.")
-                    await Continent().whisper(self.winning_bid.bidder_id, incumbent_notif)
-
-                    # Notify the bidder that his bid is insufficient given there was a new bid at winning_bid and that the new minimum bid is winning_amount + self.minimum_increment
-                    return (True, f"Your `{amount:,}` gold bid for item {self.item_id} was immediately challenged resulting in a failed bidding war."
-                                  f"\n\nYour adversary bid all the way to `{winning_amount:,}`, forcing you to bow down. All is not lost however, you still have time to place higher bid if you wish.")
-
     async def check_state(self) -> (bool, bool):
         state_changed = False
         now: float = datetime.now().timestamp()
         if not self.countdown_started:
-            # Currently in the main phase, checking for its end with a 1/2 loop time shift to maximize chance to shift phase around the right time
-            if now >= (self.expected_countdown_start_time - timedelta(seconds=EXPECTED_LOOP_DELAY_SECONDS / 2)).timestamp():
+            # Currently in the main phase, checking for its end
+            if now >= self.expected_countdown_start_time.timestamp():
                 # The main phase has ended, entering final phase
                 _log("system", f"Starting countdown for auction {self.id}")
                 await self._start_countdown()
@@ -439,7 +457,7 @@ class AuctionedItem:
             await add_tax_amount(winner_id, buyer_tax_amount)
 
             # unfreeze the leftover reserved funds of the winning bidder
-            leftover_funds = self.winning_bid.reserved_amount - buyer_total_price
+            leftover_funds = self.winning_bid.reserved_amount - buyer_total_price - self._escrow_shortfalls.pop(winner_id, 0)
             if leftover_funds > 0:
                 player: Player = PlayerRoster().get(winner_id)
                 async with player:
@@ -502,6 +520,167 @@ class AuctionedItem:
     def is_winner(self, user_id: int) -> bool:
         return self.winning_bid is not None and self.winning_bid.bidder_id == user_id
 
+    async def process_bids(self, requests: list[BidRequest]) -> bool:
+        """
+        Resolve a batch of bids in their arrival order, then persist the resulting winning bid along with one ledger entry per bid in a single transaction.
+        Every request is resolved or rejected once the batch is persisted, and the outbid players are notified once per batch. If the transaction fails,
+        the winning bid and the reserved funds are rolled back to their state before the batch.
+
+        :param requests: the bids to resolve, all for this auction
+
+        :return: True if the auction display changed
+        """
+        changed: bool = False
+        persist_winning_bid: bool = False
+        entries: list[AuctionBidLedgerDao] = []
+        results: list[Union[tuple[bool, str], Exception]] = []
+        notifications: dict[int, tuple[bool, disnake.Embed]] = {}  # player_id -> (outbid, notification), only the latest one is sent
+
+        async with self.lock:
+            # Bids mutate the winning bid in place, keep a copy to roll back to
+            previous_bid: Optional[Bid] = copy(self.winning_bid) if self.winning_bid is not None else None
+            for request in requests:
+                try:
+                    request.outcome, message = await self._apply_bid(request, notifications)
+                    results.append((request.outcome in _DISPLAYED_BID_OUTCOMES, message))
+
+                except (InvalidBidException, InsufficientFundException, UnknownItemException) as err:
+                    request.outcome = BID_OUTCOME_REJECTED
+                    results.append(err)
+
+                except Exception as err:
+                    traceback.print_exc()
+                    request.outcome = BID_OUTCOME_ERROR
+                    results.append(err)
+
+                changed = changed or request.outcome in _DISPLAYED_BID_OUTCOMES
+                persist_winning_bid = persist_winning_bid or request.outcome in _PERSISTED_BID_OUTCOMES
+                entries.append(self._ledger_entry(request))
+
+            try:
+                async with in_transaction():
+                    if persist_winning_bid and self.winning_bid is not None:
+                        await self.winning_bid.persist()
+
+                    await AuctionBidLedgerDao.bulk_create(entries)
+
+            except Exception as err:
+                # Nothing of the batch was recorded, so give the reserved funds back and tell the players the bids didn't go through
+                _log("system", f"Failed to persist a batch of {len(requests)} bids on auction {self._id}, rolling it back: {err!r}", "ERROR")
+                await self._rollback_bids(previous_bid)
+                for request in requests:
+                    request.reject(err)
+
+                raise
+
+        for request, result in zip(requests, results):
+            if isinstance(result, Exception):
+                request.reject(result)
+            else:
+                request.resolve(*result)
+
+        continent: Continent = Continent()
+        for player_id, (outbid, notification) in notifications.items():
+            # Don't tell a player they were outbid if they took the lead back later in the same batch
+            if not outbid or not self.is_winner(player_id):
+                await continent.whisper(player_id, notification)
+
+        return changed
+
+    async def _rollback_bids(self, previous_bid: Optional[Bid]):
+        # Within a batch, only the reserve of the winning bid stays taken: undo the new winner's reserve and take the previous winner's back
+        fund_deltas: dict[int, int] = {}
+        if self.winning_bid is not None and self.winning_bid.bidder_id:
+            fund_deltas[self.winning_bid.bidder_id] = self.winning_bid.reserved_amount
+
+        if previous_bid is not None and previous_bid.bidder_id:
+            fund_deltas[previous_bid.bidder_id] = fund_deltas.get(previous_bid.bidder_id, 0) - previous_bid.reserved_amount
+
+        self.winning_bid = previous_bid
+        for player_id, delta in fund_deltas.items():
+            if delta == 0:
+                continue
+
+            player: Player = PlayerRoster().get(player_id)
+            reclaimed: bool = True
+            async with player:
+                if delta > 0:
+                    player.add_funds(delta)
+                else:
+                    reclaimed = player.remove_funds(-delta)
+
+            if not reclaimed:
+                # The previous winner already spent the refund of the failed batch, their restored bid isn't fully covered anymore
+                self._escrow_shortfalls[player_id] = self._escrow_shortfalls.get(player_id, 0) - delta
+                _log(player_id, f"Could not take back {-delta:,} gold of reserved funds on auction {self._id} while rolling back a failed bid batch, "
+                                f"the winning bid is now short of {self._escrow_shortfalls[player_id]:,} gold", "ERROR")
+                continue
+
+            _log(player_id, f"Rolled back {delta:+,} gold of reserved funds on auction {self._id}")
+
+    async def _apply_bid(self, request: BidRequest, notifications: dict[int, tuple[bool, disnake.Embed]]) -> tuple[str, str]:
+        bidder_id: int = request.bidder_id
+        biddable, txt = self.is_biddable_by(bidder_id)
+        if not biddable:
+            raise InvalidBidException(txt)
+
+        winner: Optional[tuple[int, int, int]] = None
+        if self.winning_bid and self.winning_bid.bidder_id:
+            winner = (self.winning_bid.bidder_id, self.winning_bid.current_amount, self.winning_bid.maximum_amount)
+
+        outcome, amount, winning_amount = resolve_bid(winner, bidder_id, request.amount, request.max_amount, self._minimum_bid, self._minimum_increment)
+        max_amount: int = request.max_amount
+        if outcome == BID_OUTCOME_FIRST:
+            return outcome, await self._handle_first_bid(bidder_id, amount, max_amount)
+
+        elif outcome in (BID_OUTCOME_MAX_UPDATE, BID_OUTCOME_UNCHANGED):
+            # Winner is bidding again, allow only max bid update
+            return outcome, await self._handle_max_bid_update(bidder_id, amount, max_amount)
+
+        # Generate a new bid with proper fund reservation, including buy tax
+        new_bid: Bid = await self._instantiate_bid(bidder_id, amount, max_amount)
+        if outcome == BID_OUTCOME_OUTBID:
+            # The new bidder won the bidding battle
+            old_winning_bid = self.winning_bid
+
+            new_bid.current_amount = winning_amount
+            self.winning_bid = new_bid
+
+            # Reimburse the reserved funds to the incumbent
+            refunded_amount: int = old_winning_bid.reserved_amount - self._escrow_shortfalls.pop(old_winning_bid.bidder_id, 0)
+            player: Player = PlayerRoster().get(old_winning_bid.bidder_id)
+            async with player:
+                player.add_funds(refunded_amount)
+
+            notifications[old_winning_bid.bidder_id] = (True, BasicEmbeds.wrong_cross(f"You have been outbid on `{self._quantity}x {self._item_id}`. The new winning bid is `{winning_amount:,}` gold."
+                                                                                      f"\n\nYour `{refunded_amount:,}` gold were sent back to your account."))
+            _log(bidder_id, f"Outbid {old_winning_bid.bidder_id} with {winning_amount:,} gold up to {max_amount:,} on auction {self._id}")
+
+            # Notify the bidder that his bid was accepted
+            if winning_amount == amount:
+                return outcome, self._compose_bid_accepted_msg(self.winning_bid)
+            else:
+                return (outcome, f"Your bid of `{amount:,}` gold for item {self._item_id} was immediately challenged resulting in an intense bidding war."
+                                 f"\n\nYou had to raise your bid to `{winning_amount:,}` to finally get ahead of your adversary."
+                                 f"\n\nYour bid may be automatically increased up to `{max_amount:,}` if other players attempt to outbid you."
+                                 f"\n\n{self._compose_bid_reserve_msg(self.winning_bid)}")
+
+        else:
+            # The incumbent bidder won the battle, reimburse the reserved funds to the bidder
+            player: Player = PlayerRoster().get(bidder_id)
+            async with player:
+                player.add_funds(new_bid.reserved_amount)
+
+            # Update the current amount
+            self.winning_bid.update_current_amount(winning_amount)
+
+            notifications[self.winning_bid.bidder_id] = (False, BasicEmbeds.exclamation(f"Your bid on `{self._quantity}x {self._item_id}` was automatically increased to `{winning_amount:,}` gold "
+                                                                                        f"following a bidding contest with another participant."))
+
+            # Notify the bidder that his bid is insufficient given there was a new bid at winning_bid and that the new minimum bid is winning_amount + self.minimum_increment
+            return (outcome, f"Your `{amount:,}` gold bid for item {self.item_id} was immediately challenged resulting in a failed bidding war."
+                             f"\n\nYour adversary bid all the way to `{winning_amount:,}`, forcing you to bow down. All is not lost however, you still have time to place higher bid if you wish.")
+
     @staticmethod
     def _combine_retrieve_message(base_msg: str, msg_addendum: Optional[str]) -> str:
         if msg_addendum is None:
@@ -552,41 +731,9 @@ class AuctionedItem:
 
         return msg_addendum
 
-    def _handle_bidding_battle(self, incumbent: tuple[int, int], challenger: tuple[int, int], challenger_starting_bid: int) -> tuple[int, int]:
-        # There are two possible strategies in an automated bidding battle:
-        # - The minimum_increment keeps being added alternatively between bidder1 and bidder2 until one of the player cannot bid anymore
-        #       This option simulates a case where each bidder would bid in turn, but never over bidding more than the minimum increment
-        # - Directly compare the maximum bid of each bidder and arbitrate for the highest, ideally with the other bidder's max bid plus the minimum increment
-        #       This scenario would not happen in real life since it depends on a form of omniscience to know the maximum bid of each bidder
-        #
-        # For now we're using the second approach since it seems less contentious considering the bidder with the highest maximum bid can still lose with the 
-        # first version in some cases where the maximum bid between the bidders differ by less than minimum_increment
-
-        incumbent_id, incumbent_max = incumbent
-        challenger_id, challenger_max = challenger
-
-        # Firstly, an edge case to give a semblance of credibility. If the incumbent's max bid is not enough to outbid the challenger's initial bid by minimum_increment
-        # then the challenger wins directly. This is necessary to prevent hacking the minimum_increment by tuning the maximum amount
-        if incumbent_max < challenger_starting_bid + self._minimum_increment:
-            return challenger_id, challenger_starting_bid
-
-        if incumbent_max >= challenger_max:
-            # Incumbent wins at the minimum of the challenger's maximum amount + minimum_increment and the incumbent's maximum bid
-            return incumbent_id, min(incumbent_max, challenger_max + self._minimum_increment)
-        else:
-            # Challenger wins at the minimum of the incumbent's maximum amount + minimum_increment and the challenger's maximum bid
-            return challenger_id, min(challenger_max, incumbent_max + self._minimum_increment)
-
     async def _handle_first_bid(self, bidder_id: int, amount: int, max_amount: int) -> str:
-        if amount < self._minimum_bid:
-            _log(bidder_id, f"Bid below the {self._minimum_bid:,} gold minimum bid of auction {self._id}")
-            raise InvalidBidException(f"The minimum bid for this item is `{self._minimum_bid:,}`")
-
-        # Get the buying tax rate
-
-        # Keep the data in memory
+        # Keep the data in memory, it's persisted with the rest of the batch
         self.winning_bid = await self._instantiate_bid(bidder_id, amount, max_amount)
-        await self.winning_bid.persist()
         _log(bidder_id, f"First bid of {amount:,} gold up to {max_amount:,} on auction {self._id}")
 
         return self._compose_bid_accepted_msg(self.winning_bid)
@@ -662,6 +809,14 @@ class AuctionedItem:
 
         return Bid(auction_id=self._id, bidder_id=bidder_id, current_amount=amount, maximum_amount=max_amount, reserved_amount=reserve_amount, tax_rate=buy_tax, bid_time=datetime.utcfromtimestamp(datetime.now().timestamp()))
 
+    def _ledger_entry(self, request: BidRequest) -> AuctionBidLedgerDao:
+        # Records the bid as received along with the winning bid it resulted in, so that the ledger alone is enough to check or rebuild the auction
+        bid: Optional[Bid] = self.winning_bid if self.winning_bid and self.winning_bid.bidder_id else None
+        return AuctionBidLedgerDao(auction_id=self._id, bidder_id=request.bidder_id, amount=request.amount, maximum_amount=request.max_amount, outcome=request.outcome,
+                                   winner_id=bid.bidder_id if bid else None, winning_amount=bid.current_amount if bid else None, winning_maximum_amount=bid.maximum_amount if bid else None,
+                                   winning_reserved_amount=bid.reserved_amount if bid else None, winning_tax_rate=bid.tax_rate if bid else None,
+                                   created_at=datetime.utcfromtimestamp(request.received_time.timestamp()))
+
     async def _start_countdown(self) -> AuctionedItem:
         now = datetime.now()
         self._countdown_start_time = now
@@ -676,9 +831,19 @@ class AuctionHouse:
     def __init__(self):
         super().__init__()
         self._active_auctions: set[AuctionedItem] = set()
-        self._countdown_auctions: set[AuctionedItem] = set()
         self._auctions_by_ids: dict[int, AuctionedItem] = dict()
         self._auctions_by_msg_ids: dict[int, AuctionedItem] = dict()
+        self._escrow_by_players: dict[int, int] = dict()
+        self._escrow_by_auctions: dict[int, tuple[int, int]] = dict()  # auction_id -> (bidder_id, reserved_amount)
+        self._escrow_audits: set[int] = set()  # Ids of the auctions whose winning bid reserve couldn't be fully held, reported by the next escrow audit
+        self._transitions: list[tuple[float, int]] = []  # Min-heap of (due timestamp, auction_id), outdated entries are skipped when they come up
+        self._transition_times: dict[int, float] = dict()  # auction_id -> due timestamp of its only valid heap entry
+        self._transition_lock: Lock = Lock()
+        self._transitions_started: bool = False
+        self._wakeup_time: Optional[float] = None
+        self._bid_queues: dict[int, deque[BidRequest]] = dict()
+        self._bid_workers: dict[int, asyncio.Task] = dict()
+        self._forced_view_refreshes: set[int] = set()
         self._active_auction_view: Optional[ActiveAuctionView] = ActiveAuctionView()
         self._ended_auction_view: Optional[EndedAuctionView] = EndedAuctionView()
 
@@ -696,15 +861,41 @@ class AuctionHouse:
     def active_auction_count(self, author_id: Optional[int] = None) -> int:
         return len(self.active_auctions(author_id))
 
-    def get_escrow(self, player_id: int) -> int:
-        escrow: int = 0
-        for auction in self._active_auctions:
-            if auction.is_winner(player_id):
-                escrow += auction.winning_bid.reserved_amount
+    def audit_escrow(self) -> dict[int, tuple[int, int]]:
+        # Recompute the escrow index from scratch, fixing and reporting any drift as player_id -> (indexed_amount, actual_amount)
+        indexed_escrow: dict[int, int] = self._escrow_by_players
+        self._rebuild_escrow()
+
+        drifts: dict[int, tuple[int, int]] = {}
+        for player_id in indexed_escrow.keys() | self._escrow_by_players.keys():
+            indexed_amount: int = indexed_escrow.get(player_id, 0)
+            actual_amount: int = self._escrow_by_players.get(player_id, 0)
+            if indexed_amount != actual_amount:
+                drifts[player_id] = (indexed_amount, actual_amount)
+
+        leaderboards: Leaderboards = Leaderboards()
+        for player_id, (indexed_amount, actual_amount) in drifts.items():
+            _log(player_id, f"Escrow drift detected, the index had {indexed_amount:,} gold reserved instead of {actual_amount:,} gold")
+            leaderboards.refresh_balance(player_id)
 
-        return escrow
+        for auction_id in list(self._escrow_audits):
+            auction: Optional[AuctionedItem] = self._auctions_by_ids.get(auction_id)
+            shortfalls: dict[int, int] = {} if auction is None or auction.ended else auction.escrow_shortfalls
+            if len(shortfalls) == 0:
+                # Settled by an outbid or the end of the auction
+                self._escrow_audits.discard(auction_id)
+                continue
+
+            for player_id, shortfall in shortfalls.items():
+                _log(player_id, f"Reserve of auction {auction_id} is short of {shortfall:,} gold since a failed bid batch was rolled back", "ERROR")
+
+        return drifts
+
+    def get_escrow(self, player_id: int) -> int:
+        return self._escrow_by_players.get(player_id, 0)
 
     async def load(self):
+        Leaderboards().register_escrow_provider(self.get_escrow)
         active_items: list[dict[str, Any]] = await AuctionDao.filter(item_retrieved=False).values()
         for item in active_items:
             auction_id: int = item["id"]
@@ -745,39 +936,113 @@ class AuctionHouse:
             self._auctions_by_msg_ids[msg_id] = auction
             if not auction.ended:
                 self._active_auctions.add(auction)
-                if auction.counting_down:
-                    self._countdown_auctions.add(auction)
+
+        self._rebuild_escrow()
+        self._rebuild_transitions()
 
     def unload(self):
+        self.stop_transitions()
         self._active_auctions: set[AuctionedItem] = set()
-        self._countdown_auctions: set[AuctionedItem] = set()
         self._auctions_by_ids: dict[int, AuctionedItem] = dict()
         self._auctions_by_msg_ids: dict[int, AuctionedItem] = dict()
+        self._escrow_by_players: dict[int, int] = dict()
+        self._escrow_by_auctions: dict[int, tuple[int, int]] = dict()
+        self._escrow_audits: set[int] = set()
+        self._transitions: list[tuple[float, int]] = []
+        self._transition_times: dict[int, float] = dict()
+        for worker in self._bid_workers.values():
+            worker.cancel()
+
+        self._bid_queues: dict[int, deque[BidRequest]] = dict()
+        self._bid_workers: dict[int, asyncio.Task] = dict()
+
+    # Transition management
+    async def process_due_transitions(self):
+        # Runs whenever the earliest transition is due, every auction whose transition is due is handled then pushed back with its next transition
+        self._wakeup_time = None
+        try:
+            async with self._transition_lock:
+                now: float = time()
+                due_auction_ids: list[int] = []
+                while len(self._transitions) > 0 and self._transitions[0][0] <= now:
+                    due, auction_id = heapq.heappop(self._transitions)
+                    if self._transition_times.get(auction_id) == due:
+                        self._transition_times.pop(auction_id)
+                        due_auction_ids.append(auction_id)
+
+                # Transitions pushed back while handling these ones wait for the next run, so an auction is handled at most once per run
+                for auction_id in due_auction_ids:
+                    auction: Optional[AuctionedItem] = self._auctions_by_ids.get(auction_id)
+                    if auction is None:
+                        continue
+
+                    try:
+                        await self._update_auction_state(auction)
+                    except Exception as err:
+                        # A failing auction must neither block the others nor be lost, retry it a bit later
+                        _log("system", f"Failed to process the transition of auction {auction_id}, retrying in {_TRANSITION_RETRY_DELAY:.0f}s: {err!r}", "ERROR")
+                        if auction_id in self._auctions_by_ids and auction_id not in self._transition_times:
+                            retry: float = time() + _TRANSITION_RETRY_DELAY
+                            self._transition_times[auction_id] = retry
+                            heapq.heappush(self._transitions, (retry, auction_id))
+        finally:
+            self._schedule_wakeup()
+
+    def reschedule_transition(self, auction: AuctionedItem):
+        # Must be called whenever something outside the transitions changes the state of the auction
+        due: float = auction.next_transition_time.timestamp()
+        if self._transition_times.get(auction.id) != due:
+            self._transition_times[auction.id] = due
+            heapq.heappush(self._transitions, (due, auction.id))
+            self._schedule_wakeup()
+
+    def start_transitions(self):
+        self._transitions_started = True
+        self._wakeup_time = None
+        self._schedule_wakeup()
+
+    def stop_transitions(self):
+        self._transitions_started = False
+        self._wakeup_time = None
+        Scheduler().cancel(_JOB_TRANSITIONS)
+
+    async def _update_auction_state(self, auction: AuctionedItem):
+        if not auction.ended:
+            state_changed = await auction.check_state()
+            if state_changed:
+                # The winner's reserve is spent once the auction ends
+                self._sync_escrow(auction)
+                await self.refresh_message(auction)
 
-    # Loop management
-    async def update_all_auction_states(self):
-        await self._do_update_auction_states(self._active_auctions)
+        if auction.ended and (auction.completed or auction.expired):
+            # Wait for completed before removal from the active list to make sure to refresh the view after retrieval
+            _remove_silently(self._active_auctions, auction)
+            self._auctions_by_ids.pop(auction.id, None)
+            self._auctions_by_msg_ids.pop(auction.msg_id, None)
+            self._transition_times.pop(auction.id, None)
+            self._sync_escrow(auction)
+        else:
+            self.reschedule_transition(auction)
 
-    async def update_countdown_auction_states(self):
-        await self._do_update_auction_states(self._countdown_auctions)
+    def _rebuild_transitions(self):
+        self._transition_times = {auction_id: auction.next_transition_time.timestamp() for auction_id, auction in self._auctions_by_ids.items()}
+        self._transitions = [(due, auction_id) for auction_id, due in self._transition_times.items()]
+        heapq.heapify(self._transitions)
+        self._wakeup_time = None
+        self._schedule_wakeup()
 
-    async def _do_update_auction_states(self, auctions: set[AuctionedItem]):
-        for auction in auctions.copy():
-            if not auction.ended:
-                state_changed = await auction.check_state()
-                if state_changed:
-                    if auction.counting_down:
-                        self._countdown_auctions.add(auction)
+    def _schedule_wakeup(self):
+        # Keeps a single scheduler job, set to the earliest transition
+        while len(self._transitions) > 0 and self._transition_times.get(self._transitions[0][1]) != self._transitions[0][0]:
+            heapq.heappop(self._transitions)
 
-                    await self.refresh_message(auction)
+        if not self._transitions_started or len(self._transitions) == 0:
+            return
 
-            if auction.ended:
-                _remove_silently(self._countdown_auctions, auction)
-                if auction.completed or auction.expired:
-                    # Wait for completed before removal from the active list to make sure to refresh the view after retrieval
-                    _remove_silently(self._active_auctions, auction)
-                    self._auctions_by_ids.pop(auction.id)
-                    self._auctions_by_msg_ids.pop(auction.msg_id)
+        due: float = self._transitions[0][0]
+        if self._wakeup_time is None or due < self._wakeup_time:
+            self._wakeup_time = due
+            Scheduler().schedule_once(_JOB_TRANSITIONS, self.process_due_transitions, datetime.fromtimestamp(due))
 
     # ============================================== "Real" methods =============================================
 
@@ -789,10 +1054,7 @@ class AuctionHouse:
             bidder_id = inter.author.id
 
             try:
-                changed, player_message = await auction.bid(bidder_id, bid_amount, max_bid)
-                if changed:
-                    await self.refresh_message(auction)
-
+                _, player_message = await self.submit_bid(auction, bidder_id, bid_amount, max_bid)
                 await inter.followup.send(player_message, ephemeral=True)
 
             except InvalidBidException as err:
@@ -826,6 +1088,7 @@ class AuctionHouse:
 
             if auction.completed:
                 await self.refresh_message(auction)
+                self.reschedule_transition(auction)
 
     def get_auction(self, auction_id: int) -> Optional[AuctionedItem]:
         if auction_id not in self._auctions_by_ids:
@@ -843,6 +1106,77 @@ class AuctionHouse:
         else:
             return self._auctions_by_msg_ids[msg_id]
 
+    async def replay_auction(self, auction_id: int, restore: bool = False) -> Optional[AuctionReplay]:
+        """
+        Rebuild the winning bid of an auction from its bid ledger and compare it with the recorded state.
+
+        :param auction_id: the auction to replay
+        :param restore:    if True and the auction is still running, replace its winning bid by the replayed one. The funds are not touched since they
+                           were already moved when each bid was processed
+
+        :return: the replay result or None if the auction doesn't exist
+        """
+        auction_data: Optional[dict[str, Any]] = await AuctionDao.get_or_none(id=auction_id).values("minimum_bid", "minimum_increment", "winning_user_id", "winning_current_amount", "winning_maximum_amount",
+                                                                                                  "winning_reserved_amount")
+        if auction_data is None:
+            return None
+
+        rows: list[tuple] = await AuctionBidLedgerDao.filter(auction_id=auction_id).order_by("id").values_list(*_LEDGER_FIELDS)
+        replay: AuctionReplay = replay_bids(auction_id, auction_data["minimum_bid"], auction_data["minimum_increment"], rows)
+
+        bid: Optional[Bid] = replay.winning_bid
+        replayed: Optional[tuple[int, int, int, int]] = None if bid is None else (bid.bidder_id, bid.current_amount, bid.maximum_amount, bid.reserved_amount)
+        stored: Optional[tuple[int, int, int, int]] = None
+        if auction_data["winning_user_id"]:
+            stored = (auction_data["winning_user_id"], auction_data["winning_current_amount"], auction_data["winning_maximum_amount"], auction_data["winning_reserved_amount"])
+
+        if replayed != stored:
+            replay.divergences.append(f"The auction stores the winning bid {stored} but the ledger replays as {replayed}")
+
+        auction: Optional[AuctionedItem] = self._auctions_by_ids.get(auction_id)
+        if restore and not replay.consistent and auction is not None and not auction.ended:
+            async with auction.lock:
+                auction.winning_bid = bid
+                if bid is not None:
+                    await bid.persist()
+
+            self._sync_escrow(auction)
+            await self.refresh_message(auction)
+            _log("system", f"Restored the winning bid of auction {auction_id} from its ledger: {bid}", "WARN")
+
+        return replay
+
+    async def submit_bid(self, auction: AuctionedItem, bidder_id: int, amount: int, max_amount: int = 0) -> tuple[bool, str]:
+        """
+        Queue a bid on the auction and wait for it to be resolved. The bids of an auction are resolved one batch at a time, in their arrival order,
+        with a single escrow sync and display refresh per batch.
+
+        :param auction:    the auction to bid on
+        :param bidder_id:  the bidder
+        :param amount:     the amount of the bid
+        :param max_amount: the maximum amount the bidder is willing to go up to, defaults to amount
+
+        :return: whether the auction display changed and the message for the bidder
+
+        :raise: InvalidBidException, InsufficientFundException, UnknownItemException - if the bid was rejected
+        """
+        # Input validation
+        if amount <= 0:
+            raise InvalidBidException("You're supposed to bid something")
+
+        # Auto-adjust max bid in case of inconsistent or default valued max bid
+        request: BidRequest = BidRequest(bidder_id, amount, max_amount if max_amount >= amount else amount)
+        queue: Optional[deque[BidRequest]] = self._bid_queues.get(auction.id)
+        if queue is None:
+            queue = deque()
+            self._bid_queues[auction.id] = queue
+
+        queue.append(request)
+        if auction.id not in self._bid_workers:
+            self._bid_workers[auction.id] = asyncio.create_task(self._process_bid_queue(auction, queue))
+
+        return await request.future
+
     async def update_maximum_bid_from_interaction(self, inter: disnake.ModalInteraction, max_bid: int):
         await self.bid_from_interaction(inter, 1, max_bid)
 
@@ -876,10 +1210,11 @@ class AuctionHouse:
         continent: Continent = Continent()
         msg = await continent.auction_channel.send(embed=auction_embed, view=self._active_auction_view)
         auction.msg_id = msg.id
+        await auction.insert()
         self._auctions_by_ids[auction.id] = auction
         self._auctions_by_msg_ids[auction.msg_id] = auction
         self._active_auctions.add(auction)
-        await auction.insert()
+        self.reschedule_transition(auction)
 
         author_description = "administrator" if system_auction else "player"
         _log(inter.author.id,
@@ -892,7 +1227,87 @@ class AuctionHouse:
 
         return auction
 
+    async def _process_bid_queue(self, auction: AuctionedItem, queue: deque[BidRequest]):
+        # Single consumer of the auction bid queue, stops once the queue is empty and is started again by the next bid
+        try:
+            while len(queue) > 0:
+                batch: list[BidRequest] = [queue.popleft() for _ in range(min(len(queue), _MAXIMUM_BID_BATCH_SIZE))]
+                changed: bool = False
+                try:
+                    changed = await auction.process_bids(batch)
+                except Exception as err:
+                    # The requests were already rejected, keep going with the next batch
+                    traceback.print_exc()
+                    _log("system", f"Failed to process {len(batch)} bids on auction {auction.id}: {err!r}", "ERROR")
+                finally:
+                    # The winning bid may have changed before an error interrupted the batch
+                    self._sync_escrow(auction)
+                    if len(auction.escrow_shortfalls) > 0:
+                        self._escrow_audits.add(auction.id)
+
+                if changed:
+                    await self.refresh_message(auction)
+                    if auction.counting_down:
+                        # A new bid pushes the end of the countdown back
+                        self.reschedule_transition(auction)
+
+                if len(batch) > 1:
+                    _log("system", f"Resolved a batch of {len(batch)} bids on auction {auction.id}")
+        finally:
+            if self._bid_workers.get(auction.id) is asyncio.current_task():
+                self._bid_workers.pop(auction.id)
+                self._bid_queues.pop(auction.id, None)
+
+            # Bids are only left over if the worker was cancelled, the waiting bidders shouldn't hang forever
+            while len(queue) > 0:
+                queue.popleft().reject(InvalidBidException("The auction house is closing, please bid again later"))
+
+    def _rebuild_escrow(self):
+        self._escrow_by_players: dict[int, int] = dict()
+        self._escrow_by_auctions: dict[int, tuple[int, int]] = dict()
+        for auction in self._active_auctions:
+            if not auction.ended and auction.winning_bid and auction.winning_bid.bidder_id:
+                bidder_id: int = auction.winning_bid.bidder_id
+                reserved_amount: int = auction.held_reserve
+                self._escrow_by_auctions[auction.id] = (bidder_id, reserved_amount)
+                self._escrow_by_players[bidder_id] = self._escrow_by_players.get(bidder_id, 0) + reserved_amount
+
+    def _sync_escrow(self, auction: AuctionedItem):
+        # Align the escrow index with the current winning bid of the specified auction, pushing the changes to the balance leaderboard
+        previous: Optional[tuple[int, int]] = self._escrow_by_auctions.pop(auction.id, None)
+        current: Optional[tuple[int, int]] = None
+        if auction in self._active_auctions and not auction.ended and auction.winning_bid and auction.winning_bid.bidder_id:
+            current = (auction.winning_bid.bidder_id, auction.held_reserve)
+            self._escrow_by_auctions[auction.id] = current
+
+        if previous == current:
+            return
+
+        if previous is not None:
+            self._adjust_escrow(previous[0], -previous[1])
+
+        if current is not None:
+            self._adjust_escrow(current[0], current[1])
+
+    def _adjust_escrow(self, player_id: int, delta: int):
+        escrow: int = self._escrow_by_players.get(player_id, 0) + delta
+        if escrow == 0:
+            self._escrow_by_players.pop(player_id, None)
+        else:
+            self._escrow_by_players[player_id] = escrow
+
+        Leaderboards().refresh_balance(player_id)
+
     async def refresh_message(self, auction: AuctionedItem, force_view_refresh: bool = False):
+        # Edits are coalesced per auction message, the auction state is only rendered when the edit actually happens
+        if force_view_refresh:
+            self._forced_view_refreshes.add(auction.msg_id)
+
+        MessageRefresher().request(auction.msg_id, lambda: self._do_refresh_message(auction), Continent().auction_channel_id)
+
+    async def _do_refresh_message(self, auction: AuctionedItem):
+        force_view_refresh: bool = auction.msg_id in self._forced_view_refreshes
+        self._forced_view_refreshes.discard(auction.msg_id)
         try:
             msg: disnake.Message = await Continent().auction_channel.fetch_message(auction.msg_id)
             if msg:
@@ -1122,8 +1537,137 @@ class EndedAuctionView(BaseStarfallPersistentView):
 # =================================== Bootstrap and util class-level functions ==================================
 
 
-def _log(user_id: Union[int, str], message: str):
-    log_event(user_id, _SHORT_NAME, message)
+def compute_reserved_amount(maximum_amount: int, tax_rate: int) -> int:
+    return maximum_amount + round(maximum_amount * tax_rate / 100)
+
+
+def replay_bids(auction_id: int, minimum_bid: int, minimum_increment: int, rows: list[tuple]) -> AuctionReplay:
+    """
+    Rebuild the winning bid of an auction from its ledger by running the bidding rules again on every recorded bid, reporting every place where the
+    replayed state differs from the recorded one. Rejected bids are skipped since they depend on the bidder's funds at the time, which the ledger doesn't hold.
+
+    :param auction_id:        the replayed auction
+    :param minimum_bid:       the minimum bid of the auction
+    :param minimum_increment: the minimum increment of the auction
+    :param rows:              the ledger rows of the auction in their insertion order, with the _LEDGER_FIELDS columns
+
+    :return: the replay result
+    """
+    state: Optional[Bid] = None
+    divergences: list[str] = []
+    for index, (bidder_id, amount, max_amount, outcome, winner_id, winning_amount, winning_maximum_amount, winning_reserved_amount, winning_tax_rate, created_at) in enumerate(rows):
+        recorded: Optional[tuple[int, int, int, int]] = None if winner_id is None else (winner_id, winning_amount, winning_maximum_amount, winning_reserved_amount)
+        if outcome == BID_OUTCOME_REJECTED:
+            continue
+
+        elif outcome == BID_OUTCOME_ERROR:
+            # Nothing tells how far the bid went before failing, so trust the recorded state
+            divergences.append(f"Bid #{index} from {bidder_id} failed while being processed, resuming from the recorded winning bid {recorded}")
+            state = None if recorded is None else Bid(auction_id, winner_id, winning_amount, winning_maximum_amount, winning_reserved_amount, winning_tax_rate, created_at)
+            continue
+
+        winner: Optional[tuple[int, int, int]] = None if state is None else (state.bidder_id, state.current_amount, state.maximum_amount)
+        try:
+            replayed_outcome, _, replayed_amount = resolve_bid(winner, bidder_id, amount, max_amount, minimum_bid, minimum_increment)
+        except InvalidBidException:
+            replayed_outcome, replayed_amount = BID_OUTCOME_REJECTED, 0
+
+        if replayed_outcome != outcome:
+            divergences.append(f"Bid #{index} from {bidder_id} was recorded as {outcome} but replays as {replayed_outcome}")
+
+        if replayed_outcome in (BID_OUTCOME_FIRST, BID_OUTCOME_OUTBID):
+            # The tax rate of the bidder at the time of the bid is an input of the ledger, not something that can be replayed
+            tax_rate: int = winning_tax_rate if winning_tax_rate is not None and winner_id == bidder_id else 0
+            state = Bid(auction_id, bidder_id, replayed_amount, max_amount, compute_reserved_amount(max_amount, tax_rate), tax_rate, created_at)
+        elif replayed_outcome == BID_OUTCOME_DEFENDED:
+            state.current_amount = replayed_amount
+            state.bid_time = created_at
+        elif replayed_outcome == BID_OUTCOME_MAX_UPDATE:
+            state.maximum_amount = max_amount
+            state.reserved_amount = compute_reserved_amount(max_amount, state.tax_rate)
+
+        replayed: Optional[tuple[int, int, int, int]] = None if state is None else (state.bidder_id, state.current_amount, state.maximum_amount, state.reserved_amount)
+        if replayed != recorded:
+            divergences.append(f"Bid #{index} from {bidder_id} recorded the winning bid {recorded} but replays as {replayed}")
+
+    return AuctionReplay(auction_id, len(rows), state, divergences)
+
+
+def resolve_bid(winner: Optional[tuple[int, int, int]], bidder_id: int, amount: int, max_amount: int, minimum_bid: int, minimum_increment: int) -> tuple[str, int, int]:
+    """
+    Apply the bidding rules to a bid without touching anything, shared by the live bidding and the ledger replay.
+
+    :param winner:            the (bidder_id, current_amount, maximum_amount) of the winning bid, None if nobody bid yet
+    :param bidder_id:         the bidder
+    :param amount:            the amount of the bid
+    :param max_amount:        the maximum amount the bidder is willing to go up to, at least amount
+    :param minimum_bid:       the minimum bid of the auction
+    :param minimum_increment: the minimum increment of the auction
+
+    :return: the (outcome, effective bid amount, resulting winning amount)
+
+    :raise: InvalidBidException - if the bid doesn't respect the auction rules
+    """
+    if winner is None:
+        # First bid, just make sure it's sufficient for the auctioned item parameters
+        if amount < minimum_bid:
+            raise InvalidBidException(f"The minimum bid for this item is `{minimum_bid:,}`")
+
+        return BID_OUTCOME_FIRST, amount, amount
+
+    winner_id, current_amount, maximum_amount = winner
+    if bidder_id == winner_id:
+        # Winner is bidding again, allow only max bid update
+        if amount > current_amount or max_amount == maximum_amount:
+            return BID_OUTCOME_UNCHANGED, amount, current_amount
+        elif max_amount < current_amount:
+            raise InvalidBidException(f"Your updated maximum bid must be be at least your current bid of {current_amount:,}")
+
+        return BID_OUTCOME_MAX_UPDATE, amount, current_amount
+
+    # There's an existing winning bid, then the new bid has to be higher the current bid by at least the minimum increment else just reject the bid and do nothing
+    minimum_new_bid = current_amount + minimum_increment
+    if amount < minimum_new_bid:
+        # The bid is insufficient, but maybe the max_bid is enough
+        if max_amount >= minimum_new_bid:
+            amount = minimum_new_bid
+        else:
+            # Nope, either the player is dumb, or someone else bid while he was placing his bid
+            raise InvalidBidException(f"Your bid must respect the `{minimum_increment:,}` gold minimum increment, so the bid should be at least is `{minimum_new_bid:,}`")
+
+    # If we're here, then the bid is valid, but can still trigger a bidding battle with the currently winning bidder
+    battle_winner_id, winning_amount = resolve_bidding_battle((winner_id, maximum_amount), (bidder_id, max_amount), amount, minimum_increment)
+    return BID_OUTCOME_OUTBID if battle_winner_id == bidder_id else BID_OUTCOME_DEFENDED, amount, winning_amount
+
+
+def resolve_bidding_battle(incumbent: tuple[int, int], challenger: tuple[int, int], challenger_starting_bid: int, minimum_increment: int) -> tuple[int, int]:
+    # There are two possible strategies in an automated bidding battle:
+    # - The minimum_increment keeps being added alternatively between bidder1 and bidder2 until one of the player cannot bid anymore
+    #       This option simulates a case where each bidder would bid in turn, but never over bidding more than the minimum increment
+    # - Directly compare the maximum bid of each bidder and arbitrate for the highest, ideally with the other bidder's max bid plus the minimum increment
+    #       This scenario would not happen in real life since it depends on a form of omniscience to know the maximum bid of each bidder
+    #
+    # For now we're using the second approach since it seems less contentious considering the bidder with the highest maximum bid can still lose with the 
+    # first version in some cases where the maximum bid between the bidders differ by less than minimum_increment
+
+    incumbent_id, incumbent_max = incumbent
+    challenger_id, challenger_max = challenger
+
+    # Firstly, an edge case to give a semblance of credibility. If the incumbent's max bid is not enough to outbid the challenger's initial bid by minimum_increment
+    # then the challenger wins directly. This is necessary to prevent hacking the minimum_increment by tuning the maximum amount
+    if incumbent_max < challenger_starting_bid + minimum_increment:
+        return challenger_id, challenger_starting_bid
+
+    if incumbent_max >= challenger_max:
+        # Incumbent wins at the minimum of the challenger's maximum amount + minimum_increment and the incumbent's maximum bid
+        return incumbent_id, min(incumbent_max, challenger_max + minimum_increment)
+    else:
+        # Challenger wins at the minimum of the incumbent's maximum amount + minimum_increment and the challenger's maximum bid
+        return challenger_id, min(challenger_max, incumbent_max + minimum_increment)
+
+
+def _log(user_id: Union[int, str], message: str, level: str = "INFO"):
+    log_event(user_id, _SHORT_NAME, message, level)
 
 
 def _remove_silently(s: set[AuctionedItem], v: AuctionedItem) -> bool:
@@ -1,13 +1,20 @@
+import json
+import zlib
 from asyncio import Lock
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Optional, TypeVar, Union
+from typing import Any, Iterable, Optional, TypeVar, Union
+
+from tortoise.expressions import Subquery
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
 
 from world.bestiary import Bestiary, BeastDefinition, VARIANT_NORMAL
 from character.player import PlayerRoster, Player
 from utils import DatabaseUtils, ParamsUtils
 from utils.base import singleton
 from utils.loot import LootDistributionLogic
-from utils.Database import BeastBattleDao, ID_UNCREATED
+from utils.Database import BeastBattleArchiveDao, BeastBattleAttackDao, BeastBattleDao, ID_UNCREATED
 from utils.LoggingUtils import log_event
 
 SOURCE_ALLY: str = "ally"
@@ -18,6 +25,11 @@ NO_MAX_ROUND: int = -1
 
 _SHORT_NAME: str = "battle"
 _MAXIMUM_BATTLE_AGE: timedelta = timedelta(days=7)
+_ATTACK_BATCH_SIZE: int = 500
+_ARCHIVE_BATCH_SIZE: int = 200
+_ARCHIVE_COMPRESSION_LEVEL: int = 9
+_FINISHED_CACHE_SIZE: int = 256
+_ATTACK_ROW_FIELDS: tuple[str, ...] = ("battle_id", "round_number", "round_player_id", "player_id", "damage_dealt", "source", "initiative", "created_at")
 
 A = TypeVar("A", bound="Attack")
 B = TypeVar("B", bound="BeastBattle")
@@ -124,6 +136,10 @@ class Attack:
 
         return Attack(battle_round, player_id, damage_dealt, source, initiative, created_at, player)
 
+    def to_dao(self, battle_id: int) -> BeastBattleAttackDao:
+        return BeastBattleAttackDao(battle_id=battle_id, round_number=self._round.round_number, round_player_id=self._round.player_id, player_id=self._player_id, damage_dealt=self._damage_dealt,
+                                    source=self._source, initiative=self._initiative, created_at=self._created_at)
+
     def serialize(self) -> dict[str, Union[datetime, int, str]]:
         return {
             "player_id": self._player_id,
@@ -214,6 +230,19 @@ class BattleRound:
 
         return battle_round
 
+    @staticmethod
+    def from_rows(battle: B, roster: PlayerRoster, round_number: int, player_id: int, attack_rows: list[tuple[int, int, str, int, datetime]]) -> R:
+        # Rows are (player_id, damage_dealt, source, initiative, created_at) as stored in the attack log
+        battle_round: BattleRound = BattleRound(battle, round_number, player_id, roster.get(player_id))
+        attacks: list[Attack] = [Attack(battle_round, p_id, damage_dealt, source, initiative, created_at, roster.get(p_id)) for p_id, damage_dealt, source, initiative, created_at in attack_rows]
+        attacks.sort()
+        battle_round._attacks = attacks
+
+        return battle_round
+
+    def to_daos(self, battle_id: int) -> list[BeastBattleAttackDao]:
+        return [attack.to_dao(battle_id) for attack in self._attacks]
+
     def serialize(self) -> dict[str, Union[int, list[dict[str, Union[datetime, int, str]]]]]:
         attack_data: list[dict[str, Union[datetime, int, str]]] = [attack.serialize() for attack in self._attacks]
         serialized: dict[str, Union[int, list[dict[str, Union[datetime, int, str]]]]] = {
@@ -238,6 +267,7 @@ class BeastBattle:
         self._unlimited_health: bool = unlimited_health
         self._valid_attackers: Optional[set[int]] = None if valid_attacker_ids is None or len(valid_attacker_ids) == 0 else valid_attacker_ids.copy()
         self._rounds: list[BattleRound] = []
+        self._unpersisted_rounds: list[BattleRound] = []
         self._finished: bool = finished
         self._loot_distribution_logic: LootDistributionLogic = loot_distribution_logic if loot_distribution_logic is not None else LootDistributionLogic()
         self._loot: Optional[dict[str, int]] = None if loot is None else loot
@@ -411,7 +441,7 @@ class BeastBattle:
                 display_cp = display_cp + display_cp * battle_boost // 100
                 internal_cp = ParamsUtils.display_to_internal_cp(display_cp)
                 inflicted_damage = round(ParamsUtils.internal_cp_to_attack(internal_cp))
-                self._rounds.append(BattleRound(self, round_number, player.id, player, [(player.id, inflicted_damage, SOURCE_PLAYER, 1, datetime.now(), player)]))
+                self._add_round(player, round_number, inflicted_damage)
                 if self.beast_killed:
                     self._finished = True
                     self._loot = self._beast.loot.roll()
@@ -436,17 +466,28 @@ class BeastBattle:
         return requires_loot_distribution
 
     async def persist(self):
+        # The header row only holds the battle settings and outcome, the rounds are appended to the attack log so the cost of persisting a round does not grow with the battle
         if self.id == ID_UNCREATED:
             self._created_at = datetime.now()
             self._updated_at = self._created_at
-            dto: BeastBattleDao = await BeastBattleDao.create(data=self._serialize_data(), created_at=self._created_at, updated_at=self._updated_at)
+            dto: BeastBattleDao = await BeastBattleDao.create(data=self._serialize_data(), finished=self.finished, created_at=self._created_at, updated_at=self._updated_at)
             self._id = dto.id
             self._changed = False
         elif self._changed:
             self._updated_at = datetime.now()
-            await BeastBattleDao.filter(id=self._id).update(data=self._serialize_data(), created_at=self._created_at, updated_at=self._updated_at)
+            await BeastBattleDao.filter(id=self._id).update(data=self._serialize_data(), finished=self.finished, created_at=self._created_at, updated_at=self._updated_at)
             self._changed = False
 
+        await self._persist_rounds()
+        if self.finished:
+            self._manager._retire(self)
+
+    def _add_round(self, player: Player, round_number: int, inflicted_damage: int) -> BattleRound:
+        battle_round: BattleRound = BattleRound(self, round_number, player.id, player, [(player.id, inflicted_damage, SOURCE_PLAYER, 1, datetime.now(), player)])
+        self._rounds.append(battle_round)
+        self._unpersisted_rounds.append(battle_round)
+        return battle_round
+
     async def _distribute_loot(self) -> None:
         if self._loot_distribution is None:
             if self.experience_reward > 0 or (self._loot is not None and len(self._loot) > 0):
@@ -462,8 +503,21 @@ class BeastBattle:
 
             self._changed = True
 
+    async def _persist_rounds(self):
+        rounds: list[BattleRound] = self._unpersisted_rounds
+        if len(rounds) == 0:
+            return
+
+        self._unpersisted_rounds = []
+        try:
+            await BeastBattleAttackDao.bulk_create([dao for battle_round in rounds for dao in battle_round.to_daos(self._id)], batch_size=_ATTACK_BATCH_SIZE)
+        except Exception:
+            # Keep them for the next persist rather than losing them
+            self._unpersisted_rounds = rounds + self._unpersisted_rounds
+            raise
+
     @staticmethod
-    def deserialize(manager: M, bestiary: Bestiary, roster: PlayerRoster, row_data: dict[str, Any]) -> B:
+    def deserialize(manager: M, bestiary: Bestiary, roster: PlayerRoster, row_data: dict[str, Any], attack_rows: Optional[list[tuple[int, int, int, int, int, str, int, datetime]]] = None) -> B:
         battle_id: int = row_data["id"]
         created_at: datetime = row_data["created_at"]
         updated_at: datetime = row_data["updated_at"]
@@ -478,19 +532,35 @@ class BeastBattle:
         loot_distribution_logic: LootDistributionLogic = LootDistributionLogic.deserialize(data["loot_distribution_logic"])
         loot: Optional[dict[str, int]] = data["loot"]
         loot_distribution: Optional[dict[int, dict[str, int]]] = data["loot_distribution"]
-        rounds_data: list[dict[str, Union[int, list[dict[str, Union[datetime, int, str]]]]]] = data["rounds"]
+        legacy_rounds_data: Optional[list[dict[str, Union[int, list[dict[str, Union[datetime, int, str]]]]]]] = data.get("rounds")
 
         beast: BeastDefinition = bestiary[beast_name]
         if beast_variant_name != VARIANT_NORMAL:
             beast = beast.mutate(bestiary.get_variant(beast_variant_name))
 
         battle: BeastBattle = BeastBattle(manager, beast, battle_id, max_rounds, unlimited_health, set(valid_attackers) if valid_attackers is not None else None, finished, loot_distribution_logic, loot, loot_distribution, created_at, updated_at)
-        rounds: list[BattleRound] = [BattleRound.deserialize(battle, roster, round_data) for round_data in rounds_data]
+        rounds: list[BattleRound] = BeastBattle._rounds_from_rows(battle, roster, attack_rows) if attack_rows is not None else []
+        if legacy_rounds_data is not None and len(rounds) == 0:
+            # Battle persisted before the attack log existed, its rounds get moved to the log on the next persist
+            rounds = [BattleRound.deserialize(battle, roster, round_data) for round_data in legacy_rounds_data]
+            battle._unpersisted_rounds = rounds.copy()
+            battle._changed = True
+        elif legacy_rounds_data is not None:
+            battle._changed = True
+
         rounds.sort()
         battle._rounds = rounds
 
         return battle
 
+    @staticmethod
+    def _rounds_from_rows(battle: B, roster: PlayerRoster, attack_rows: list[tuple[int, int, int, int, int, str, int, datetime]]) -> list[BattleRound]:
+        grouped_rows: dict[tuple[int, int], list[tuple[int, int, str, int, datetime]]] = {}
+        for _, round_number, round_player_id, player_id, damage_dealt, source, initiative, created_at in attack_rows:
+            grouped_rows.setdefault((round_number, round_player_id), []).append((player_id, damage_dealt, source, initiative, created_at))
+
+        return [BattleRound.from_rows(battle, roster, round_number, round_player_id, rows) for (round_number, round_player_id), rows in grouped_rows.items()]
+
     def _serialize_data(self) -> dict[str, Any]:
         data: dict[str, Any] = {
             "beast_name": self._beast.name,
@@ -502,32 +572,39 @@ class BeastBattle:
             "loot_distribution_logic": self._loot_distribution_logic.serialize(),
             "loot": self._loot,
             "loot_distribution": self._loot_distribution,
-            "rounds": self._serialize_round_data(),
         }
 
         return data
 
-    def _serialize_round_data(self) -> list[dict[str, Union[int, list[dict[str, Union[datetime, int, str]]]]]]:
-        round_data: list[dict[str, Union[int, list[dict[str, Union[datetime, int, str]]]]]] = [battle_round.serialize() for battle_round in self._rounds]
-        return round_data
-
 
 @singleton
 class BattleManager:
     def __init__(self):
         self._beast_battles: dict[int, BeastBattle] = {}
+        self._finished_battles: OrderedDict[int, BeastBattle] = OrderedDict()
 
     async def load(self):
-        bestiary: Bestiary = Bestiary()
-        roster: PlayerRoster = PlayerRoster()
-        beast_battles: dict[int, BeastBattle] = {}
+        # Only the battles still in progress are loaded, finished ones are fetched on demand
+        active_ids: QuerySet = BeastBattleDao.filter(finished=False).values("id")
+        battles: list[dict[str, Any]] = await BeastBattleDao.filter(finished=False).values()
+        attack_rows: dict[int, list[tuple[int, int, int, int, int, str, int, datetime]]] = await self._fetch_attack_rows(BeastBattleAttackDao.filter(battle_id__in=Subquery(active_ids)))
 
-        battles: list[dict[str, Any]] = await BeastBattleDao.all().values()
-        for battle_data in battles:
-            battle: BeastBattle = BeastBattle.deserialize(self, bestiary, roster, battle_data)
+        beast_battles: dict[int, BeastBattle] = {}
+        stale_battles: list[BeastBattle] = []
+        for battle in self._deserialize_all(battles, attack_rows):
             beast_battles[battle.id] = battle
+            if battle._changed or battle.finished:
+                # Either persisted before the attack log existed or finished without the flag being persisted
+                battle._changed = True
+                stale_battles.append(battle)
 
         self._beast_battles: dict[int, BeastBattle] = beast_battles
+        self._finished_battles = OrderedDict()
+
+        for battle in stale_battles:
+            await battle.persist()
+
+        _log("system", f"Loaded {len(self._beast_battles)} active battles, {len(stale_battles)} battles rewritten")
 
     # ============================================= Special methods =============================================
 
@@ -538,17 +615,80 @@ class BattleManager:
         return "Battle Manager"
 
     def __getitem__(self, battle_id: int) -> BeastBattle:
-        return self._beast_battles[battle_id]
+        battle: Optional[BeastBattle] = self.get(battle_id)
+        if battle is None:
+            raise KeyError(battle_id)
+
+        return battle
 
     # ============================================== "Real" methods =============================================
-    async def purge_irrelevant_battles(self) -> None:
-        now = datetime.now()
-        limit = now - _MAXIMUM_BATTLE_AGE
-        delete_candidate_ids: set[int] = {battle.id for battle in self._beast_battles.values() if battle.updated_at.timestamp() < limit.timestamp()}
-        for battle_id in delete_candidate_ids:
-            self._beast_battles.pop(battle_id)
 
-        await BeastBattleDao.filter(updated_at__lt=limit).delete()
+    async def archive_old_battles(self) -> int:
+        # Moves the battles not updated for a while into the archive table, compressed with their attack log, returns the number of archived battles
+        limit: datetime = datetime.now() - _MAXIMUM_BATTLE_AGE
+        archived_count: int = 0
+        while True:
+            battles: list[dict[str, Any]] = await BeastBattleDao.filter(updated_at__lt=limit).order_by("id").limit(_ARCHIVE_BATCH_SIZE).values()
+            if len(battles) == 0:
+                break
+
+            battle_ids: list[int] = [battle_data["id"] for battle_data in battles]
+            attack_rows: dict[int, list[tuple[int, int, int, int, int, str, int, datetime]]] = await self._fetch_attack_rows(BeastBattleAttackDao.filter(battle_id__in=battle_ids))
+            archives: list[BeastBattleArchiveDao] = [BeastBattleArchiveDao(id=battle_data["id"], data=_compress_battle(battle_data, attack_rows.get(battle_data["id"], [])), created_at=battle_data["created_at"],
+                                                                           updated_at=battle_data["updated_at"]) for battle_data in battles]
+            async with in_transaction():
+                await BeastBattleArchiveDao.bulk_create(archives)
+                await BeastBattleAttackDao.filter(battle_id__in=battle_ids).delete()
+                await BeastBattleDao.filter(id__in=battle_ids).delete()
+
+            for battle_id in battle_ids:
+                self._beast_battles.pop(battle_id, None)
+                self._finished_battles.pop(battle_id, None)
+
+            archived_count += len(battle_ids)
+
+        if archived_count > 0:
+            _log("system", f"Archived {archived_count} battles last updated before {limit}")
+
+        return archived_count
+
+    async def fetch(self, battle_id: int) -> Optional[BeastBattle]:
+        return (await self.fetch_many([battle_id])).get(battle_id)
+
+    async def fetch_archived(self, battle_id: int) -> Optional[BeastBattle]:
+        # Archived battles are read-only snapshots, they are never cached nor registered again
+        data: Optional[bytes] = await BeastBattleArchiveDao.get_or_none(id=battle_id).values_list("data", flat=True)
+        if data is None:
+            return None
+
+        battle_data, attack_rows = _decompress_battle(data)
+        return BeastBattle.deserialize(self, Bestiary(), PlayerRoster(), battle_data, attack_rows)
+
+    async def fetch_many(self, battle_ids: Iterable[int]) -> dict[int, BeastBattle]:
+        # Returns the requested battles that still exist, loading the ones not in memory with a single query for the headers and another for the rounds
+        found: dict[int, BeastBattle] = {}
+        missing_ids: list[int] = []
+        for battle_id in set(battle_ids):
+            battle: Optional[BeastBattle] = self.get(battle_id)
+            if battle is not None:
+                found[battle_id] = battle
+            else:
+                missing_ids.append(battle_id)
+
+        if len(missing_ids) > 0:
+            battles: list[dict[str, Any]] = await BeastBattleDao.filter(id__in=missing_ids).values()
+            attack_rows: dict[int, list[tuple[int, int, int, int, int, str, int, datetime]]] = await self._fetch_attack_rows(BeastBattleAttackDao.filter(battle_id__in=missing_ids))
+            for battle in self._deserialize_all(battles, attack_rows):
+                # Another task may have loaded it while waiting for the database
+                battle = self.get(battle.id) or battle
+                if battle.finished:
+                    self._cache_finished(battle)
+                else:
+                    self._beast_battles[battle.id] = battle
+
+                found[battle.id] = battle
+
+        return found
 
     async def start_open_battle(self, beast: BeastDefinition, max_rounds: int = NO_MAX_ROUND, unlimited_health: bool = False) -> BeastBattle:
         return await self._register(BeastBattle(manager=self, beast=beast, max_rounds=max_rounds, unlimited_health=unlimited_health))
@@ -557,7 +697,25 @@ class BattleManager:
         return await self._register(BeastBattle(manager=self, beast=beast, max_rounds=max_rounds, unlimited_health=unlimited_health, valid_attacker_ids={player.id}))
 
     def get(self, battle_id: int) -> Optional[BeastBattle]:
-        return self._beast_battles.get(battle_id)
+        # Only looks in memory, use fetch to also look into the database for finished battles
+        battle: Optional[BeastBattle] = self._beast_battles.get(battle_id)
+        if battle is None:
+            battle = self._finished_battles.get(battle_id)
+            if battle is not None:
+                self._finished_battles.move_to_end(battle_id)
+
+        return battle
+
+    def _cache_finished(self, battle: BeastBattle):
+        self._finished_battles[battle.id] = battle
+        self._finished_battles.move_to_end(battle.id)
+        while len(self._finished_battles) > _FINISHED_CACHE_SIZE:
+            self._finished_battles.popitem(last=False)
+
+    def _deserialize_all(self, battles: list[dict[str, Any]], attack_rows: dict[int, list[tuple[int, int, int, int, int, str, int, datetime]]]) -> list[BeastBattle]:
+        bestiary: Bestiary = Bestiary()
+        roster: PlayerRoster = PlayerRoster()
+        return [BeastBattle.deserialize(self, bestiary, roster, battle_data, attack_rows.get(battle_data["id"], [])) for battle_data in battles]
 
     async def _register(self, battle: BeastBattle) -> BeastBattle:
         await battle.persist()
@@ -565,6 +723,45 @@ class BattleManager:
 
         return battle
 
+    def _retire(self, battle: BeastBattle):
+        # Called once a finished battle got persisted, it no longer needs to stay in memory for good
+        if self._beast_battles.pop(battle.id, None) is not None:
+            self._cache_finished(battle)
+
+    @staticmethod
+    async def _fetch_attack_rows(query: QuerySet) -> dict[int, list[tuple[int, int, int, int, int, str, int, datetime]]]:
+        # One query for the attack log of all the requested battles, grouped by battle afterward
+        attack_rows: dict[int, list[tuple[int, int, int, int, int, str, int, datetime]]] = {}
+        for row in await query.order_by("battle_id", "round_number", "initiative").values_list(*_ATTACK_ROW_FIELDS):
+            attack_rows.setdefault(row[0], []).append(row)
+
+        return attack_rows
+
+
+def _compress_battle(battle_data: dict[str, Any], attack_rows: list[tuple[int, int, int, int, int, str, int, datetime]]) -> bytes:
+    payload: dict[str, Any] = {
+        "id": battle_data["id"],
+        "created_at": battle_data["created_at"].timestamp(),
+        "updated_at": battle_data["updated_at"].timestamp(),
+        "data": battle_data["data"],
+        "attacks": [list(row[:-1]) + [row[-1].timestamp()] for row in attack_rows]
+    }
+
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), _ARCHIVE_COMPRESSION_LEVEL)
+
+
+def _decompress_battle(data: bytes) -> tuple[dict[str, Any], list[tuple[int, int, int, int, int, str, int, datetime]]]:
+    payload: dict[str, Any] = json.loads(zlib.decompress(data).decode("utf-8"))
+    battle_data: dict[str, Any] = {
+        "id": payload["id"],
+        "created_at": datetime.fromtimestamp(payload["created_at"]),
+        "updated_at": datetime.fromtimestamp(payload["updated_at"]),
+        "data": payload["data"]
+    }
+    attack_rows: list[tuple[int, int, int, int, int, str, int, datetime]] = [tuple(row[:-1]) + (datetime.fromtimestamp(row[-1]),) for row in payload["attacks"]]
+
+    return battle_data, attack_rows
+
 
 def _log(user_id: Union[int, str], message: str):
     log_event(user_id, _SHORT_NAME, message)
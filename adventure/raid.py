@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+from asyncio import Lock
+from typing import Any, Optional, Union
+
+from tortoise.transactions import in_transaction
+
+from utils.Database import Beast, RaidAttackLog
+from utils.LoggingUtils import log_event
+from utils.base import singleton
+
+RAID_FREE_ATTACKS: int = 3
+RAID_MAX_ATTACKS: int = 6
+
+_SHORT_NAME: str = "raid"
+_LOG_BATCH_SIZE: int = 500
+
+
+class RaidState:
+    def __init__(self, msg_id: int, beast_name: str, total_health: int, current_health: int, attackers: Optional[dict[int, list[int]]] = None):
+        super().__init__()
+        self._msg_id: int = msg_id
+        self._beast_name: str = beast_name
+        self._total_health: int = total_health
+        self._current_health: int = current_health
+        self._attackers: dict[int, list[int]] = {} if attackers is None else attackers
+        self._reserved_attacks: dict[int, int] = {}
+        self._pending_log: list[RaidAttackLog] = []
+        self._dirty: bool = False
+        self._closed: bool = False
+        self._lock: Lock = Lock()
+        self._checkpoint_lock: Lock = Lock()  # Keeps concurrent checkpoints from writing an older state over a newer one
+
+    # ============================================= Special methods =============================================
+
+    def __repr__(self):
+        return f"RaidState {{msg_id: {self._msg_id}, beast: {self._beast_name}, health: {self._current_health:,}/{self._total_health:,}}}"
+
+    def __str__(self):
+        return self.__repr__()
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def attackers(self) -> dict[int, list[int]]:
+        return {user_id: damage_list.copy() for user_id, damage_list in self._attackers.items()}
+
+    @property
+    def beast_name(self) -> str:
+        return self._beast_name
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def current_health(self) -> int:
+        return self._current_health
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    @property
+    def msg_id(self) -> int:
+        return self._msg_id
+
+    @property
+    def total_health(self) -> int:
+        return self._total_health
+
+    # ============================================== "Real" methods =============================================
+
+    def attack_count(self, user_id: int) -> int:
+        return len(self._attackers.get(user_id, []))
+
+    async def checkpoint(self):
+        async with self._checkpoint_lock:
+            await self.flush_log()
+            async with self._lock:
+                if not self._dirty:
+                    return
+
+                current_health: int = self._current_health
+                serialized_attackers: dict[str, list[int]] = self.serialize_attackers()
+                self._dirty = False
+
+            try:
+                await Beast.filter(msg_id=self._msg_id).update(current_health=current_health, attackers=serialized_attackers)
+            except Exception:
+                # The next checkpoint must write the state again
+                async with self._lock:
+                    self._dirty = True
+
+                raise
+
+    async def close(self):
+        # Refuses any further attack then persists the final state
+        async with self._lock:
+            self._closed = True
+
+        await self.checkpoint()
+
+    async def flush_log(self) -> int:
+        async with self._lock:
+            pending: list[RaidAttackLog] = self._pending_log
+            self._pending_log = []
+
+        if len(pending) > 0:
+            try:
+                # All or nothing, a retry must not log the batches that went through twice
+                async with in_transaction():
+                    await RaidAttackLog.bulk_create(pending, batch_size=_LOG_BATCH_SIZE)
+            except Exception:
+                # Put the rows back ahead of the ones logged in the meantime so that the next flush retries them in order
+                async with self._lock:
+                    self._pending_log = pending + self._pending_log
+
+                raise
+
+        return len(pending)
+
+    async def record_attack(self, user_id: int, damage: int) -> Optional[int]:
+        # Consumes an attack previously reserved through reserve_attack, returns the remaining health of the beast or None if the raid closed in the meantime
+        async with self._lock:
+            self._release(user_id)
+            if self._closed:
+                return None
+
+            damage_list: list[int] = self._attackers.setdefault(user_id, [])
+            self._pending_log.append(RaidAttackLog(msg_id=self._msg_id, user_id=user_id, attack_index=len(damage_list), damage=damage))
+            damage_list.append(damage)
+            self._current_health -= damage
+            self._dirty = True
+            return self._current_health
+
+    def release_attack(self, user_id: int):
+        # Gives back an attack reserved through reserve_attack that ended up not being made
+        self._release(user_id)
+
+    async def reserve_attack(self, user_id: int) -> Optional[int]:
+        # Reserves the next attack slot of the user so that concurrent clicks cannot exceed the attack limit, returns the 0-based attack index or None if the user ran out of attacks
+        async with self._lock:
+            attack_index: int = self.attack_count(user_id) + self._reserved_attacks.get(user_id, 0)
+            if attack_index >= RAID_MAX_ATTACKS:
+                return None
+
+            self._reserved_attacks[user_id] = self._reserved_attacks.get(user_id, 0) + 1
+            return attack_index
+
+    def serialize_attackers(self) -> dict[str, list[int]]:
+        return {str(user_id): damage_list.copy() for user_id, damage_list in self._attackers.items()}
+
+    def _release(self, user_id: int):
+        reserved: int = self._reserved_attacks.get(user_id, 0) - 1
+        if reserved > 0:
+            self._reserved_attacks[user_id] = reserved
+        else:
+            self._reserved_attacks.pop(user_id, None)
+
+    # =================================== Bootstrap and util class-level functions ==================================
+
+    @staticmethod
+    def deserialize(data: dict[str, Any], logged_attacks: list[tuple[int, int, int]]) -> RaidState:
+        # The attackers JSON is the last checkpoint, any logged attack beyond it was made after the checkpoint and is replayed
+        attackers: dict[int, list[int]] = {int(user_id): list(damage_list) for user_id, damage_list in (data.get("attackers") or {}).items()}
+        current_health: int = data["current_health"]
+        replayed: int = 0
+        for user_id, attack_index, damage in logged_attacks:
+            damage_list: list[int] = attackers.setdefault(user_id, [])
+            if attack_index >= len(damage_list):
+                damage_list.append(damage)
+                current_health -= damage
+                replayed += 1
+
+        raid: RaidState = RaidState(data["msg_id"], data["beast_id"], data["total_health"], current_health, attackers)
+        raid._dirty = replayed > 0
+        return raid
+
+
+@singleton
+class RaidManager:
+    def __init__(self):
+        self._raids: dict[int, RaidState] = {}
+
+    # ============================================= Special methods =============================================
+
+    def __repr__(self):
+        return "RaidManager"
+
+    def __str__(self) -> str:
+        return "Raid Manager"
+
+    def __contains__(self, msg_id: int) -> bool:
+        return msg_id in self._raids
+
+    # ============================================== "Real" methods =============================================
+
+    async def load(self):
+        raids: dict[int, RaidState] = {}
+        raid_data: list[dict[str, Any]] = await Beast.filter(beast_type="raid", till__isnull=False).values("msg_id", "beast_id", "current_health", "total_health", "attackers")
+        if len(raid_data) > 0:
+            logged_attacks: dict[int, list[tuple[int, int, int]]] = {}
+            log_data = await RaidAttackLog.filter(msg_id__in=[data["msg_id"] for data in raid_data]).order_by("attack_index").values_list("msg_id", "user_id", "attack_index", "damage")
+            for msg_id, user_id, attack_index, damage in log_data:
+                logged_attacks.setdefault(msg_id, []).append((user_id, attack_index, damage))
+
+            for data in raid_data:
+                raids[data["msg_id"]] = RaidState.deserialize(data, logged_attacks.get(data["msg_id"], []))
+
+        self._raids = raids
+        _log("system", f"Loaded {len(raids)} active raids")
+
+    async def unload(self):
+        await self.checkpoint_all()
+        self._raids = {}
+
+    async def checkpoint_all(self):
+        for raid in list(self._raids.values()):
+            try:
+                await raid.checkpoint()
+            except Exception as e:
+                _log("system", f"Failed to checkpoint raid {raid.msg_id}: {e!r}", "ERROR")
+
+    async def close(self, msg_id: int) -> Optional[RaidState]:
+        # Persists the final state of the raid and stops tracking it, the final standings can then be read from the returned state
+        raid: Optional[RaidState] = self._raids.get(msg_id)
+        if raid is not None:
+            # Only forgotten once persisted, a failed close keeps the standings around for the next attempt
+            await raid.close()
+            self._raids.pop(msg_id, None)
+            _log("system", f"Closed raid {msg_id} on {raid.beast_name} with {sum(len(damage_list) for damage_list in raid.attackers.values())} attacks")
+
+        return raid
+
+    async def flush_all(self):
+        for raid in list(self._raids.values()):
+            try:
+                await raid.flush_log()
+            except Exception as e:
+                _log("system", f"Failed to flush the attack log of raid {raid.msg_id}: {e!r}", "ERROR")
+
+    def get(self, msg_id: int) -> Optional[RaidState]:
+        return self._raids.get(msg_id)
+
+    def open(self, msg_id: int, beast_name: str, total_health: int) -> RaidState:
+        raid: RaidState = RaidState(msg_id, beast_name, total_health, total_health)
+        self._raids[msg_id] = raid
+        return raid
+
+
+def _log(user_id: Union[int, str], message: str, level: str = "INFO"):
+    log_event(user_id, _SHORT_NAME, message, level)
@@ -755,7 +755,7 @@ class Ruins:
         print("Failed to start ruins error")
 
     @staticmethod
-    def deserialize(row_data: dict[str, Any]) -> R:
+    def deserialize(row_data: dict[str, Any], guardian_battles: Optional[dict[int, BeastBattle]] = None) -> R:
         manager: RuinsManager = RuinsManager()
 
         ruins_id: int = row_data["id"]
@@ -773,8 +773,8 @@ class Ruins:
         distributed_exp: int = data.get("distributed_exp", 0)
         distributed_loot: dict[str, int] = data["distributed_loot"]
 
-        current_room: Optional[Room] = Ruins._deserialize_room(ruins_type, data.get("current_room"))
-        previous_room: Optional[Room] = Ruins._deserialize_room(ruins_type, data.get("previous_room"))
+        current_room: Optional[Room] = Ruins._deserialize_room(ruins_type, data.get("current_room"), guardian_battles)
+        previous_room: Optional[Room] = Ruins._deserialize_room(ruins_type, data.get("previous_room"), guardian_battles)
 
         ruins: Ruins = Ruins(ruins_id=ruins_id, user_id=user_id, msg_id=msg_id, ruins_type=ruins_type, ruins_structure=ruins_structure, started=started, ended=ended, spent_energy=spent_energy, distributed_exp=distributed_exp,
                              distributed_loot=distributed_loot, current_room=current_room, previous_room=previous_room, created_at=created_at, updated_at=updated_at)
@@ -799,7 +799,7 @@ class Ruins:
         return room
 
     @staticmethod
-    def _deserialize_room(ruins_type: RuinsType, room_data: Optional[dict[str, Optional[Union[bool, int, str, dict[str, int]]]]]) -> Optional[Room]:
+    def _deserialize_room(ruins_type: RuinsType, room_data: Optional[dict[str, Optional[Union[bool, int, str, dict[str, int]]]]], guardian_battles: Optional[dict[int, BeastBattle]] = None) -> Optional[Room]:
         if room_data is None:
             return None
 
@@ -817,8 +817,10 @@ class Ruins:
             guardian: Optional[BeastDefinition] = Ruins._deserialize_room_guardian(room_data)
             guardian_battle: Optional[BeastBattle] = None
         else:
-            # Use the battle to load everything
-            guardian_battle: Optional[BeastBattle] = BattleManager().get(guardian_battle_id)
+            # Use the battle to load everything, prefetched battles are looked up first since finished ones may already be evicted from the manager cache
+            guardian_battle: Optional[BeastBattle] = guardian_battles.get(guardian_battle_id) if guardian_battles is not None else None
+            if guardian_battle is None:
+                guardian_battle = BattleManager().get(guardian_battle_id)
             if guardian_battle is None:
                 # Can happen if a ruin has not expired but the battle did, in which case the player can redo the battle over, but oh well
                 guardian: Optional[BeastDefinition] = Ruins._deserialize_room_guardian(room_data)
@@ -984,8 +986,14 @@ class RuinsManager:
         active_ruins: dict[int, Ruins] = {}
 
         ruins_data: list[dict[str, Any]] = await RuinsDao.filter(ended=False).values()
+
+        # Guardian battles may be finished and thus not loaded yet, fetch them all at once before deserializing the rooms
+        guardian_battle_ids: set[int] = {room_data["guardian_battle_id"] for row_data in ruins_data for room_data in (row_data["data"].get("current_room"), row_data["data"].get("previous_room"))
+                                         if room_data is not None and room_data.get("guardian_battle_id") is not None}
+        guardian_battles: dict[int, BeastBattle] = await BattleManager().fetch_many(guardian_battle_ids) if len(guardian_battle_ids) > 0 else {}
+
         for row_data in ruins_data:
-            ruins: Ruins = Ruins.deserialize(row_data)
+            ruins: Ruins = Ruins.deserialize(row_data, guardian_battles)
             active_ruins[ruins.msg_id] = ruins
 
         self._active_ruins: dict[int, Ruins] = active_ruins
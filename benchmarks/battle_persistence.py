@@ -0,0 +1,83 @@
+"""
+Measures the cost of persisting a beast battle round as the battle grows.
+
+Run from the repository root with ``python -m benchmarks.battle_persistence``. It uses an in-memory sqlite database holding only the attack log and a header
+table with the columns BeastBattle.persist writes, so the production database is never touched.
+"""
+import asyncio
+import json
+from time import perf_counter
+from types import SimpleNamespace
+
+from tortoise import Tortoise, fields
+from tortoise.models import Model
+
+import adventure.battle
+from adventure.battle import BeastBattle, BattleManager
+from utils.Database import BeastBattleAttackDao
+
+TOTAL_ROUNDS: int = 2000
+WINDOW_SIZE: int = 250
+PLAYER_COUNT: int = 20
+
+
+class BenchmarkBattleHeader(Model):
+    """Header row of a beast battle, as written by BeastBattle.persist"""
+    id = fields.IntField(pk=True)
+    data = fields.JSONField()
+    finished = fields.BooleanField(default=False, index=True)
+    created_at = fields.DatetimeField()
+    updated_at = fields.DatetimeField()
+
+    class Meta:
+        table = "benchmark_beast_battles"
+
+
+__models__ = [BenchmarkBattleHeader, BeastBattleAttackDao]
+
+
+def _fake_beast() -> SimpleNamespace:
+    return SimpleNamespace(name="Benchmark Beast", variant=SimpleNamespace(name="normal"), health=10 ** 12, loot=None)
+
+
+async def _run():
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": [__name__]})
+    await Tortoise.generate_schemas()
+    adventure.battle.BeastBattleDao = BenchmarkBattleHeader
+    try:
+        battle: BeastBattle = BeastBattle(BattleManager(), _fake_beast(), unlimited_health=True)
+        await battle.persist()
+
+        players: list[SimpleNamespace] = [SimpleNamespace(id=100000 + i) for i in range(PLAYER_COUNT)]
+        print(f"{'rounds':>8} {'rounds ms/round':>16} {'header ms/round':>16} {'header bytes':>14} {'full snapshot bytes':>21}")
+        rounds_time: float = 0
+        header_time: float = 0
+        for round_number in range(1, TOTAL_ROUNDS + 1):
+            battle._add_round(players[round_number % PLAYER_COUNT], round_number, 1000 + round_number)
+
+            start: float = perf_counter()
+            await battle._persist_rounds()
+            rounds_time += perf_counter() - start
+
+            # What persist adds on top of the round whenever the battle settings or outcome changed
+            battle._changed = True
+            start = perf_counter()
+            await battle.persist()
+            header_time += perf_counter() - start
+
+            if round_number % WINDOW_SIZE == 0:
+                header_size: int = len(json.dumps(battle._serialize_data()))
+                # What the header used to weigh when every round was serialized into it
+                snapshot_size: int = header_size + len(json.dumps([battle_round.serialize() for battle_round in battle.rounds]))
+                print(f"{round_number:>8} {rounds_time * 1000 / WINDOW_SIZE:>16.3f} {header_time * 1000 / WINDOW_SIZE:>16.3f} {header_size:>14,} {snapshot_size:>21,}")
+                rounds_time = 0
+                header_time = 0
+
+        logged: int = await BeastBattleAttackDao.filter(battle_id=battle.id).count()
+        print(f"{logged:,} attack rows logged for {TOTAL_ROUNDS:,} rounds")
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(_run())
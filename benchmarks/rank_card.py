@@ -0,0 +1,108 @@
+"""
+Measures the rank card throughput, in cards per second, for uncached and cached renders.
+
+Run from the repository root with ``python -m benchmarks.rank_card [font.ttf]``. The rank assets are replaced by placeholders of the same sizes generated
+in a temporary directory, the font is the one given or the first TrueType font found in the usual system font directories.
+"""
+import asyncio
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+from time import perf_counter
+from typing import Optional
+
+from PIL import Image
+
+from utils.avatar_cache import AVATAR_SIZE
+from utils.rank_card import RankCardData, RankCardRenderer, TITLE_NAMES, _CARD_SIZE, _DIGIT_SIZE, _EXP_BAR_SIZE, _TITLE_SIZE
+
+CARD_COUNT: int = 200
+CONCURRENCY: int = 8
+FONT_FILENAMES: tuple[str, ...] = ("edosz.ttf", "SentyZHAO-20180827.ttf")
+FONT_DIRECTORIES: tuple[str, ...] = ("/usr/share/fonts", "/usr/local/share/fonts", "/Library/Fonts", "C:/Windows/Fonts", sys.prefix)
+
+
+def _find_font() -> Optional[str]:
+    if len(sys.argv) > 1:
+        return sys.argv[1]
+
+    for directory in FONT_DIRECTORIES:
+        fonts: list[str] = sorted(glob.glob(os.path.join(directory, "**", "*.ttf"), recursive=True))
+        if len(fonts) > 0:
+            return fonts[0]
+
+    return None
+
+
+def _placeholder(size: tuple[int, int]) -> Image.Image:
+    return Image.new("RGBA", size, (random.randrange(256), random.randrange(256), random.randrange(256), 255))
+
+
+def _generate_assets(asset_dir: str, font_path: str):
+    # Same file layout and image sizes as media/Rank
+    _placeholder(_CARD_SIZE).save(os.path.join(asset_dir, "base.png"))
+    for sub_directory in ("Number_Rank", "Titles", "ExpBar"):
+        os.mkdir(os.path.join(asset_dir, sub_directory))
+
+    for digit in range(10):
+        _placeholder(_DIGIT_SIZE).save(os.path.join(asset_dir, "Number_Rank", f"{digit}.png"))
+
+    for title_name in set(TITLE_NAMES):
+        _placeholder(_TITLE_SIZE).save(os.path.join(asset_dir, "Titles", f"{title_name}.png"))
+        for percent_floor in range(10, 101, 10):
+            _placeholder(_EXP_BAR_SIZE).save(os.path.join(asset_dir, "ExpBar", f"{title_name}{percent_floor}.png"))
+
+    for font_filename in FONT_FILENAMES:
+        shutil.copyfile(font_path, os.path.join(asset_dir, font_filename))
+
+
+def _random_avatar() -> Image.Image:
+    return Image.new("RGB", AVATAR_SIZE, (random.randrange(256), random.randrange(256), random.randrange(256)))
+
+
+def _card_data(user_id: int) -> RankCardData:
+    major: int = random.randrange(len(TITLE_NAMES) - 4)
+    exp: int = random.randrange(10 ** 6)
+    return RankCardData(user_id=user_id, member_name=f"Cultivator #{user_id}", chinese_name=False, realm="Benchmark Realm", small_realm=False, stage_key=(major, 1), title_name=TITLE_NAMES[major],
+                        percent_floor=random.randrange(1, 11) * 10, exp_text=f"{exp:,} / 1,000,000", exp_over_cap=False, rank=random.randrange(1, 10000), avatar_hash=f"avatar_{user_id}")
+
+
+async def _measure(renderer: RankCardRenderer, cards: list[RankCardData], avatar: Image.Image) -> float:
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def _render_one(data: RankCardData):
+        async with semaphore:
+            await renderer.render(data, avatar)
+
+    start: float = perf_counter()
+    await asyncio.gather(*[_render_one(data) for data in cards])
+    return len(cards) / (perf_counter() - start)
+
+
+async def _run():
+    font_path: Optional[str] = _find_font()
+    if font_path is None:
+        print("No TrueType font found, pass one as argument")
+        return
+
+    with tempfile.TemporaryDirectory() as asset_dir:
+        _generate_assets(asset_dir, font_path)
+        print(f"Placeholder assets generated in {asset_dir} with the font {font_path}")
+
+        renderer: RankCardRenderer = RankCardRenderer(asset_dir=asset_dir, cache_size=CARD_COUNT)
+        start: float = perf_counter()
+        await renderer.load()
+        print(f"Asset preload: {(perf_counter() - start) * 1000:.1f} ms")
+
+        avatar: Image.Image = _random_avatar()
+        cards: list[RankCardData] = [_card_data(user_id) for user_id in range(CARD_COUNT)]
+        print(f"Uncached: {await _measure(renderer, cards, avatar):.1f} cards/s")
+        print(f"Cached:   {await _measure(renderer, cards, avatar):.1f} cards/s")
+        print(renderer)
+
+
+if __name__ == "__main__":
+    asyncio.run(_run())
@@ -9,13 +9,20 @@ import topgg
 
 from adventure.auction import AuctionHouse
 from adventure.battle import BattleManager
+from adventure.raid import RaidManager
 from world.bestiary import Bestiary
 from adventure.chests import ChestLootConfig
 from adventure.ruins import RuinsManager
 from world.compendium import ItemCompendium
+from character.active_pills import ActivePills
 from character.player import PlayerRoster
 from world.continent import Continent
+from world.leaderboard import Leaderboards
+from world.market_book import MarketBook
+from world.matchmaking import MatchmakingPool
 from utils.Database import init_database
+from utils.EconomyUtils import import_legacy_tax_details
+from utils.refresher import MessageRefresher
 from character.inventory import RingStorage
 
 load_dotenv()
@@ -37,6 +44,13 @@ class MyBot(commands.Bot):
         self.main_guild = GUILD_ID_PROD
         self.breakthrough_role = 1010445866483601458
 
+    async def close(self):
+        # Write back the state only held in memory before the connection goes away
+        try:
+            await save_all()
+        finally:
+            await super().close()
+
 
 bot = MyBot(command_prefix="s!", intents=INTENTS, test_guilds=[GUILD_ID_BETA], help_command=None)
 
@@ -76,16 +90,30 @@ async def load(ctx, extension):
 async def load_all():
     await Continent().load(bot)
     await ItemCompendium().load()
+    await ActivePills().load()
+    await import_legacy_tax_details()
     await Bestiary().load()
+    await Bestiary().recompute_pet_combat_power()
     await ChestLootConfig().load()
     await RingStorage().load()
     await PlayerRoster().load()
     await AuctionHouse().load()
+    await MarketBook().load()
+    await Leaderboards().load()
+    await MatchmakingPool().load()
     await BattleManager().load()
+    await RaidManager().load()
     await RuinsManager().load()
     # await GamingHouse().load()
 
 
+async def save_all():
+    await Continent().checkpoint_origin_qi_counter()
+    await ActivePills().flush()
+    await RaidManager().flush_all()
+    await MessageRefresher().shutdown()
+
+
 # Load the database before loaded the modules since module initialization may depend on the database
 bot.loop.run_until_complete(init_database())
 bot.loop.run_until_complete(load_all())
@@ -0,0 +1,232 @@
+from asyncio import Lock
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncIterator, Optional, Union
+
+from utils.Database import Users
+from utils.InventoryUtils import ITEM_TYPE_PILL
+from utils.LoggingUtils import log_event
+from utils.base import singleton
+from world.compendium import ItemCompendium
+
+_SHORT_NAME: str = "active_pills"
+
+PILL_EFFECT_BEAST_LURE: str = "BEAST_LURE"
+PILL_EFFECT_FLAME_SWALLOW: str = "FLAME_SWALLOW"
+PILL_EFFECT_REFINE: str = "PILL_REFINE"
+
+ACTIVE_PILL_FLUSH_INTERVAL: timedelta = timedelta(seconds=30)
+
+_INDEXED_EFFECTS: tuple[str, ...] = (PILL_EFFECT_REFINE, PILL_EFFECT_FLAME_SWALLOW, PILL_EFFECT_BEAST_LURE)
+_FLAME_PAIR: tuple[str, str] = ("icypill", "pathpill")
+_FLAME_PAIR_BONUS: int = 25
+_PERMANENT_FLAME_PILL: str = "bloodlotuspill"
+
+
+class ActivePillState:
+    def __init__(self, user_id: int, pill_used: list[str], battle_boost: list[int]):
+        self.user_id: int = user_id
+        self.pill_used: list[str] = pill_used
+        self.battle_boost: list[int] = battle_boost
+        self.pill_used_dirty: bool = False
+        self.battle_boost_dirty: bool = False
+
+    def __repr__(self) -> str:
+        return f"ActivePillState {{user_id: {self.user_id}, pill_used: {self.pill_used}, battle_boost: {self.battle_boost}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    @property
+    def dirty(self) -> bool:
+        return self.pill_used_dirty or self.battle_boost_dirty
+
+
+@singleton
+class ActivePills:
+    """
+    Pill effects indexed by (pill id, effect kind) along with the used pills and battle boost of the players who recently fought, so computing the pill bonus
+    doesn't touch the database. Changes are written back by flush(), code writing pill_used or battle_boost directly must do so within exclusive(),
+    or within bulk_write() when the writes concern many players.
+    """
+
+    def __init__(self):
+        self._effects: dict[tuple[str, str], Any] = {}
+        self._effect_pills: list[str] = []  # Pills having at least one indexed effect, in compendium order
+        self._states: dict[int, ActivePillState] = {}
+        self._dirty: set[int] = set()
+        self._generation: int = 0  # Bumped whenever the cache is cleared, a database read started before that is stale
+        self._bulk_lock: Lock = Lock()
+        self._user_locks: dict[int, Lock] = {}
+        self._user_lock_holders: dict[int, int] = {}  # Tasks holding or waiting for each user lock, the lock is dropped once nobody needs it
+
+    # ============================================= Special methods =============================================
+
+    def __repr__(self) -> str:
+        return f"ActivePills {{indexed pills: {len(self._effect_pills)}, cached players: {len(self._states)}, pending writes: {len(self._dirty)}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ============================================== "Real" methods =============================================
+
+    async def compute_bonus(self, user_id: int, battle: int = 0, refine_pill: bool = False, flame_remove: bool = False, beast_l_remove: bool = False) -> tuple[int, int, int, Optional[list[int]]]:
+        state: ActivePillState = await self.get(user_id)
+        pill_used_list: list[str] = list(state.pill_used)
+        battle_boost: list[int] = list(state.battle_boost)
+        pill_refine, flame_swallow, b_boost, beast_l = 0, 0, battle_boost[0], None
+
+        for pill_id in self._effect_pills:
+            if pill_id not in pill_used_list:
+                continue
+
+            refine_effect = self._effects.get((pill_id, PILL_EFFECT_REFINE))
+            flame_effect = self._effects.get((pill_id, PILL_EFFECT_FLAME_SWALLOW))
+            beast_lure_eff = self._effects.get((pill_id, PILL_EFFECT_BEAST_LURE))
+
+            if refine_effect:
+                pill_refine += refine_effect
+                if refine_pill is True:
+                    pill_used_list.remove(pill_id)
+
+            if flame_effect:
+                if all(paired_id in pill_used_list for paired_id in _FLAME_PAIR):
+                    flame_swallow += _FLAME_PAIR_BONUS
+                    if flame_remove is True:
+                        for paired_id in _FLAME_PAIR:
+                            pill_used_list.remove(paired_id)
+                else:
+                    flame_swallow += flame_effect
+                    if pill_id != _PERMANENT_FLAME_PILL and flame_remove is True:
+                        pill_used_list.remove(pill_id)
+
+            if beast_lure_eff and beast_l is None:
+                beast_l = list(beast_lure_eff)
+                if beast_l_remove is True:
+                    pill_used_list.remove(pill_id)
+
+        if len(pill_used_list) != len(state.pill_used):
+            state.pill_used = pill_used_list
+            state.pill_used_dirty = True
+            self._dirty.add(user_id)
+
+        if battle > 0:
+            battle_boost[1] -= battle
+            state.battle_boost = battle_boost if battle_boost[1] > 0 else [0, 0]
+            state.battle_boost_dirty = True
+            self._dirty.add(user_id)
+
+        return pill_refine, flame_swallow, b_boost, beast_l
+
+    @asynccontextmanager
+    async def exclusive(self, user_id: int) -> AsyncIterator[None]:
+        # Writes the pending changes of the player and keeps them out of the cache until the block exits, so a read-modify-write of pill_used or
+        # battle_boost made within it can neither be ignored by the bonus computations nor overwritten by a stale state
+        lock: Lock = self._user_locks.setdefault(user_id, Lock())
+        self._user_lock_holders[user_id] = self._user_lock_holders.get(user_id, 0) + 1
+        try:
+            async with lock:
+                await self.release(user_id)
+                yield
+        finally:
+            holders: int = self._user_lock_holders[user_id] - 1
+            if holders > 0:
+                self._user_lock_holders[user_id] = holders
+            else:
+                self._user_lock_holders.pop(user_id)
+                self._user_locks.pop(user_id)
+
+    def effect(self, pill_id: str, effect_kind: str) -> Optional[Any]:
+        return self._effects.get((pill_id, effect_kind))
+
+    async def flush(self, user_ids: Optional[list[int]] = None):
+        for user_id in list(self._dirty) if user_ids is None else [user_id for user_id in user_ids if user_id in self._dirty]:
+            self._dirty.discard(user_id)
+            state: Optional[ActivePillState] = self._states.get(user_id)
+            if state is None or not state.dirty:
+                continue
+
+            # Snapshot before awaiting, the state may change while the update is in flight
+            changes: dict[str, list] = {}
+            if state.pill_used_dirty:
+                changes["pill_used"] = list(state.pill_used)
+
+            if state.battle_boost_dirty:
+                changes["battle_boost"] = list(state.battle_boost)
+
+            state.pill_used_dirty = False
+            state.battle_boost_dirty = False
+            try:
+                await Users.filter(user_id=user_id).update(**changes)
+            except Exception as e:
+                state.pill_used_dirty = state.pill_used_dirty or "pill_used" in changes
+                state.battle_boost_dirty = state.battle_boost_dirty or "battle_boost" in changes
+                self._dirty.add(user_id)
+                _log(user_id, f"Failed to write the active pills back: {e}", "ERROR")
+
+    @asynccontextmanager
+    async def bulk_write(self) -> AsyncIterator[None]:
+        # Writes every pending change and empties the cache, no player is cached again until the block exits so the direct writes made within it can't be
+        # overwritten by a stale state
+        async with self._bulk_lock:
+            await self.release_all()
+            yield
+
+    async def get(self, user_id: int) -> ActivePillState:
+        state: Optional[ActivePillState] = self._states.get(user_id)
+        while state is None:
+            if self._bulk_lock.locked():
+                async with self._bulk_lock:
+                    pass
+
+            user_lock: Optional[Lock] = self._user_locks.get(user_id)
+            if user_lock is not None and user_lock.locked():
+                async with user_lock:
+                    pass
+
+            generation: int = self._generation
+            pill_used, battle_boost = await Users.get_or_none(user_id=user_id).values_list("pill_used", "battle_boost")
+            state = self._states.get(user_id)
+            if state is None and generation == self._generation and not self._bulk_lock.locked() and not self._is_user_locked(user_id):
+                state = ActivePillState(user_id, pill_used, battle_boost if battle_boost is not None else [0, 0])
+                self._states[user_id] = state
+
+        return state
+
+    async def load(self):
+        effects: dict[tuple[str, str], Any] = {}
+        effect_pills: list[str] = []
+        for definition in ItemCompendium().find(item_type=ITEM_TYPE_PILL):
+            consume_effects: dict[str, Any] = definition.consume_effects
+            indexed: bool = False
+            for effect_kind in _INDEXED_EFFECTS:
+                value: Optional[Any] = consume_effects.get(effect_kind)
+                if value:
+                    effects[(definition.item_id, effect_kind)] = value
+                    indexed = True
+
+            if indexed:
+                effect_pills.append(definition.item_id)
+
+        self._effects = effects
+        self._effect_pills = effect_pills
+        _log("system", f"Loaded {self}")
+
+    async def release(self, user_id: int):
+        # Writes the pending changes of the player and forgets them, the next computation reads the database again
+        await self.flush([user_id])
+        self._states.pop(user_id, None)
+        self._generation += 1
+
+    async def release_all(self):
+        await self.flush()
+        self._states.clear()
+        self._generation += 1
+
+    def _is_user_locked(self, user_id: int) -> bool:
+        user_lock: Optional[Lock] = self._user_locks.get(user_id)
+        return user_lock is not None and user_lock.locked()
+
+
+def _log(user_id: Union[int, str], message: str, level: str = "INFO"):
+    log_event(user_id, _SHORT_NAME, message, level)
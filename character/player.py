@@ -23,6 +23,8 @@ from world.bestiary import Bestiary, PetBeastDefinition
 from world.continent import Continent
 from world.cultivation import PlayerCultivationStage, generate_player_cultivation_stage_matrix, BeastCultivationStage
 from world.compendium import ItemCompendium, ItemDefinition, FlameDefinition, QiMethodManualDefinition
+from world.leaderboard import Leaderboards
+from world.matchmaking import MatchmakingPool
 
 MESSAGE_EXP_COUNT_LIMIT: int = 100
 MESSAGE_EXP_COOLDOWN: timedelta = timedelta(minutes=1)
@@ -158,11 +160,15 @@ class Player(Character):
 
     async def persist(self):
         """Save stats to database"""
+        leaderboards: Leaderboards = Leaderboards()
         if self._core_altered:
             await self.persist_core()
+            leaderboards.update_gold(self._id, self._wallet.gold)
 
         if self._cultivation_altered:
             await self.persist_cultivation()
+            leaderboards.update_cultivation(self._id, self._cultivation_stage.major, self._cultivation_stage.minor, self._current_experience)
+            MatchmakingPool().update_cultivation(self._id, self._cultivation_stage.major)
 
         if self._pvp_altered:
             await self.persist_pvp()
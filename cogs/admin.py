@@ -4,10 +4,11 @@ import disnake
 from disnake.ext import commands
 from tortoise.expressions import F
 
+from character.active_pills import ActivePills
 from character.player import PVP_REWARDS, PlayerRoster, Player
 from cogs.timeflow import time_flow
 from utils import InventoryUtils
-from utils.Database import Pet, Temp, Users, Alchemy, Cultivation, Pvp, Crafting, GuildOptions
+from utils.Database import Pet, Temp, Users, Alchemy, Cultivation, Pvp, Crafting
 from utils.EconomyUtils import CURRENCY_NAME_GOLD, CURRENCY_NAME_ARENA_COIN, EVENT_SHOP
 from utils.Embeds import BasicEmbeds
 from utils.InventoryUtils import remove_from_inventory, inventory_view
@@ -15,6 +16,9 @@ from utils.LoggingUtils import log_event
 from utils.ParamsUtils import elo_from_rank_points
 from utils.base import BaseStarfallCog
 from world.compendium import autocomplete_item_id
+from world.leaderboard import Leaderboards
+from world.continent import Continent
+from world.matchmaking import MatchmakingPool
 import logging
 
 class RemoveButton(disnake.ui.Button):
@@ -55,36 +59,34 @@ class Admin(BaseStarfallCog):
     @commands.command(name="set_qi_counter")
     @commands.has_permissions(manage_guild=True)
     async def set_qi_counter(self, inter, count: int = 1):
-        qi_counter = await GuildOptions.get_or_none(name="qi_counter").values_list("value", flat=True)
-        if qi_counter is None:
-            await GuildOptions.create(name="qi_counter", value=1)
-
-        await GuildOptions.filter(name="qi_counter").update(value=count)
+        await Continent().set_origin_qi_counter(count)
+        await Continent().checkpoint_origin_qi_counter()
         await inter.send(f"Qi counter set to {count}")
 
     @commands.command(name="reset_daily_tax")
     @commands.has_permissions(manage_guild=True)
     async def reset_daily_tax(self, _, count: int = -1):
         if count < 0:
-            qi_counter = await GuildOptions.get_or_none(name="qi_counter").values_list("value", flat=True)
-            if qi_counter is None:
-                await GuildOptions.create(name="qi_counter", value=1)
-                qi_counter = 1
+            await Continent().increase_origin_qi_counter()
+        else:
+            await Continent().set_origin_qi_counter(count)
 
-            count = int(qi_counter) + 1
+        await Continent().checkpoint_origin_qi_counter()
 
-        await GuildOptions.filter(name="qi_counter").update(value=count)
+        async with ActivePills().bulk_write():
+            all_users = await Pvp.all().values_list("user__pill_used", "rank_points", "user_id")
+            for user in all_users:
+                pill_used_list, rank_point, user_id = user
+                pill_list_update = [pill_id for pill_id in pill_used_list if pill_id != 'recpill']
 
-        all_users = await Pvp.all().values_list("user__pill_used", "rank_points", "user_id")
-        for user in all_users:
-            pill_used_list, rank_point, user_id = user
-            pill_list_update = [pill_id for pill_id in pill_used_list if pill_id != 'recpill']
+                elo_rank, elo_sub_rank, excess_points = elo_from_rank_points(rank_point)
+                user_rank_reward = PVP_REWARDS[f"{elo_sub_rank} {elo_rank}"]
+                money, coins = user_rank_reward
+                await Users.filter(user_id=user_id).update(pill_used=pill_list_update, money=F("money") + money)
+                await Pvp.filter(user_id=user_id).update(pvp_coins=F("pvp_coins") + coins)
 
-            elo_rank, elo_sub_rank, excess_points = elo_from_rank_points(rank_point)
-            user_rank_reward = PVP_REWARDS[f"{elo_sub_rank} {elo_rank}"]
-            money, coins = user_rank_reward
-            await Users.filter(user_id=user_id).update(pill_used=pill_list_update, money=F("money") + money)
-            await Pvp.filter(user_id=user_id).update(pvp_coins=F("pvp_coins") + coins)
+        # The rewards bypassed the balance index
+        await Leaderboards().load_gold()
 
     @commands.slash_command()
     @commands.default_member_permissions(manage_guild=True)
@@ -173,7 +175,8 @@ class Admin(BaseStarfallCog):
 
     @admin.sub_command(name="clear_pill_used", description="Clear pill_used")
     async def clear_pill_used(self, inter: disnake.CommandInteraction, member: disnake.Member):
-        await Users.filter(user_id=member.id).update(pill_used=[])
+        async with ActivePills().exclusive(member.id):
+            await Users.filter(user_id=member.id).update(pill_used=[])
         embed = disnake.Embed(
             description=f"Cleared pill_used",
             color=inter.author.color
@@ -183,6 +186,7 @@ class Admin(BaseStarfallCog):
     @adminreset.sub_command(name="pvp_reset", description="Reset all pvp stats to zero")
     async def pvp_reset(self, ctx):
         await Pvp.all().update(rank_points=0, pvp_promo=0, pvp_demote=0, rank_points_before_promo=0)
+        await MatchmakingPool().load()
         embed = disnake.Embed(
             description=f"All users have been reset to 0 rank points (Unranked).",
             color=ctx.author.color
@@ -192,6 +196,7 @@ class Admin(BaseStarfallCog):
     @admin.sub_command(name="pvp_set", description="Sets rank points for a specific member")
     async def pvp_set(self, inter: disnake.CommandInteraction, member: disnake.Member, points: int):
         await Pvp.filter(user_id=member.id).update(rank_points=points)
+        MatchmakingPool().update_rank_points(member.id, points)
 
         embed = disnake.Embed(
             description=f"Set rank points of {member.mention} to {points}.",
@@ -294,6 +299,7 @@ class Admin(BaseStarfallCog):
     @admin.sub_command(name="remove_all_pets", description="Remove all the pets of someone")
     async def remove_all_pets(self, inter: disnake.CommandInteraction, member: disnake.Member):
         await Pet.filter(user_id=member.id).delete()
+        Leaderboards().remove_pet(member.id)
         embed = BasicEmbeds.right_tick(f"Removed all pets for {member.mention}")
         await inter.response.send_message(embed=embed)
 
@@ -331,12 +337,14 @@ class Admin(BaseStarfallCog):
     @admin.sub_command(name="alchemy_set", description="Set alchemy stats")
     async def alchemy_set(self, inter: disnake.CommandInteraction, member: disnake.Member, user_tier: int, user_exp: int = 0, tier_chance: int = 5):
         await Alchemy.filter(user_id=member.id).update(next_tier_chance=tier_chance, pill_refined={}, a_lvl=user_tier, a_exp=user_exp)
+        Leaderboards().update_alchemy(member.id, user_tier, user_exp)
         embed = BasicEmbeds.right_tick(f"Tier Set to `{user_tier}` for `{member.name}`")
         await inter.response.send_message(embed=embed)
 
     @admin.sub_command(name="craft_set", description="Set craft stats")
     async def craft_set(self, inter: disnake.CommandInteraction, member: disnake.Member, user_tier: int, user_exp: int = 0):
         await Crafting.filter(user_id=member.id).update(c_lvl=user_tier, c_exp=user_exp)
+        Leaderboards().update_craft(member.id, user_tier, user_exp)
         embed = BasicEmbeds.right_tick(f"Crafting tier set to `{user_tier}`, `{user_exp}` EXP for `{member.name}`")
         await inter.response.send_message(embed=embed)
 
@@ -356,6 +364,13 @@ class Admin(BaseStarfallCog):
             for player in players:
                 await player.add_experience(exp, False)
 
+        # The bulk updates bypassed the leaderboard index, re-index from the database once done
+        if gold > 0:
+            await Leaderboards().load_gold()
+
+        if exp > 0:
+            await Leaderboards().load_cultivation()
+
         embed = BasicEmbeds.right_tick(f"Gave everyone {energy} energy, {gold} gold and {exp} exp")
         await inter.response.send_message(embed=embed)
 
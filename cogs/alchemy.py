@@ -5,6 +5,7 @@ from typing import Optional
 import disnake
 from disnake.ext import commands
 
+from character.active_pills import ActivePills
 from character.player import PlayerRoster, compute_flame_bonus
 from utils import DatabaseUtils
 from utils.CommandUtils import drop_origin_qi
@@ -14,6 +15,7 @@ from utils.InventoryUtils import ConfirmDelete, check_inv_weight, check_item_in_
 from utils.LoggingUtils import log_event
 from utils.ParamsUtils import format_num_simple
 from utils.Styles import TICK, PLUS, ITEM_EMOJIS
+from world.leaderboard import Leaderboards
 
 # =====================================
 # Alchemy specific params
@@ -210,9 +212,10 @@ class AlchemyMenu(disnake.ui.View):
             return False
 
         if user_flame == 'conpillflame':  # Special case (one time use flame)
-            pill_used_list = await Users.get(user_id=self.author.id).values_list("pill_used", flat=True)
-            pill_used_list.remove("conpill")
-            await Users.filter(user_id=self.author.id).update(pill_used=pill_used_list)
+            async with ActivePills().exclusive(self.author.id):
+                pill_used_list = await Users.get(user_id=self.author.id).values_list("pill_used", flat=True)
+                pill_used_list.remove("conpill")
+                await Users.filter(user_id=self.author.id).update(pill_used=pill_used_list)
             await Alchemy.filter(user_id=self.author.id).update(flame=None)  # Flame disappears
 
         return True
@@ -335,6 +338,7 @@ class AlchemyMenu(disnake.ui.View):
                     user_exp += pill_exp_given
                     log_event(inter.author.id, "alchemy", f"Increase the EXP by {pill_exp_given:,}, total {user_exp:,} EXP")
                 await Alchemy.filter(user_id=inter.author.id).update(a_lvl=user_level, a_exp=user_exp)
+                Leaderboards().update_alchemy(inter.author.id, user_level, user_exp)
 
             # Update pill refined dict
             await Alchemy.filter(user_id=inter.author.id).update(pill_refined=refined_pills)
@@ -455,6 +459,7 @@ class AlchemySystem(commands.Cog):
             if not elem_heart_check:
                 if alchemy_data[0] == 6 and alchemy_data[1] == 0:
                     await Alchemy.filter(user_id=inter.author.id).update(a_exp=1)
+                    Leaderboards().update_alchemy(inter.author.id, alchemy_data[0], 1)
                     await add_to_inventory(inter.author.id, "elemheartpill", 1)
 
                     embed = BasicEmbeds.empty_embed()
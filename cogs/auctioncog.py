@@ -3,23 +3,26 @@ from time import time
 from typing import Optional, Union, Any, Coroutine, Callable
 
 import disnake
-from disnake.ext import commands, tasks
+from disnake.ext import commands
 
-from adventure.auction import EXPECTED_LOOP_DELAY_SECONDS, MINIMUM_BID, MINIMUM_INCREMENT, DEFAULT_DURATION, MINIMUM_DURATION, AuctionHouse, AuctionedItem, MAXIMUM_DURATION
+from adventure.auction import MINIMUM_BID, MINIMUM_INCREMENT, DEFAULT_DURATION, MINIMUM_DURATION, AuctionHouse, AuctionedItem, AuctionReplay, MAXIMUM_DURATION
 from cogs.crafting import generate_unique_item, PROP_CAULDRON_COOLDOWN_REDUCTION, PROP_CAULDRON_REFINE_BONUS, UNSTACKABLE_ITEM_TYPES
 from utils.CommandUtils import unregister_item_expiration, ORIGIN_QI_LIFESPAN
-from utils.Database import Market
 from utils.DatabaseUtils import compute_market_userinfo
 from utils.Embeds import BasicEmbeds
 from utils.InventoryUtils import ConfirmDelete, check_item_in_inv, convert_id, remove_from_inventory, ITEM_TYPE_ORIGIN_QI, ITEM_TYPE_CHEST
 from utils.LoggingUtils import log_event
 from utils.base import BaseStarfallCog, CogNotLoadedError
+from utils.scheduler import Scheduler
 from world.compendium import ItemCompendium, autocomplete_item_id, ItemDefinition
+from world.market_book import MarketBook
 
 _SHORT_NAME: str = "auction"
-_MAIN_LOOP_DELAY_SECONDS: int = EXPECTED_LOOP_DELAY_SECONDS
-_COUNTDOWN_LOOP_DELAY_SECONDS: int = 3
+_ESCROW_AUDIT_INTERVAL: timedelta = timedelta(hours=1)
 _MINIMUM_OQI_REMAINING_LIFETIME: timedelta = timedelta(hours=1)
+_MAXIMUM_REPLAY_DIVERGENCE_DISPLAY: int = 10
+
+_JOB_ESCROW_AUDIT: str = "auction.escrow_audit"
 
 
 class AuctionHouseNotLoadedError(CogNotLoadedError):
@@ -34,15 +37,17 @@ class AuctionHouseCog(BaseStarfallCog):
     # ========================================= Disnake lifecycle methods ========================================
 
     async def _do_load(self):
-        if not self.main_auction_loop.is_running():
-            self.main_auction_loop.start()
+        scheduler: Scheduler = Scheduler()
+        scheduler.schedule_recurring(_JOB_ESCROW_AUDIT, self.escrow_audit_loop, _ESCROW_AUDIT_INTERVAL)
+        scheduler.start(self._bot)
 
-        if not self.countdown_auction_loop.is_running():
-            self.countdown_auction_loop.start()
+        # Auction phases are driven by their own deadlines rather than by polling
+        AuctionHouse().start_transitions()
 
     def _do_unload(self):
-        self.main_auction_loop.cancel()
-        self.countdown_auction_loop.cancel()
+        scheduler: Scheduler = Scheduler()
+        scheduler.cancel(_JOB_ESCROW_AUDIT)
+        AuctionHouse().stop_transitions()
         self._active_auctions: set[AuctionedItem] = set()
         self._countdown_auctions: set[AuctionedItem] = set()
         self._auctions_by_ids: dict[int, AuctionedItem] = dict()
@@ -52,23 +57,11 @@ class AuctionHouseCog(BaseStarfallCog):
         return AuctionHouse().persistent_views
 
     # Loop management
-    @tasks.loop(seconds=_MAIN_LOOP_DELAY_SECONDS)
-    async def main_auction_loop(self):
-        house: AuctionHouse = AuctionHouse()
-        await house.update_all_auction_states()
-
-    @tasks.loop(seconds=_COUNTDOWN_LOOP_DELAY_SECONDS)
-    async def countdown_auction_loop(self):
-        house: AuctionHouse = AuctionHouse()
-        await house.update_countdown_auction_states()
-
-    @main_auction_loop.before_loop
-    async def before_main_auction_loop(self):
-        await self._bot.wait_until_ready()
-
-    @countdown_auction_loop.before_loop
-    async def before_countdown_auction_loop(self):
-        await self._bot.wait_until_ready()
+    @staticmethod
+    async def escrow_audit_loop():
+        drifts: dict[int, tuple[int, int]] = AuctionHouse().audit_escrow()
+        if len(drifts) > 0:
+            _log("system", f"Escrow audit corrected the reserved amount of {len(drifts)} players")
 
     # ============================================= Discord commands ============================================
 
@@ -101,7 +94,7 @@ class AuctionHouseCog(BaseStarfallCog):
             await view.wait()
             if view.confirm:
                 house: AuctionHouse = AuctionHouse()
-                item_count = await Market.filter(user_id=inter.author.id).count()
+                item_count = MarketBook().count_by_owner(inter.author.id)
                 item_count += house.active_auction_count(author_id=inter.author.id)
                 _, _, _, item_limit, _, _ = await compute_market_userinfo(inter.author.id)
 
@@ -211,6 +204,23 @@ class AuctionHouseCog(BaseStarfallCog):
     async def slash_auction_admin_refresh(self, inter: disnake.CommandInteraction, auction_id: str = commands.Param(name="auction_id", description="The auction id (can be found in the auction's footer)")):
         await self._force_auction_update(inter, int(auction_id), f"Auction {auction_id} display was refreshed")
 
+    @slash_auction_admin.sub_command(name="replay", description="Rebuilds the winning bid of an auction from its bid ledger and reports any difference.")
+    async def slash_auction_admin_replay(self, inter: disnake.CommandInteraction, auction_id: str = commands.Param(name="auction_id", description="The auction id (can be found in the auction's footer)"),
+                                        restore: bool = commands.Param(False, name="restore", description="Replace the winning bid of a running auction by the replayed one if they differ")):
+        await inter.response.defer()
+
+        replay: Optional[AuctionReplay] = await AuctionHouse().replay_auction(int(auction_id), restore)
+        if replay is None:
+            await inter.followup.send(embed=BasicEmbeds.exclamation(f"There's no auction with id {auction_id}"))
+        elif replay.consistent:
+            await inter.followup.send(embed=BasicEmbeds.right_tick(f"Replayed {replay.bid_count:,} bids on auction {auction_id}, the ledger matches the auction state: {replay.winning_bid}"))
+        else:
+            divergences: str = "\n".join(f"- {divergence}" for divergence in replay.divergences[:_MAXIMUM_REPLAY_DIVERGENCE_DISPLAY])
+            if len(replay.divergences) > _MAXIMUM_REPLAY_DIVERGENCE_DISPLAY:
+                divergences += f"\n- ... and {len(replay.divergences) - _MAXIMUM_REPLAY_DIVERGENCE_DISPLAY:,} more"
+
+            await inter.followup.send(embed=BasicEmbeds.exclamation(f"Replayed {replay.bid_count:,} bids on auction {auction_id}, ending on {replay.winning_bid}.\n\n{divergences}"))
+
     @staticmethod
     async def _force_auction_update(inter: disnake.CommandInteraction, auction_id: int, message: str, action: Optional[Callable[[AuctionedItem], Coroutine[Any, Any, Any]]] = None):
         await inter.response.defer()
@@ -223,6 +233,7 @@ class AuctionHouseCog(BaseStarfallCog):
         else:
             if action is not None:
                 await action(auction)
+                house.reschedule_transition(auction)
 
             await house.refresh_message(auction)
             await inter.followup.send(embed=BasicEmbeds.exclamation(message))
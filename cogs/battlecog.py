@@ -1,12 +1,16 @@
+from datetime import timedelta
 from typing import Union
 
-from disnake.ext import commands, tasks
+from disnake.ext import commands
 
 from adventure.battle import BattleManager
 from utils.LoggingUtils import log_event
 from utils.base import BaseStarfallCog
+from utils.scheduler import Scheduler, CatchUpPolicy
 
 _SHORT_NAME: str = "battle"
+_JOB_ARCHIVE: str = "battle.archive"
+_ARCHIVE_INTERVAL: timedelta = timedelta(hours=12)
 
 
 class BattleManagerCog(BaseStarfallCog):
@@ -16,16 +20,16 @@ class BattleManagerCog(BaseStarfallCog):
     # ========================================= Disnake lifecycle methods ========================================
 
     async def _do_load(self):
-        if not self.periodic_purge.is_running():
-            self.periodic_purge.start()
+        scheduler: Scheduler = Scheduler()
+        scheduler.schedule_recurring(_JOB_ARCHIVE, self.periodic_archive, _ARCHIVE_INTERVAL, jitter=timedelta(minutes=5), catch_up=CatchUpPolicy.RUN_ONCE)
+        scheduler.start(self.bot)
 
     def _do_unload(self):
-        if self.periodic_purge.is_running():
-            self.periodic_purge.cancel()
+        Scheduler().cancel(_JOB_ARCHIVE)
 
-    @tasks.loop(hours=12)
-    async def periodic_purge(self):
-        await BattleManager().purge_irrelevant_battles()
+    @staticmethod
+    async def periodic_archive():
+        await BattleManager().archive_old_battles()
 
 
 def _log(user_id: Union[int, str], message: str):
@@ -6,6 +6,7 @@ from disnake.ext import commands
 
 from world.bestiary import Bestiary, BeastDefinition, BeastDefinitionEmbed, PetBeastDefinition, PetBeastDefinitionEmbed, autocomplete_beast_name, autocomplete_pet_name, VARIANT_NORMAL, VARIANTS
 from world.compendium import ItemCompendium
+from world.leaderboard import Leaderboards
 from utils.LoggingUtils import log_event
 from utils.base import BaseStarfallCog
 
@@ -66,6 +67,13 @@ class BestiaryCog(BaseStarfallCog):
                          f"\nBeast Created: {beast_created_count}, Beast Updated: {beast_updated_count}, Beast Deleted: {beast_deleted_count}."
                          f"\nPet Created: {pet_created_count}, Pet Updated: {pet_updated_count}, Pet Deleted: {pet_deleted_count}")
 
+    @slash_bestiary.sub_command(name="recompute_pet_cp", description="Recompute the combat power of every pet, required after rebalancing the pets")
+    async def slash_bestiary_recompute_pet_cp(self, inter: disnake.CommandInteraction):
+        await inter.response.defer()
+        scanned_count, updated_count = await Bestiary().recompute_pet_combat_power()
+        await Leaderboards().load_pets()
+        await inter.send(f"Pet combat power recomputed.\nPets Scanned: {scanned_count}, Pets Updated: {updated_count}")
+
 
 def _log(user_id: Union[int, str], message: str):
     log_event(user_id, "bestiary", message)
@@ -14,6 +14,7 @@ from utils.Styles import EXCLAMATION, PLUS
 from utils.LoggingUtils import log_event
 from utils.loot import WeightedChoice
 from world.compendium import ItemCompendium, ItemDefinition, CauldronDefinition
+from world.leaderboard import Leaderboards
 
 PROP_CRAFT = "craft"
 PROP_REQUIREMENTS = "requirements"
@@ -61,6 +62,7 @@ async def check_for_lvl_up(user_id, exp_to_give, user_tier, user_exp):
         log_event(user_id, "craft", f"Level reached {user_tier}, {updated_user_exp} EXP left")
 
     await Crafting.filter(user_id=user_id).update(c_lvl=user_tier, c_exp=updated_user_exp)
+    Leaderboards().update_craft(user_id, user_tier, updated_user_exp)
 
     return lvl_up, user_tier
 
@@ -280,6 +282,7 @@ class CraftingMenu(disnake.ui.View):
         crafting_data = await Crafting.get_or_none(user_id=inter.author.id).values_list("c_lvl", "c_exp", "crafted", "craft_cooldown")
         if crafting_data is None:
             await Crafting.create(user_id=inter.author.id, c_lvl=0, c_exp=0, crafted=[])
+            Leaderboards().update_craft(inter.author.id, 0, 0)
             crafting_data = (0, 0, [], 0)
             log_event(inter.author.id, "craft", f"Added user to crafting table")
 
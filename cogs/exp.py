@@ -1,3 +1,4 @@
+import asyncio
 import math
 import random
 from io import BytesIO
@@ -6,11 +7,10 @@ from typing import Optional
 import disnake
 from PIL import Image, ImageFont, ImageDraw
 
-from adventure.auction import AuctionHouse
-from character.player import PlayerRoster, Player, compute_pet_cp, compute_user_exp_bonus
+from character.player import PlayerRoster, Player, compute_user_exp_bonus
 
 from utils.Database import Alchemy, AllItems, Cultivation, GuildOptionsDict, Pvp, Factions, Crafting, Pet
-from utils.DatabaseUtils import add_permanent_boost, check_for_great_ruler, compute_pill_bonus
+from utils.DatabaseUtils import add_permanent_boost, compute_pill_bonus
 from disnake.ext import commands
 from datetime import timedelta, datetime
 
@@ -22,10 +22,28 @@ from utils.InventoryUtils import add_to_inventory, ConfirmDelete
 from utils.LoggingUtils import log_event
 from utils.ParamsUtils import format_num_abbr1, format_num_full, format_num_abbr0, detect_chinese, format_num_simple, generate_macro_question, elo_from_rank_points, compute_technique_cp_bonus
 from utils.Styles import BASIC_EMOJIS, CROSS, EXCLAMATION, PLUS, RIGHT, LEFT
+from utils.avatar_cache import AvatarCache
 from utils.base import BaseStarfallCog
+from utils.scheduler import Scheduler
+from utils.rank_card import RankCardData, RankCardRenderer, RANK_CARD_FILENAME, TITLE_NAME_MORTAL, TITLE_NAMES
+from utils.render_cache import RenderCache
 from world.cultivation import PlayerCultivationStage, BeastCultivationStage
+from world.leaderboard import Leaderboards, BOARD_CULTIVATION, BOARD_BALANCE, BOARD_ALCHEMY, BOARD_CRAFT, BOARD_PET
 from cogs.eventshop import EVENT_SHOP, EVENT_CONFIG
 
+GREAT_RULER_TITLE: str = "The Great Ruler"
+GREAT_RULER_COUNT: int = 3
+
+FIRMAMENT_BOARD_RENDER_NAMESPACE: str = "firmament_board"
+
+_JOB_AVATAR_PURGE: str = "exp.avatar_purge"
+_AVATAR_PURGE_INTERVAL: timedelta = timedelta(days=1)
+
+LEADERBOARD_BOARDS: dict[str, str] = {"Exp": BOARD_CULTIVATION, "Balance": BOARD_BALANCE, "Alchemy": BOARD_ALCHEMY, "Craft": BOARD_CRAFT, "Pet": BOARD_PET}
+LEADERBOARD_TITLES: dict[str, str] = {"Exp": "Level", "Balance": "Balance", "Alchemy": "Alchemy", "Craft": "Craft", "Pet": "Pet"}
+LEADERBOARD_FIELDS: dict[str, str] = {"Exp": "Exp", "Balance": "Balance", "Alchemy": "Alchemy", "Craft": "Crafting", "Pet": "Pet"}
+LEADERBOARD_PAGE_SIZES: dict[str, int] = {"Exp": 10, "Balance": 10, "Alchemy": 10, "Craft": 10, "Pet": 5}
+
 BOARD_COLOR_DICT = {
     "Red": (255, 0, 60),
     "Yellow": (255, 255, 0),
@@ -67,12 +85,23 @@ class Exp(BaseStarfallCog):
 
     def __init__(self, bot):
         super().__init__(bot, "Experience", "exp")
+        self._leaderboard_pages: LeaderboardPages = LeaderboardPages()
 
     async def _do_load(self):
-        pass
+        self._leaderboard_pages.clear()
+        await RankCardRenderer().load()
+        scheduler: Scheduler = Scheduler()
+        scheduler.schedule_recurring(_JOB_AVATAR_PURGE, self.purge_avatar_cache, _AVATAR_PURGE_INTERVAL, jitter=timedelta(minutes=30))
+        scheduler.start(self.bot)
 
     def _do_unload(self):
-        pass
+        self._leaderboard_pages.clear()
+        RankCardRenderer().clear()
+        Scheduler().cancel(_JOB_AVATAR_PURGE)
+
+    @staticmethod
+    async def purge_avatar_cache():
+        await asyncio.get_running_loop().run_in_executor(None, AvatarCache().purge_disk)
 
     @commands.slash_command(name="rank", description="Shows the level of a member")
     async def slash_rank(self,
@@ -84,9 +113,11 @@ class Exp(BaseStarfallCog):
 
         player: Player = PlayerRoster().find_player_for(inter, member)
 
-        all_users = await Cultivation.all().order_by("-major", "-minor", "-current_exp").values_list("user_id")
-        all_users = [user[0] for user in all_users]
-        rank = str(all_users.index(member.id) + 1)
+        leaderboards: Leaderboards = Leaderboards()
+        if member.id not in leaderboards[BOARD_CULTIVATION]:
+            leaderboards.update_cultivation(member.id, player.cultivation.major, player.cultivation.minor, player.current_experience)
+
+        rank = str(leaderboards.rank(BOARD_CULTIVATION, member.id))
         file = await self.make_rank_card(player, member, rank)
 
         view = disnake.ui.View()
@@ -97,114 +128,36 @@ class Exp(BaseStarfallCog):
 
     @staticmethod
     async def make_rank_card(player: Player, member: disnake.Member, rank):
-        title_name_list = [
-            "Fight_Disciple",
-            "Fight_Practitioner",
-            "Fight_Master",
-            "Fight_Grandmaster",
-            "Fight_Spirit",
-            "Fight_King",
-            "Fight_Emperor",
-            "Fight_Ancestor",
-            "Fight_Venerate",
-            "Peak_Fight_Venerate",
-            "Half_Saint",
-            "Fight_Saint",
-            "Fight_God",
-            "Fight_God",
-            "Fight_God",
-            "Fight_God"
-        ]
-
         exp: int = player.current_experience
         stage: PlayerCultivationStage = player.cultivation
         realm: str = stage.name
-        if stage.is_ruler:
-            tgr_check: str = await check_for_great_ruler(member.id)
-            if tgr_check:
-                realm = tgr_check
+        if stage.is_ruler and Leaderboards().is_top_ranked(BOARD_CULTIVATION, member.id, GREAT_RULER_COUNT):
+            realm = GREAT_RULER_TITLE
 
         p_exp: int = min(player.current_experience * 100 // stage.breakthrough_experience, 100)
         percent_floor: int = max(math.floor(p_exp / 10) * 10, 10)
-        title_name: str = "Mortal" if stage.major == 0 and stage.minor == 0 else title_name_list[stage.major]
-
-        font = ImageFont.truetype("./media/Rank/edosz.ttf", 74)
-        small_font = ImageFont.truetype("./media/Rank/edosz.ttf", 58)
-        very_small_rank_font = ImageFont.truetype("./media/Rank/edosz.ttf", 42)
-        chinese_font = ImageFont.truetype("./media/Rank/SentyZHAO-20180827.ttf", 64)
+        title_name: str = TITLE_NAME_MORTAL if stage.major == 0 and stage.minor == 0 else TITLE_NAMES[stage.major]
 
         if member.avatar is None:
             member_pic = member.guild.me.avatar.with_size(256)
         else:
             member_pic = member.avatar.with_size(256)
 
-        data1 = BytesIO(await member_pic.read())
-
-        user_pic = Image.open(data1)
-        user_pic = user_pic.resize((350, 350))
-
-        big_size = (user_pic.size[0] * 3, user_pic.size[1] * 3)
-        mask = Image.new('L', big_size, 0)
-
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse((0, 0) + big_size, fill=255)
-
-        mask = mask.resize(user_pic.size, Image.LANCZOS)
-        while len(rank) < 5:
-            rank = "0" + rank
-        rank_num_list = [(Image.open(f'./media/Rank/Number_Rank/{digit}.png')).resize((35, 57)) for digit in rank]
-
-        user_title = Image.open(f"./media/Rank/Titles/{title_name}.png")
-        user_title = user_title.resize((525, 130))
-
-        exp_bar = Image.open(f"./media/Rank/ExpBar/{title_name}{percent_floor}.png")
-        exp_bar = exp_bar.resize((2050, 140))
-
-        base = Image.open("./media/Rank/base.png")
-        base = base.resize((2160, 722))
-
-        member_name = str(member)
-        member_name_font = chinese_font if detect_chinese(member_name) else font
-
         if stage.has_experience_cap:
             exp_text: str = f"{exp:,} / {stage.breakthrough_experience:,}"
         else:
             exp_text: str = f"{exp:,}"
 
-        card_text = ImageDraw.Draw(base)
-        card_text.text((585, 260), member_name, (0, 0, 0), anchor="lm", font=member_name_font)
-
-        if exp >= stage.breakthrough_experience and not stage.is_ruler:
-            card_text.text((1545, 458), exp_text, (255, 77, 77), anchor="lm", font=small_font)
-        else:
-            card_text.text((1545, 458), exp_text, (0, 0, 0), anchor="lm", font=small_font)
-
-        if stage.major == 13:
-            card_text.text((595, 458), realm, (0, 0, 0), anchor="lm", font=very_small_rank_font)
-        else:
-            card_text.text((595, 458), realm, (0, 0, 0), anchor="lm", font=small_font)
-
-        x_cords, y_cords = 130, 105
-        base.paste(user_pic, (x_cords, y_cords, x_cords + user_pic.size[0], y_cords + user_pic.size[1]), mask)
-
-        bar_x_cords, bar_y_cords = 70, 495
-        base.paste(exp_bar, (bar_x_cords, bar_y_cords, bar_x_cords + exp_bar.size[0], bar_y_cords + exp_bar.size[1]), exp_bar)
-
-        card_text.text((123, 563), "RANK :", (255, 255, 255), anchor="lm", font=small_font)
-
-        rank_x_cords, rank_y_cords = 298, 533
-        for image in rank_num_list:
-            base.paste(image, (rank_x_cords, rank_y_cords, image.size[0] + rank_x_cords, image.size[1] + rank_y_cords), image)
-            rank_x_cords += (3 + image.size[0])
-
-        title_x_cords, title_y_cords = 47, 355
-        base.paste(user_title, (title_x_cords, title_y_cords, title_x_cords + user_title.size[0], title_y_cords + user_title.size[1]), user_title)
+        member_name = str(member)
+        data: RankCardData = RankCardData(user_id=member.id, member_name=member_name, chinese_name=detect_chinese(member_name), realm=realm, small_realm=stage.major == 13, stage_key=(stage.major, stage.minor), title_name=title_name,
+                                          percent_floor=percent_floor, exp_text=exp_text, exp_over_cap=exp >= stage.breakthrough_experience and not stage.is_ruler, rank=int(rank), avatar_hash=member_pic.key)
 
-        buffer = BytesIO()
-        base.save(buffer, "png")
-        buffer.seek(0)
+        renderer: RankCardRenderer = RankCardRenderer()
+        card: Optional[bytes] = renderer.cached(data)
+        if card is None:
+            card = await renderer.render(data, await AvatarCache().get(member_pic))
 
-        file = disnake.File(fp=buffer, filename="base.png")
+        file = disnake.File(fp=BytesIO(card), filename=RANK_CARD_FILENAME)
         return file
 
     @commands.slash_command(name="cultivate")
@@ -552,11 +505,18 @@ class Exp(BaseStarfallCog):
             await inter.edit_original_message("Nothing to see here")
             return
 
-        file = self.make_firmament_board(board[:10])
+        file = await self.make_firmament_board(board[:10])
         await inter.edit_original_message(file=file)
 
     @staticmethod
-    def make_firmament_board(data_list):
+    async def make_firmament_board(data_list):
+        # Only the carvings are part of the key, so the board is rendered again only when one of them changes
+        image: bytes = await RenderCache().get(FIRMAMENT_BOARD_RENDER_NAMESPACE, [{"name": user["name"], "font": user["font"], "color": list(user["color"])} for user in data_list], Exp.render_firmament_board)
+        file = disnake.File(fp=BytesIO(image), filename="board.png")
+        return file
+
+    @staticmethod
+    def render_firmament_board(data_list) -> bytes:
         base = Image.new(mode="RGB", size=(720, 1080), color=(174, 181, 191))
 
         large_font = ImageFont.truetype("./media/Rank/edosz.ttf", 74)
@@ -589,10 +549,7 @@ class Exp(BaseStarfallCog):
 
         buffer = BytesIO()
         base.save(buffer, "png")
-        buffer.seek(0)
-
-        file = disnake.File(fp=buffer, filename="board.png")
-        return file
+        return buffer.getvalue()
 
     @commands.slash_command(name="profile", description="See Profile of the cultivator")
     async def slash_profile(self, inter: disnake.CommandInteraction, member: disnake.Member = None):
@@ -655,10 +612,8 @@ class Exp(BaseStarfallCog):
 
         player_cultivation: PlayerCultivationStage = player.cultivation
         realm: str = player_cultivation.name
-        if player_cultivation.major == 14:
-            tgr_check = await check_for_great_ruler(member.id)
-            if tgr_check:
-                realm = tgr_check
+        if player_cultivation.major == 14 and Leaderboards().is_top_ranked(BOARD_CULTIVATION, member.id, GREAT_RULER_COUNT):
+            realm = GREAT_RULER_TITLE
 
         if faction_data:
             faction = f"<@&{faction_data}>"
@@ -704,143 +659,133 @@ class Exp(BaseStarfallCog):
     @commands.slash_command(name="leaderboard", description="Show you a leaderboard of specific type")
     async def slash_leaderboard(self, inter, board_type: TYPE):
         await inter.response.defer()
-        leaderboard_embeds = []
+        view: LeaderboardView = LeaderboardView(self._leaderboard_pages, board_type, inter.author, inter.guild.icon.url)
+        embed: disnake.Embed = await view.current_embed()
+        await inter.edit_original_message(embed=embed, view=view)
+
+
+class LeaderboardPages:
+    # Renders leaderboard pages on demand from the ranking indexes and keeps them until their rank range changes
+    def __init__(self):
+        self._pages: dict[tuple[str, int], tuple[int, disnake.Embed]] = {}
+        self._hits: int = 0
+        self._misses: int = 0
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    # ============================================== "Real" methods =============================================
+
+    def clear(self):
+        self._pages.clear()
+
+    def num_entries(self, board_type: str) -> int:
+        board: str = LEADERBOARD_BOARDS[board_type]
+        if board == BOARD_CULTIVATION:
+            # Mortals are not ranked
+            return Leaderboards()[board].count_at_least((1,))
 
-        n = 10  # Number of entries per page
+        return Leaderboards().size(board)
 
+    def num_pages(self, board_type: str) -> int:
+        return max(1, math.ceil(self.num_entries(board_type) / LEADERBOARD_PAGE_SIZES[board_type]))
+
+    async def get(self, board_type: str, page_idx: int, thumbnail_url: str) -> disnake.Embed:
+        leaderboards: Leaderboards = Leaderboards()
+        board: str = LEADERBOARD_BOARDS[board_type]
+        page_size: int = LEADERBOARD_PAGE_SIZES[board_type]
+        start: int = page_idx * page_size
+        end: int = start + page_size
+
+        cache_key: tuple[str, int] = (board_type, page_idx)
+        cached: Optional[tuple[int, disnake.Embed]] = self._pages.get(cache_key)
+        if cached is not None:
+            version, embed = cached
+            if not leaderboards.changed_since(board, version, start, end):
+                self._hits += 1
+                return embed.copy()
+
+        self._misses += 1
+        version: int = leaderboards.version(board)
+        num_entries: int = self.num_entries(board_type)
+        entries: list[tuple[int, tuple]] = leaderboards.page(board, start, min(end, num_entries) - start)
+        embed: disnake.Embed = disnake.Embed(title=f"{LEADERBOARD_TITLES[board_type]} Ranking", color=disnake.Color(0x2e3135), timestamp=datetime.now())
+        embed.set_thumbnail(url=thumbnail_url)
+        embed.description = f"Top **{page_size}**" if page_idx == 0 else f"Rank #{start + 1}-{min(num_entries, end)}"
+        embed.add_field(name=f"{LEADERBOARD_FIELDS[board_type]} - ", value='\n'.join(await self._render_entries(board_type, start, entries)), inline=False)
+
+        # The version is read before the awaits above so that any change while rendering invalidates this page
+        self._pages[cache_key] = (version, embed)
+        return embed.copy()
+
+    @staticmethod
+    async def _render_entries(board_type: str, start: int, entries: list[tuple[int, tuple]]) -> list[str]:
+        lines: list[str] = []
         if board_type == "Exp":
-            users_data: list[tuple[int, int, int]] = await Cultivation.filter(major__gte=1).order_by("-major", "-minor", "-current_exp").values_list("user_id", "major", "minor")
-            # users_data = await Cultivation.all().order_by("-major", "-minor", "-current_exp").limit(n*max_pages).values_list("user_id", "major", "minor")
-            num_entries = len(users_data)
-            num_pages = math.ceil(num_entries / n)
-
-            for page_idx in range(num_pages):
-                embed = disnake.Embed(title="Level Ranking", color=disnake.Color(0x2e3135), timestamp=datetime.now())
-                embed.set_thumbnail(url=inter.guild.icon.url)
-                embed.description = f"Top **10**" if page_idx == 0 else f"Rank #{page_idx * n + 1}-{min(num_entries, (page_idx + 1) * n)}"
-                entries = []
-                for i in range(page_idx * n, ((page_idx + 1) * n)):
-                    if i >= num_entries:
-                        break
-                    data = users_data[i]
-                    realm = PlayerCultivationStage(data[1], data[2]).name
-                    if data[1] == 14:
-                        tgr_check = await check_for_great_ruler(int(data[0]), users_data)
-                        if tgr_check:
-                            realm = tgr_check
-
-                    entries.append(f"**#{i + 1}** <@{data[0]}> | `{realm}`")
-                embed.add_field(name="Exp - ", value='\n'.join(entries), inline=False)
-                leaderboard_embeds.append(embed)
+            for i, (user_id, (major, minor, _)) in enumerate(entries, start):
+                realm = PlayerCultivationStage(major, minor).name
+                if major == 14 and i < GREAT_RULER_COUNT:
+                    realm = GREAT_RULER_TITLE
+
+                lines.append(f"**#{i + 1}** <@{user_id}> | `{realm}`")
 
         elif board_type == "Balance":
-            ah: AuctionHouse = AuctionHouse()
-            roster: PlayerRoster = PlayerRoster()
-            players: list[Player] = roster.list()
-            balances: list[tuple[int, int]] = [_compute_gold_balance_entry(player, ah) for player in players]
-            balances.sort(key=lambda e: e[1], reverse=True)
-            num_entries = len(balances)
-            num_pages = math.ceil(num_entries / n)
-
-            for page_idx in range(num_pages):
-                embed = disnake.Embed(title="Balance Ranking", color=disnake.Color(0x2e3135), timestamp=datetime.now())
-                embed.set_thumbnail(url=inter.guild.icon.url)
-                embed.description = f"Top **10**" if page_idx == 0 else f"Rank #{page_idx * n + 1}-{min(num_entries, (page_idx + 1) * n)}"
-                entries = []
-                for i in range(page_idx * n, ((page_idx + 1) * n)):
-                    if i >= num_entries:
-                        break
-                    data = balances[i]
-                    entries.append(f"**#{i + 1}** <@{data[0]}> | `{format_num_simple(data[1])}` **Gold**")
-                embed.add_field(name="Balance - ", value='\n'.join(entries), inline=False)
-                leaderboard_embeds.append(embed)
+            for i, (user_id, (balance,)) in enumerate(entries, start):
+                lines.append(f"**#{i + 1}** <@{user_id}> | `{format_num_simple(balance)}` **Gold**")
 
         elif board_type == "Alchemy":
-            users_data = await Alchemy.filter(a_lvl__gt=0).order_by("-a_lvl", "-a_exp").values_list("user_id", "a_lvl", "a_exp")
-            num_entries = len(users_data)
-            num_pages = math.ceil(num_entries / n)
-
-            for page_idx in range(num_pages):
-                embed = disnake.Embed(title="Alchemy Ranking", color=disnake.Color(0x2e3135), timestamp=datetime.now())
-                embed.set_thumbnail(url=inter.guild.icon.url)
-                embed.description = f"Top **10**" if page_idx == 0 else f"Rank #{page_idx * n + 1}-{min(num_entries, (page_idx + 1) * n)}"
-                entries = []
-                for i in range(page_idx * n, ((page_idx + 1) * n)):
-                    if i >= num_entries:
-                        break
-                    data = users_data[i]
-                    entries.append(f"**#{i + 1}** <@{data[0]}> | **Tier** `{data[1]}` | {format_num_abbr1(data[2])} **Exp**")
-                embed.add_field(name="Alchemy - ", value='\n'.join(entries), inline=False)
-                leaderboard_embeds.append(embed)
+            for i, (user_id, (level, exp)) in enumerate(entries, start):
+                lines.append(f"**#{i + 1}** <@{user_id}> | **Tier** `{level}` | {format_num_abbr1(exp)} **Exp**")
 
         elif board_type == "Craft":
-            users_data = await Crafting.all().order_by("-c_lvl", "-c_exp").values_list("user_id", "c_lvl", "c_exp")
-            num_entries = len(users_data)
-            num_pages = math.ceil(num_entries / n)
-
-            for page_idx in range(num_pages):
-                embed = disnake.Embed(title="Craft Ranking", color=disnake.Color(0x2e3135), timestamp=datetime.now())
-                embed.set_thumbnail(url=inter.guild.icon.url)
-                embed.description = f"Top **10**" if page_idx == 0 else f"Rank #{page_idx * n + 1}-{min(num_entries, (page_idx + 1) * n)}"
-                entries = []
-                for i in range(page_idx * n, ((page_idx + 1) * n)):
-                    if i >= num_entries:
-                        break
-                    data = users_data[i]
-                    entries.append(f"**#{i + 1}** <@{data[0]}> | **Level** `{data[1]}` | {format_num_abbr1(data[2])} **Exp**")
-                embed.add_field(name="Crafting - ", value='\n'.join(entries), inline=False)
-                leaderboard_embeds.append(embed)
-
-        elif board_type == 'Pet':
-            pet_per_page: int = 5
-
-            # Name "nickname", user, pet CP, rarity, rank
-            init_users_data: list[tuple[str, str, int, int, str, int, int]] = await Pet.filter(main=1).values_list("pet__name", "nickname", "user__user_id", "p_cp", "pet__rarity", "p_major", "p_minor")
-
-            users_data: list[tuple[int, str, str, int, int, str, int, int]] = []
-            for user_data in init_users_data:
-                user_id: int = user_data[2]
-                true_pet_cp = await compute_pet_cp(user_id)
-                users_data.append((true_pet_cp, user_data[0], user_data[1], user_data[2], user_data[3], user_data[4], user_data[5], user_data[6]))
-
-            users_data.sort(key=lambda tup: tup[0], reverse=True)
-
-            num_entries = len(users_data)
-            num_pages = math.ceil(num_entries / pet_per_page)
-
-            for page_idx in range(num_pages):
-                embed = disnake.Embed(title="Pet Ranking", color=disnake.Color(0x2e3135), timestamp=datetime.now())
-                embed.set_thumbnail(url=inter.guild.icon.url)
-                embed.description = f"Top **5**" if page_idx == 0 else f"Rank #{page_idx * pet_per_page + 1}-{min(num_entries, (page_idx + 1) * n)}"
-                entries = []
-                for i in range(page_idx * pet_per_page, ((page_idx + 1) * pet_per_page)):
-                    if i >= num_entries:
-                        break
-                    cp, pname, nickname, owner, _, rarity, major, minor = users_data[i]
-                    nickname_str = "" if nickname == pname else f' **"{nickname}"**'
-                    rank_str = BeastCultivationStage(int(major), int(minor), rarity).name
-                    entry_str = f'**#{i + 1}**{nickname_str} {pname} <@{owner}>\n{rarity.capitalize()} {rank_str} | `{format_num_abbr1(cp)}` **CP**'
-                    entries.append(entry_str)
-                embed.add_field(name="Pet - ", value='\n'.join(entries), inline=False)
-                leaderboard_embeds.append(embed)
-
-        await inter.edit_original_message(embed=leaderboard_embeds[0], view=LeaderboardView(leaderboard_embeds, inter.author))
+            for i, (user_id, (level, exp)) in enumerate(entries, start):
+                lines.append(f"**#{i + 1}** <@{user_id}> | **Level** `{level}` | {format_num_abbr1(exp)} **Exp**")
+
+        elif board_type == "Pet":
+            # Only the pets displayed on this page are fetched, the CP comes straight from the index
+            user_ids: list[int] = [user_id for user_id, _ in entries]
+            pet_details: dict[int, tuple[str, str, int, str, int, int]] = {row[2]: row for row in await Pet.filter(main=1, user_id__in=user_ids).values_list("pet__name", "nickname", "user__user_id", "pet__rarity", "p_major", "p_minor")}
+            for i, (user_id, (cp,)) in enumerate(entries, start):
+                details = pet_details.get(user_id)
+                if details is None:
+                    continue
+
+                pname, nickname, _, rarity, major, minor = details
+                nickname_str = "" if nickname == pname else f' **"{nickname}"**'
+                rank_str = BeastCultivationStage(int(major), int(minor), rarity).name
+                lines.append(f'**#{i + 1}**{nickname_str} {pname} <@{user_id}>\n{rarity.capitalize()} {rank_str} | `{format_num_abbr1(cp)}` **CP**')
+
+        if len(lines) == 0:
+            lines.append("Nobody is ranked yet")
+
+        return lines
 
 
 class LeaderboardView(disnake.ui.View):
-    def __init__(self, leaderboard_embeds, author):
+    def __init__(self, pages: LeaderboardPages, board_type: str, author, thumbnail_url: str):
         super().__init__(timeout=None)
-        self.leaderboard_embeds = leaderboard_embeds
-        self.embeds = leaderboard_embeds
+        self.pages = pages
+        self.board_type = board_type
         self.embed_count = 0  # Page index
         self.author = author
+        self.thumbnail_url = thumbnail_url
 
-        self.prev_page.disabled = True
-        if len(self.embeds) <= 1:
-            self.next_page.disabled = True
+    async def current_embed(self) -> disnake.Embed:
+        num_pages: int = self.pages.num_pages(self.board_type)
+        self.embed_count = max(0, min(self.embed_count, num_pages - 1))
+        self.prev_page.disabled = self.embed_count == 0
+        self.next_page.disabled = self.embed_count >= num_pages - 1
 
-        for i, embed in enumerate(self.leaderboard_embeds):
-            embed.set_footer(text=f"Page {i + 1} of {len(self.leaderboard_embeds)}")
+        embed: disnake.Embed = await self.pages.get(self.board_type, self.embed_count, self.thumbnail_url)
+        embed.set_footer(text=f"Page {self.embed_count + 1} of {num_pages}")
+        return embed
 
     async def interaction_check(self, inter):
         return inter.author == self.author
@@ -848,31 +793,16 @@ class LeaderboardView(disnake.ui.View):
     @disnake.ui.button(emoji=LEFT, style=disnake.ButtonStyle.secondary)
     async def prev_page(self, _: disnake.ui.Button, interaction: disnake.MessageInteraction):
         self.embed_count -= 1
-
-        embed = self.embeds[self.embed_count]
-
-        self.next_page.disabled = False
-        if self.embed_count == 0:
-            self.prev_page.disabled = True
+        embed = await self.current_embed()
         await interaction.response.edit_message(embed=embed, view=self)
 
     @disnake.ui.button(emoji=RIGHT, style=disnake.ButtonStyle.secondary)
     async def next_page(self, _: disnake.ui.Button, interaction: disnake.MessageInteraction):
         self.embed_count += 1
-        embed = self.embeds[self.embed_count]
-
-        self.prev_page.disabled = False
-        if self.embed_count == len(self.embeds) - 1:
-            self.next_page.disabled = True
+        embed = await self.current_embed()
         await interaction.response.edit_message(embed=embed, view=self)
 
 
-def _compute_gold_balance_entry(player: Player, ah: AuctionHouse) -> tuple[int, int]:
-    gold: int = player.current_gold
-    escrow: int = ah.get_escrow(player.id)
-    return player.id, gold + escrow
-
-
 def setup(bot):
     bot.add_cog(Exp(bot))
     print("[Exp] Loaded")
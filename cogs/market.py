@@ -1,9 +1,10 @@
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from typing import Union, Optional
+from typing import Awaitable, Callable, Union, Optional
 
 import disnake
-from disnake.ext import commands, tasks
+from disnake.ext import commands
+from tortoise.transactions import in_transaction
 
 from adventure.auction import AuctionHouse
 from utils.CommandUtils import add_market_points_for_sale
@@ -13,13 +14,19 @@ from utils.Database import AllItems, Market, AllRings
 from utils.DatabaseUtils import compute_market_userinfo
 from utils.EconomyUtils import add_tax_amount, ConfirmCurrency, currency_dict_to_str
 from utils.Embeds import BasicEmbeds
-from utils.InventoryUtils import ConfirmDelete, convert_id, combine_id, remove_from_inventory, add_to_inventory, check_inv_weight, check_item_in_inv, get_equipped_ring_id, ITEM_TYPE_RING, ITEM_TYPE_CHEST
+from utils.InventoryUtils import ConfirmDelete, convert_id, combine_id, remove_from_inventory, add_to_inventory, add_items_to_inventory, check_inv_weight, check_item_in_inv, get_equipped_ring_id, ITEM_TYPE_RING, ITEM_TYPE_CHEST
 from utils.LoggingUtils import log_event
 from utils.ParamsUtils import format_num_full, CURRENCY_NAME_GOLD
 from utils.Styles import RIGHT, LEFT, ITEM_EMOJIS, TICK, CROSS
 from utils.base import BaseStarfallCog
+from utils.scheduler import Scheduler
+from world.market_book import MarketBook, MarketListing, MarketSearch, SEARCH_ALL_TYPES, SORT_CREATED_NEW, SORT_CREATED_OLD, SORT_PRICE_HIGH, SORT_PRICE_LOW
 
-ITEM_TYPE_AUTOCOMPLETE: list = []
+MARKET_LISTING_DURATION: timedelta = timedelta(days=3)
+MARKET_PAGE_SIZE: int = 5
+
+_JOB_MARKET_EXPIRY: str = "market.expire_item"
+_EXPIRY_RETRY_DELAY: timedelta = timedelta(minutes=1)
 
 
 class Confirmation(disnake.ui.View):
@@ -51,28 +58,37 @@ class Confirmation(disnake.ui.View):
 
 
 class MarketPaginatorView(disnake.ui.View):
-    def __init__(self, embeds, author, label):
+    def __init__(self, page_count: int, render_page: Callable[[int], Awaitable[disnake.Embed]], author, label):
         super().__init__(timeout=None)
         self.add_item(IDButton(label))
         self.author = author
-        self.embeds = embeds
+        self.page_count: int = page_count
+        self.render_page: Callable[[int], Awaitable[disnake.Embed]] = render_page
+        self.embeds: dict[int, disnake.Embed] = {}
         self.embed_count = 0
 
         self.prev_page.disabled = True
-        if len(self.embeds) <= 1:
+        if self.page_count <= 1:
             self.next_page.disabled = True
 
-        for i, embed in enumerate(self.embeds):
-            embed.set_footer(text=f"Page {i + 1} of {len(self.embeds)}")
-
     async def interaction_check(self, inter):
         return inter.author == self.author
 
+    async def page_embed(self, page_index: int) -> disnake.Embed:
+        # Pages are only built when first displayed
+        embed: Optional[disnake.Embed] = self.embeds.get(page_index)
+        if embed is None:
+            embed = await self.render_page(page_index)
+            embed.set_footer(text=f"Page {page_index + 1} of {self.page_count}")
+            self.embeds[page_index] = embed
+
+        return embed
+
     @disnake.ui.button(emoji=LEFT, style=disnake.ButtonStyle.secondary)
     async def prev_page(self, _: disnake.ui.Button, interaction: disnake.MessageInteraction):
         self.embed_count -= 1
 
-        embed = self.embeds[self.embed_count]
+        embed = await self.page_embed(self.embed_count)
 
         self.next_page.disabled = False
         if self.embed_count == 0:
@@ -82,10 +98,10 @@ class MarketPaginatorView(disnake.ui.View):
     @disnake.ui.button(emoji=RIGHT, style=disnake.ButtonStyle.secondary)
     async def next_page(self, _: disnake.ui.Button, interaction: disnake.MessageInteraction):
         self.embed_count += 1
-        embed = self.embeds[self.embed_count]
+        embed = await self.page_embed(self.embed_count)
 
         self.prev_page.disabled = False
-        if self.embed_count == len(self.embeds) - 1:
+        if self.embed_count == self.page_count - 1:
             self.next_page.disabled = True
         await interaction.response.edit_message(embed=embed, view=self)
 
@@ -146,6 +162,7 @@ class SubmitItemId(disnake.ui.Modal):
 
                     _, sell_tax, _, _, _, _ = await compute_market_userinfo(user_id)
                     await Market.filter(id=_id).delete()
+                    MarketBook().remove(int(_id))
 
                     s_tax = round((sell_tax / 100) * price)
                     await add_tax_amount(user_id, s_tax)
@@ -177,6 +194,7 @@ class SubmitItemId(disnake.ui.Modal):
                 full_id = combine_id(item_id, unique_id)
 
                 await Market.filter(id=_id).delete()
+                MarketBook().remove(int(_id))
                 await add_to_inventory(inter.author.id, full_id, quantity, ring_id, add_check)
                 embed = BasicEmbeds.right_tick(f"{full_id} successfully removed from the market")
 
@@ -204,30 +222,56 @@ class MainMarket(BaseStarfallCog):
         super().__init__(bot, "Market", "market")
 
     async def _do_load(self):
-        if not self.expire_item.is_running():
-            self.expire_item.start()
+        scheduler: Scheduler = Scheduler()
+        scheduler.schedule_once(_JOB_MARKET_EXPIRY, self.expire_item, timedelta(0))
+        scheduler.start(self.bot)
 
     def _do_unload(self):
-        self.expire_item.cancel()
+        Scheduler().cancel(_JOB_MARKET_EXPIRY)
 
-    @tasks.loop(minutes=30)
     async def expire_item(self):
-        market_items = await Market.all().values_list("id", "user_id", "expiry", "amount", "item_id", "unique_id", "item__type")
-        for item in market_items:
-            _id, user_id, expiry, quantity, item_id, unique_id, item_type = item
-
-            if datetime.now(timezone.utc) > expiry:
-                await Market.filter(id=_id).delete()
-                full_id = combine_id(item_id, unique_id)
-
-                log_event(user_id, "market", f"Expired item, {quantity}x {full_id} (M_ID: {_id})")
+        book: MarketBook = MarketBook()
+        expired: list[MarketListing] = book.pop_expired(datetime.now(timezone.utc))
+        failed: bool = False
+        try:
+            if len(expired) > 0:
+                by_owners: dict[int, dict[str, int]] = defaultdict(dict)
+                for listing in expired:
+                    owner_items: dict[str, int] = by_owners[listing.user_id]
+                    owner_items[listing.full_id] = owner_items.get(listing.full_id, 0) + int(listing.quantity)
+
+                try:
+                    ring_ids: dict[int, Optional[int]] = {user_id: await get_equipped_ring_id(user_id) for user_id in by_owners.keys()}
+                    # Every listing expiring together goes back to its owner in a single transaction
+                    async with in_transaction():
+                        await Market.filter(id__in=[listing.id for listing in expired]).delete()
+                        for user_id, items in by_owners.items():
+                            await add_items_to_inventory(user_id, items, ring_ids[user_id])
+                except Exception as e:
+                    # Nothing was returned, keep the listings around and try again a bit later
+                    failed = True
+                    for listing in expired:
+                        book.add(listing)
+
+                    log_event("system", "market", f"Failed to expire {len(expired)} listings: {e}", "ERROR")
+                    return
 
-                ring_id = await get_equipped_ring_id(user_id)
-                await add_to_inventory(user_id, full_id, int(quantity), ring_id)
+                for listing in expired:
+                    log_event(listing.user_id, "market", f"Expired item, {listing.quantity}x {listing.full_id} (M_ID: {listing.id})")
+        finally:
+            if failed:
+                Scheduler().schedule_once(_JOB_MARKET_EXPIRY, self.expire_item, _EXPIRY_RETRY_DELAY)
+            else:
+                # Sleep until the next listing actually expires rather than polling the whole table
+                next_expiry: Optional[datetime] = book.next_expiry()
+                if next_expiry is not None:
+                    Scheduler().schedule_once(_JOB_MARKET_EXPIRY, self.expire_item, next_expiry)
 
-    @expire_item.before_loop
-    async def before_number(self):
-        await self.bot.wait_until_ready()
+    def _ensure_expiry_scheduled(self, expiry: datetime):
+        # New listings always expire after the existing ones, so only an idle expiry job needs to be woken up
+        scheduler: Scheduler = Scheduler()
+        if _JOB_MARKET_EXPIRY not in scheduler:
+            scheduler.schedule_once(_JOB_MARKET_EXPIRY, self.expire_item, expiry)
 
     @commands.slash_command(name="market")
     async def slash_market(self, inter: disnake.CommandInteraction):
@@ -240,7 +284,6 @@ class MainMarket(BaseStarfallCog):
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def slash_market_add(self, inter: disnake.CommandInteraction, item_id: str, quantity: int = commands.Param(1, gt=0), price: int = commands.Param(1000, gt=0)):
         await inter.response.defer()
-        global ITEM_TYPE_AUTOCOMPLETE
 
         itemid, unique_id = convert_id(item_id)
         if unique_id is not None:
@@ -271,7 +314,7 @@ class MainMarket(BaseStarfallCog):
             await inter.edit_original_message(embed=BasicEmbeds.exclamation(f"Command stopped by the user"), view=None)
             return
 
-        item_count = await Market.filter(user_id=inter.author.id).count()
+        item_count = MarketBook().count_by_owner(inter.author.id)
         item_count += AuctionHouse().active_auction_count(author_id=inter.author.id)
         listing_tax, _, _, item_limit, _, _ = await compute_market_userinfo(inter.author.id)
 
@@ -290,7 +333,10 @@ class MainMarket(BaseStarfallCog):
             if money_check:
                 await add_tax_amount(inter.author.id, tax)
                 await remove_from_inventory(inter.author.id, item_id, quantity)
-                market_item = await Market.create(user_id=inter.author.id, item_id=itemid, amount=quantity, price=total_price, expiry=datetime.utcnow() + timedelta(days=3), unique_id=unique_id)
+                expiry: datetime = datetime.now(timezone.utc) + MARKET_LISTING_DURATION
+                market_item = await Market.create(user_id=inter.author.id, item_id=itemid, amount=quantity, price=total_price, expiry=expiry, unique_id=unique_id)
+                MarketBook().add(MarketListing(market_item.id, inter.author.id, itemid, unique_id, definition.type, quantity, total_price, expiry, market_item.created))
+                self._ensure_expiry_scheduled(expiry)
 
                 log_event(inter.author.id, "market", f"Added {quantity}x {item_id} (M_ID: {market_item.id}) for {total_price:,} gold, paid {tax:,} tax")
 
@@ -308,8 +354,6 @@ class MainMarket(BaseStarfallCog):
 
         await inter.edit_original_message(embed=embed)
 
-        ITEM_TYPE_AUTOCOMPLETE = []
-
     @slash_market.sub_command(name="profile", description="Show Market profile")
     async def slash_market_profile(self, inter: disnake.CommandInteraction, member: disnake.Member = None):
         if not member:
@@ -340,41 +384,41 @@ class MainMarket(BaseStarfallCog):
     async def slash_market_items(self, inter: disnake.CommandInteraction):
         await inter.response.defer()
 
-        market_items = await Market.filter(user_id=inter.author.id).values_list("id", "user_id", "item__name", "item__type", "item_id", "amount", "price", "expiry", "unique_id")
-        embeds = []
-        max_items = 5
-        embed = disnake.Embed(
-            title=f"{inter.author.name}'s Items",
-            color=disnake.Color(0x2e3135)
-        )
-        items_list = [market_items[i:i + max_items] for i in range(0, len(market_items), max_items)]
-        for items in items_list:
+        listings: list[MarketListing] = MarketBook().owned_by(inter.author.id)
+        compendium: ItemCompendium = ItemCompendium()
 
-            for item in items:
-                _id, user_id, item_name, item_type, item_id, quantity, price, expiry, unique_id = item
-                emoji = ITEM_EMOJIS.get(item_id, "")
-                if unique_id:
-                    full_id = f"{item_id}/{unique_id}"
-                    embed.add_field(name="\u200b", value=f"ID: `{_id}` \n**{emoji} {item_name}** \n> Unique ID: `{full_id}` | Price: `{price:,}` gold", inline=False)
+        async def _render_page(page_index: int) -> disnake.Embed:
+            embed = disnake.Embed(
+                title=f"{inter.author.name}'s Items",
+                color=disnake.Color(0x2e3135)
+            )
+            for listing in listings[page_index * MARKET_PAGE_SIZE:(page_index + 1) * MARKET_PAGE_SIZE]:
+                item_name: str = _listing_item_name(compendium, listing)
+                emoji = ITEM_EMOJIS.get(listing.item_id, "")
+                if listing.unique_id:
+                    embed.add_field(name="\u200b", value=f"ID: `{listing.id}` \n**{emoji} {item_name}** \n> Unique ID: `{listing.full_id}` | Price: `{listing.price:,}` gold", inline=False)
                 else:
-                    embed.add_field(name="\u200b", value=f"ID: `{_id}` \n**`{quantity}` x {emoji} {item_name}** \n> Type: `{item_type.capitalize()}` | Price: `{price:,}` gold", inline=False)
-            embed.set_footer(text="Page 1")
-            embeds.append(embed)
+                    embed.add_field(name="\u200b", value=f"ID: `{listing.id}` \n**`{listing.quantity}` x {emoji} {item_name}** \n> Type: `{listing.item_type.capitalize()}` | Price: `{listing.price:,}` gold", inline=False)
 
-        if len(embeds) > 0:
-            view = MarketPaginatorView(embeds, inter.author, "Remove")
-            await inter.edit_original_message(embed=embeds[0], view=view)
-        else:
-            embed.description = f"*No item found*"
+            return embed
 
+        if len(listings) > 0:
+            view = MarketPaginatorView((len(listings) + MARKET_PAGE_SIZE - 1) // MARKET_PAGE_SIZE, _render_page, inter.author, "Remove")
+            await inter.edit_original_message(embed=await view.page_embed(0), view=view)
+        else:
+            embed = disnake.Embed(
+                title=f"{inter.author.name}'s Items",
+                description=f"*No item found*",
+                color=disnake.Color(0x2e3135)
+            )
             await inter.edit_original_message(embed=embed)
 
     Sorting = commands.option_enum(
         {
-            "Price - High": "-price",
-            "Price - Low": "price",
-            "Created - Old": "-created",
-            "Created - New": "created",
+            "Price - High": SORT_PRICE_HIGH,
+            "Price - Low": SORT_PRICE_LOW,
+            "Created - Old": SORT_CREATED_NEW,
+            "Created - New": SORT_CREATED_OLD,
         }
     )
 
@@ -382,78 +426,68 @@ class MainMarket(BaseStarfallCog):
     async def slash_market_search(self, inter: disnake.CommandInteraction, type: str, sorting: Sorting = "created"):
         await inter.response.defer()
 
-        if type == "all":
-            market_items = await Market.all().order_by(sorting).values_list("id", "user_id", "item__name", "item__type", "item_id", "amount", "price", "unique_id")
-        else:
-            market_items = await Market.filter(item__type=type).order_by(sorting).values_list("id", "user_id", "item__name", "item__type", "item_id", "amount", "price", "unique_id")
-
-        all_ring_ids = [item[7] for item in market_items if item[3] == "ring"]
-        all_rings_item = await AllRings.filter(id__in=all_ring_ids).values_list("id", "items__item_id", "items__count")
+        search: MarketSearch = MarketBook().search(item_type=type, sorting=sorting)
+        page_count: int = search.page_count(MARKET_PAGE_SIZE)
+        if page_count == 0:
+            embed = disnake.Embed(
+                title="Market",
+                description=f"by type: `{type}` \n\n*No item found*",
+                color=disnake.Color(0x2e3135)
+            )
+            await inter.edit_original_message(embed=embed)
+            return
 
-        ring_items_dict = defaultdict(list)
-        for ring in all_rings_item:
-            ring_items_dict[ring[0]].append((ring[2], ring[1]))
+        listing_tax, sell_tax, buy_tax, item_limit, market_points, user_market_tier = await compute_market_userinfo(inter.author.id)
+        compendium: ItemCompendium = ItemCompendium()
 
-        embeds = []
-        max_items = 5
+        async def _render_page(page_index: int) -> disnake.Embed:
+            listings: list[MarketListing] = search.page(page_index, MARKET_PAGE_SIZE)
 
-        items_list = [market_items[i:i + max_items] for i in range(0, len(market_items), max_items)]
-        listing_tax, sell_tax, buy_tax, item_limit, market_points, user_market_tier = await compute_market_userinfo(inter.author.id)
+            # Only the rings displayed on this page need their content
+            all_ring_ids = [listing.unique_id for listing in listings if listing.item_type == "ring"]
+            ring_items_dict = defaultdict(list)
+            if len(all_ring_ids) > 0:
+                all_rings_item = await AllRings.filter(id__in=all_ring_ids).values_list("id", "items__item_id", "items__count")
+                for ring in all_rings_item:
+                    ring_items_dict[ring[0]].append((ring[2], ring[1]))
 
-        for items in items_list:
             embed = disnake.Embed(
                 title="Market",
                 description=f"Type: `{type}` \n*Tax amount is shown as in brackets- (+amount)*",
                 color=disnake.Color(0x2e3135)
             )
-            for item in items:
-                _id, user_id, item_name, item_type, item_id, quantity, price, unique_id = item
-                emoji = ITEM_EMOJIS.get(item_id, "")
-                tax = round((buy_tax / 100) * price)
-                total_price = f"{format_num_full(price)} (+{format_num_full(tax)})"
-
-                if unique_id:
-                    if item_type == "ring":
-                        ring_items = ring_items_dict[unique_id]
+            for listing in listings:
+                item_name: str = _listing_item_name(compendium, listing)
+                emoji = ITEM_EMOJIS.get(listing.item_id, "")
+                tax = round((buy_tax / 100) * listing.price)
+                total_price = f"{format_num_full(listing.price)} (+{format_num_full(tax)})"
+
+                if listing.unique_id:
+                    if listing.item_type == "ring":
+                        ring_items = ring_items_dict[listing.unique_id]
                         if len(ring_items) > 0:
                             ring_items_str = ", ".join(f"`{c}x {i}`" for c, i in ring_items[:20])
                         else:
                             ring_items_str = "No Items"
 
-                        embed.add_field(name="\u200b", value=f"ID: `{_id}` \n**{emoji} {item_name}** \n> Unique ID: `{unique_id}` | Price: `{total_price}` gold \n**Items**: {ring_items_str[:170]}", inline=False)
+                        embed.add_field(name="\u200b", value=f"ID: `{listing.id}` \n**{emoji} {item_name}** \n> Unique ID: `{listing.unique_id}` | Price: `{total_price}` gold \n**Items**: {ring_items_str[:170]}", inline=False)
                     else:
-                        embed.add_field(name="\u200b", value=f"ID: `{_id}` \n**{emoji} {item_name}** \n> Unique ID: `{unique_id}` | Price: `{total_price}` gold", inline=False)
+                        embed.add_field(name="\u200b", value=f"ID: `{listing.id}` \n**{emoji} {item_name}** \n> Unique ID: `{listing.unique_id}` | Price: `{total_price}` gold", inline=False)
                 else:
-                    embed.add_field(name="\u200b", value=f"ID: `{_id}` \n**`{quantity}` x {emoji} {item_name}** \n> Type: `{item_type.capitalize()}` | Price: `{total_price}` gold", inline=False)
-            embed.set_footer(text="Page 1")
-            embeds.append(embed)
+                    embed.add_field(name="\u200b", value=f"ID: `{listing.id}` \n**`{listing.quantity}` x {emoji} {item_name}** \n> Type: `{listing.item_type.capitalize()}` | Price: `{total_price}` gold", inline=False)
 
-        if len(embeds) > 0:
-            view = MarketPaginatorView(embeds, inter.author, "Buy")
-            await inter.edit_original_message(embed=embeds[0], view=view)
-        else:
-            embed = disnake.Embed(
-                title="Market",
-                description=f"by type: `{type}` \n\n*No item found*",
-                color=disnake.Color(0x2e3135)
-            )
-            await inter.edit_original_message(embed=embed)
+            if len(listings) == 0:
+                embed.description = f"Type: `{type}` \n\n*No item found*"
+
+            return embed
+
+        view = MarketPaginatorView(page_count, _render_page, inter.author, "Buy")
+        await inter.edit_original_message(embed=await view.page_embed(0), view=view)
 
     @slash_market_search.autocomplete("type")
     async def language_autocomplete(self, _: disnake.ApplicationCommandInteraction, string: str):
         string = string.lower()
-        global ITEM_TYPE_AUTOCOMPLETE
-
-        if len(ITEM_TYPE_AUTOCOMPLETE) < 1:
-            item_types = await Market.all().values_list("item__type", flat=True)
-            ITEM_TYPE_AUTOCOMPLETE = item_types
-        else:
-            item_types = ITEM_TYPE_AUTOCOMPLETE
-
-        item_types.append("all")
-        unique_types = set(item_types)
-
-        all_types = [t for t in unique_types]
+        all_types = MarketBook().item_types() + [SEARCH_ALL_TYPES]
         return [t for t in all_types if string in t.lower()]
 
     @commands.slash_command(name="buy", description="Buy an item from shop")
@@ -591,6 +625,11 @@ async def _sell_to_shop(user_id: int, itemid: str, amount: int = 1) -> tuple[str
     return content, False
 
 
+def _listing_item_name(compendium: ItemCompendium, listing: MarketListing) -> str:
+    definition: Optional[ItemDefinition] = compendium.get(listing.item_id)
+    return listing.item_id if definition is None else definition.name
+
+
 def _log(user_id: Union[int, str], message: str, level: str = "INFO"):
     log_event(user_id, "market", message, level)
 
@@ -19,6 +19,7 @@ from utils.Styles import CROSS
 from world.bestiary import Bestiary, PetBeastDefinition, PetBeastEvolution
 from world.cultivation import BeastCultivationStage
 from world.compendium import ItemCompendium, ItemDefinition, EggDefinition, PetAmplifierDefinition
+from world.leaderboard import Leaderboards, BOARD_PET
 
 
 async def create_pet(user_id, parent_beast, pet_name, previous_cp: int = 0, main: int = 0, pet_quality: Optional[int] = None) -> tuple[int, float, int, str]:
@@ -37,7 +38,11 @@ async def create_pet(user_id, parent_beast, pet_name, previous_cp: int = 0, main
 
     log_event(user_id, "pet", f"Created Rank {definition.rank} {pet_name} Pet, {growth_rate} Growth rate, with {inherited_cp} inherited CP")
 
-    await Pet.create(user_id=user_id, beast_id=parent_beast, pet_id=pet_name, nickname=pet_name, growth_rate=growth_rate, p_major=definition.initial_stage.major, p_minor=definition.initial_stage.minor, p_cp=inherited_cp, main=main)
+    combat_power: int = definition.combat_power(definition.initial_stage, growth_rate, inherited_cp)
+    await Pet.create(user_id=user_id, beast_id=parent_beast, pet_id=pet_name, nickname=pet_name, growth_rate=growth_rate, p_major=definition.initial_stage.major, p_minor=definition.initial_stage.minor, p_cp=inherited_cp,
+                     combat_power=combat_power, main=main)
+    if main == 1:
+        Leaderboards().update_pet(user_id, combat_power)
 
     return definition.rank, growth_rate, quality, definition.rarity
 
@@ -135,6 +140,7 @@ class PetInventoryView(disnake.ui.View):
 
         _id, definition, growth_rate, main, pet_major, pet_minor, pet_exp = self.current_pet
         await Pet.filter(id=_id, user_id=inter.author.id, pet_id=definition.name).update(main=1)
+        await Leaderboards().refresh_pet(inter.author.id)
         await self.update_pet_details()
 
         self.children.pop(2)
@@ -187,12 +193,12 @@ class Pets(commands.Cog):
     async def slash_pet_view(self, inter: disnake.CommandInteraction):
         await inter.response.defer()
 
-        pet_info = await Pet.get_or_none(user_id=inter.author.id, main=1).values("pet_id", "nickname", "p_major", "p_minor", "p_exp", "p_cp", "growth_rate")
+        pet_info = await Pet.get_or_none(user_id=inter.author.id, main=1).values("pet_id", "nickname", "p_major", "p_minor", "p_exp", "combat_power", "growth_rate")
         if pet_info is None:
             await inter.edit_original_message(embed=BasicEmbeds.no_main_pet())
             return
 
-        pet_name, pet_nick, pet_major, pet_minor, pet_exp, inherited_cp, growth_rate = pet_info.values()
+        pet_name, pet_nick, pet_major, pet_minor, pet_exp, combat_power, growth_rate = pet_info.values()
 
         bestiary: Bestiary = Bestiary()
         definition: PetBeastDefinition = bestiary.get_pet_definition(pet_name)
@@ -201,7 +207,6 @@ class Pets(commands.Cog):
         min_rate, max_rate = definition.growth_rate_range
         evolution: PetBeastEvolution = definition.next_evolution
         pet_quality: int = definition.quality_from_growth(growth_rate)
-        combat_power: int = definition.combat_power(current_cultivation, growth_rate, inherited_cp)
 
         values = [
             f'**"{pet_nick}"**' if pet_nick != pet_name else "\n",
@@ -290,6 +295,7 @@ class Pets(commands.Cog):
     async def slash_pet_nickname(self, inter: disnake.CommandInteraction, nick: str):
         await inter.response.defer()
         await Pet.filter(user_id=inter.author.id, main=1).update(nickname=nick)
+        Leaderboards().touch(BOARD_PET, inter.author.id)
 
         log_event(inter.author.id, "pet", f"Changed nickname to {nick}")
         embed = BasicEmbeds.right_tick(f"Successfully updated your pet's nickname to **{nick}**")
@@ -384,7 +390,7 @@ class Pets(commands.Cog):
             await remove_from_inventory(inter.author.id, egg_id, egg_quantity)
             log_event(inter.author.id, "pet", f"Fed {egg_quantity}x {egg_id} to {pet_info[0]}")
 
-        content = await bestiary.add_pet_experience(inter.author.id, exp_to_give, (definition, growth_rate, current_cultivation, pet_exp))
+        content = await bestiary.add_pet_experience(inter.author.id, exp_to_give, (definition, growth_rate, current_cultivation, pet_exp, pet_cp))
         embed = BasicEmbeds.add_plus(content, "Done!")
 
         log_event(inter.author.id, "pet", f"Gaining {exp_to_give:,} EXP")
@@ -395,12 +401,12 @@ class Pets(commands.Cog):
     async def slash_pet_evolve(self, inter: disnake.CommandInteraction):
         await inter.response.defer()
 
-        pet_info = await Pet.get_or_none(user_id=inter.author.id, main=1).values_list("pet_id", "p_major", "p_minor", "p_exp", "growth_rate", "p_cp")
+        pet_info = await Pet.get_or_none(user_id=inter.author.id, main=1).values_list("pet_id", "p_major", "p_minor", "p_exp", "growth_rate", "combat_power")
         if not pet_info:
             await inter.edit_original_message(embed=BasicEmbeds.no_main_pet())
             return
 
-        pet_name, pet_major, pet_minor, pet_exp, growth_rate, p_cp = pet_info
+        pet_name, pet_major, pet_minor, pet_exp, growth_rate, current_power = pet_info
         bestiary: Bestiary = Bestiary()
 
         definition: PetBeastDefinition = bestiary.get_pet_definition(pet_name)
@@ -432,7 +438,6 @@ class Pets(commands.Cog):
         for item_id, item_count in evo_requirements.items():
             await remove_from_inventory(inter.author.id, item_id, item_count, ring_id)
 
-        current_power: int = definition.combat_power(cultivation, growth_rate, p_cp)
         current_quality: int = definition.quality_from_growth(growth_rate)
 
         evolved_quality: int = random.randint(current_quality - 5, current_quality + 5)
@@ -452,12 +457,12 @@ class Pets(commands.Cog):
     @slash_pet.sub_command(name="reroll", description="Reroll the quality of pet at starting stage")
     async def slash_pet_reroll(self, inter: disnake.CommandInteraction, amp_id: str = commands.Param(None, name="amp_id", description="The id of the pet amplifier to use in the reroll")):
         await inter.response.defer()
-        pet_info = await Pet.get_or_none(user_id=inter.author.id, main=1).values_list("pet_id", "p_major", "p_minor", "p_exp", "beast_id", "growth_rate", "reroll_count")
+        pet_info = await Pet.get_or_none(user_id=inter.author.id, main=1).values_list("pet_id", "p_major", "p_minor", "p_exp", "beast_id", "growth_rate", "reroll_count", "p_cp")
         if not pet_info:
             await inter.edit_original_message(embed=BasicEmbeds.no_main_pet())
             return
 
-        pet_name, pet_major, pet_minor, pet_exp, parent_beast, growth_rate, reroll_count = pet_info
+        pet_name, pet_major, pet_minor, pet_exp, parent_beast, growth_rate, reroll_count, inherited_cp = pet_info
         bestiary: Bestiary = Bestiary()
         definition: PetBeastDefinition = bestiary.get_pet_definition(pet_name)
 
@@ -532,7 +537,9 @@ class Pets(commands.Cog):
 
         new_growth_rate, new_quality = definition.roll_growth_rate(quality_inc)
 
-        await Pet.filter(user_id=inter.author.id, main=1).update(growth_rate=new_growth_rate)
+        new_power: int = definition.combat_power(cultivation, new_growth_rate, inherited_cp)
+        await Pet.filter(user_id=inter.author.id, main=1).update(growth_rate=new_growth_rate, combat_power=new_power)
+        Leaderboards().update_pet(inter.author.id, new_power)
         log_event(inter.author.id, "pet", f"Rerolled the pet, {current_quality} -> {new_quality} Quality, {growth_rate} -> {new_growth_rate} Growth Rate \n\nUsed {cost:,} gold on re-rolling")
 
         await inter.edit_original_message(embed=BasicEmbeds.right_tick(f"Your pet quality changed from {current_quality}% to {new_quality}%, growth rate changed from {growth_rate} to {new_growth_rate}!"))
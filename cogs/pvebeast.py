@@ -1,16 +1,15 @@
-import asyncio
 import random
 from collections import defaultdict
 from datetime import timedelta, datetime, time as dt
 from time import time
-from typing import Any, Optional
+from typing import Optional
 
 import disnake
-from disnake.ext import commands, tasks
-from tortoise.expressions import F
+from disnake.ext import commands
 
+from adventure.raid import RaidManager, RaidState, RAID_FREE_ATTACKS
 from utils.loot import merge_loot
-from world.bestiary import Bestiary, BeastDefinition, autocomplete_beast_name, AFFINITIES, AFFINITY_BLOOD, AFFINITY_DARK, AFFINITY_DRAGON, AFFINITY_EARTH, AFFINITY_FIRE, AFFINITY_ICE, AFFINITY_LIGHTNING, AFFINITY_MYSTERIOUS, AFFINITY_POISON, \
+from world.bestiary import Bestiary, BeastDefinition, BeastPool, autocomplete_beast_name, AFFINITIES, AFFINITY_BLOOD, AFFINITY_DARK, AFFINITY_DRAGON, AFFINITY_EARTH, AFFINITY_FIRE, AFFINITY_ICE, AFFINITY_LIGHTNING, AFFINITY_MYSTERIOUS, AFFINITY_POISON, \
     AFFINITY_ROCK, AFFINITY_WATER, AFFINITY_WIND, AFFINITY_WOOD, compute_affinity_str, BEAST_FLAME_DROP
 from world.continent import Continent
 from world.compendium import ItemCompendium, ItemDefinition, PetAmplifierDefinition
@@ -22,10 +21,12 @@ from utils.Database import AllBeasts, Beast, AllItems, Cultivation, Pet
 from utils.Embeds import BasicEmbeds
 from utils.EnergySystem import show_energy
 from utils.ExpSystem import calculate_hunt_exp
-from utils.InventoryUtils import add_to_inventory, check_inv_weight, check_item_in_inv, get_equipped_ring_id, remove_from_inventory, ITEM_TYPE_BEAST_FLAME
+from utils.InventoryUtils import add_items_within_weight, add_to_inventory, check_inv_weight, check_item_in_inv, get_equipped_ring_id, remove_from_inventory, ITEM_TYPE_BEAST_FLAME
 from utils.LoggingUtils import log_event
 from utils.Styles import MINUS, EXCLAMATION, CROSS, TICK, PLUS
 from utils.base import BaseStarfallCog
+from utils.refresher import MessageRefresher
+from utils.scheduler import Scheduler
 from world.cultivation import PlayerCultivationStage
 from cogs.eventshop import EVENT_CONFIG, EVENT_SHOP, EVENT_MANAGER
 
@@ -48,6 +49,16 @@ BEAST_REGIONS = {
     "Frozen Tundra": {"type": [AFFINITY_ICE], "pass": "glacier_rune"}
 }
 
+RAID_BEAST_DURATION: timedelta = timedelta(hours=6)
+RAID_LOG_FLUSH_INTERVAL: timedelta = timedelta(seconds=5)
+RAID_CHECKPOINT_INTERVAL: timedelta = timedelta(minutes=1)
+RAID_END_RETRY_DELAY: timedelta = timedelta(minutes=5)  # Same pace as the polling loop this job replaced, which kept trying while till was set
+
+_JOB_RAID_SPAWN: str = "beast.raid_spawn"
+_JOB_RAID_END_PREFIX: str = "beast.raid_end."
+_JOB_RAID_LOG_FLUSH: str = "beast.raid_log_flush"
+_JOB_RAID_CHECKPOINT: str = "beast.raid_checkpoint"
+
 SOLO_HUNT_ENERGY_COST: int = 12
 SOLO_HUNT_COUNT_CHOICES: list[int] = [1, 5, 10, 15, 25]
 
@@ -66,22 +77,6 @@ HUNT_FAIL_STRINGS = ["You did not encounter any beasts.",
                      "You encountered a beast but it was above your level, so you could only run away."]
 
 
-def beast_list_to_rank_dict(beasts: list[BeastDefinition]):
-    beast_rank_dict: dict[int, list[BeastDefinition]] = {}
-    for beast in beasts:
-        if beast.rank not in beast_rank_dict:
-            beast_rank_dict[beast.rank] = []
-
-        beast_rank_dict[beast.rank].append(beast)
-
-    return beast_rank_dict
-
-
-def get_better_beast_rate(beast_dict: dict[int, list[BeastDefinition]]) -> BeastDefinition:
-    rank = random.choice(list(beast_dict.keys()))
-    return random.choice(beast_dict[rank])
-
-
 async def calculate_exp_given(attackers: dict[str, list[int]], total_exp: int, give_exp: bool = True) -> dict[int, int]:
     rewards: dict[int, int] = {}
     total_damage: int = sum([sum(dmg_list) for dmg_list in attackers.values()])
@@ -121,16 +116,66 @@ async def spawn_raid_beast(bot: commands.Bot, ch_id: int, beast: BeastDefinition
     view = MagicBeastView()
     msg = await ch.send(embed=embed, view=view)
 
-    await Beast.create(beast_id=beast.name, beast_type="raid", msg_id=msg.id, current_health=beast.health, total_health=beast.health, till=(datetime.now() + timedelta(hours=6)))
+    till: datetime = datetime.now() + RAID_BEAST_DURATION
+    await Beast.create(beast_id=beast.name, beast_type="raid", msg_id=msg.id, current_health=beast.health, total_health=beast.health, till=till)
+    RaidManager().open(msg.id, beast.name, beast.health)
+    schedule_raid_end(msg.id, till)
 
     log_event(f"CH {ch_id}", "beast", f"Spawned {beast.name}")
 
     return True
 
 
+def schedule_raid_end(msg_id: int, till: datetime):
+    job_name: str = f"{_JOB_RAID_END_PREFIX}{msg_id}"
+
+    async def _end_raid():
+        try:
+            ended: bool = await end_raid_beast(msg_id)
+        except Exception as e:
+            log_event("system", "beast", f"Failed to end raid {msg_id}: {e!r}", "ERROR")
+            ended = False
+
+        if not ended:
+            # The job runs only once, so the raid would otherwise stay up until the next restart
+            Scheduler().schedule_once(job_name, _end_raid, RAID_END_RETRY_DELAY)
+
+    Scheduler().schedule_once(job_name, _end_raid, till)
+
+
+def cancel_raid_end(msg_id: int):
+    Scheduler().cancel(f"{_JOB_RAID_END_PREFIX}{msg_id}")
+
+
+async def end_raid_beast(msg_id: int) -> bool:
+    # Returns False if the raid couldn't be ended for now
+    world: Continent = Continent()
+    channel = world.beast_raid_channel
+    if channel:
+        try:
+            msg: disnake.Message = await channel.fetch_message(msg_id)
+            await slain_raid_beast(msg)
+            await Beast.filter(msg_id=msg_id).update(till=None)
+        except disnake.errors.NotFound:
+            pass
+
+        return True
+    else:
+        log_event("system", "beast", f"Couldn't locate the beast raid channel (id = {world.beast_raid_channel_id})")
+        return False
+
+
 async def slain_raid_beast(msg: disnake.Message):
-    boss_data = await Beast.get_or_none(msg_id=msg.id).values_list("beast_id", "attackers")
-    beast_name, attackers = boss_data
+    # A health refresh landing after the final edit would bring the attack button back
+    MessageRefresher().cancel(msg.id)
+    raid: Optional[RaidState] = await RaidManager().close(msg.id)
+    if raid is not None:
+        beast_name: str = raid.beast_name
+        attackers: dict[str, list[int]] = raid.serialize_attackers()
+    else:
+        # Not tracked by the raid manager, e.g. a raid that already ended, fall back to the last persisted state
+        beast_name, attackers = await Beast.get_or_none(msg_id=msg.id).values_list("beast_id", "attackers")
+
     beast: BeastDefinition = Bestiary().get(beast_name).as_raid()
 
     top_attackers: list[str] = sorted(attackers, key=lambda k: sum(attackers[k]), reverse=True)
@@ -200,50 +245,74 @@ class HealthButton(disnake.ui.Button):
 
 
 class MagicBeastView(disnake.ui.View):
-    def __init__(self):
+    def __init__(self, health: Optional[int] = None):
         super().__init__(timeout=None)
+        if health is not None:
+            self.add_item(HealthButton(ParamsUtils.format_num_abbr0(max(health, 0))))
 
     @disnake.ui.button(label="Attack", style=disnake.ButtonStyle.green, custom_id="beast_attack_button")
     async def attack_beast(self, _: disnake.ui.Button, inter: disnake.MessageInteraction):
+        raid: Optional[RaidState] = RaidManager().get(inter.message.id)
+        if raid is None or raid.closed:
+            await inter.response.send_message("This beast is no longer here", ephemeral=True)
+            return
 
-        boss_data = await Beast.get_or_none(msg_id=inter.message.id).values_list("attackers", flat=True)
-
-        attackers_dict: dict[str, Any] = boss_data
-
-        author_id = str(inter.author.id)
-
-        player_dmg_list = attackers_dict.get(author_id)
-        if player_dmg_list is None:
-            attackers_dict[author_id] = []
-
-        user_damage_data = attackers_dict[author_id]
-        if len(user_damage_data) < 3:
-            pass
-        elif len(user_damage_data) < 6:
-            async with PlayerRoster().get(inter.author.id) as player:
-                energy_check = player.consume_energy(36)
-
-            if not energy_check:
-                await inter.response.send_message("You dont have enough energy to participate", ephemeral=True)
-                return
-        else:
+        # The attack slot is reserved right away so that concurrent clicks cannot go over the attack limit
+        attack_index: Optional[int] = await raid.reserve_attack(inter.author.id)
+        if attack_index is None:
             await inter.response.send_message(content="**You have run out of attacks**", ephemeral=True)
             return
 
-        player: Player = PlayerRoster().get(inter.author.id)
-        display_cp = await player.compute_total_cp()
-
-        _, _, battle_boost, _ = await DatabaseUtils.compute_pill_bonus(inter.author.id, battle=1)
-        display_cp = display_cp * (1 + battle_boost / 100)
+        remaining_health: Optional[int] = None
+        energy_spent: int = 0
+        try:
+            if attack_index >= RAID_FREE_ATTACKS:
+                async with PlayerRoster().get(inter.author.id) as player:
+                    # The raid may have closed while waiting for the player
+                    if raid.closed:
+                        energy_check = True
+                    else:
+                        energy_check = player.consume_energy(36)
+                        energy_spent = 36 if energy_check else 0
+
+                if not energy_check:
+                    await inter.response.send_message("You dont have enough energy to participate", ephemeral=True)
+                    return
+
+            player: Player = PlayerRoster().get(inter.author.id)
+            display_cp = await player.compute_total_cp()
+
+            _, _, battle_boost, _ = await DatabaseUtils.compute_pill_bonus(inter.author.id, battle=1)
+            display_cp = display_cp * (1 + battle_boost / 100)
+
+            internal_cp = ParamsUtils.display_to_internal_cp(display_cp)
+            player_damage = round(ParamsUtils.internal_cp_to_attack(internal_cp))
+            display_damage = ParamsUtils.format_num_abbr0(player_damage)
+
+            remaining_health = await raid.record_attack(inter.author.id, player_damage)
+        finally:
+            if remaining_health is None and not raid.closed:
+                raid.release_attack(inter.author.id)
+
+            if remaining_health is None and energy_spent > 0:
+                # The attack didn't land, don't charge for it
+                async with PlayerRoster().get(inter.author.id) as player:
+                    player.add_energy(energy_spent)
+
+        if remaining_health is None:
+            await inter.response.send_message("The beast ran away before your attack landed", ephemeral=True)
+        else:
+            await inter.response.send_message(f"You have dealt **`{display_damage}`** Damage", ephemeral=True)
+            request_raid_health_refresh(inter.message, raid)
 
-        internal_cp = ParamsUtils.display_to_internal_cp(display_cp)
-        player_damage = round(ParamsUtils.internal_cp_to_attack(internal_cp))
-        display_damage = ParamsUtils.format_num_abbr0(player_damage)
 
-        attackers_dict[author_id].append(player_damage)
+def request_raid_health_refresh(msg: disnake.Message, raid: RaidState):
+    # Attacks within the debounce window result in a single edit showing the health at the time of the edit
+    async def _refresh():
+        if not raid.closed:
+            await msg.edit(view=MagicBeastView(raid.current_health))
 
-        await Beast.filter(msg_id=inter.message.id).update(current_health=F("current_health") - player_damage, attackers=attackers_dict)
-        await inter.response.send_message(f"You have dealt **`{display_damage}`** Damage", ephemeral=True)
+    MessageRefresher().request(msg.id, _refresh, msg.channel.id)
 
 
 class SlainRewardView(disnake.ui.View):
@@ -289,9 +358,8 @@ class SlainRewardView(disnake.ui.View):
         await inter.response.send_message(embed=embed, ephemeral=True)
 
 
-async def spawn_solo_hunt(inter: disnake.MessageInteraction, hunt_count: int, region: str, beast_data: list[BeastDefinition], major: int):
+async def spawn_solo_hunt(inter: disnake.MessageInteraction, hunt_count: int, region: str, major: int):
     content = []
-    beasts: list[BeastDefinition] = []
     await drop_origin_qi(inter.guild, inter.author.id)
     ring_id = await get_equipped_ring_id(inter.author.id)
 
@@ -331,39 +399,27 @@ async def spawn_solo_hunt(inter: disnake.MessageInteraction, hunt_count: int, re
 
     content.append(f"{EXCLAMATION} Used {energy_cost} energy to do {hunt_count} hunts\n")
 
-    all_beasts: list[BeastDefinition] = [beast for beast in beast_data for b_type in beast_affinity_filter if b_type in beast.affinities]
-
+    rank_limit: Optional[int] = None
     if region == 'Continental Plains':  # For default region, only encounter beasts up to your rank
-        rank_limit: int = major if major != 9 else major - 1
-        all_beasts = [beast for beast in all_beasts if beast.rank <= rank_limit]
+        rank_limit = major if major != 9 else major - 1
 
-    all_beast_dict: dict[int, list[BeastDefinition]] = beast_list_to_rank_dict(all_beasts)
+    hunt_pool: BeastPool = Bestiary().hunt_pool(beast_affinity_filter, rank_limit)
 
     _, _, battle_boost, beast_lure_details = await DatabaseUtils.compute_pill_bonus(inter.author.id, battle=hunt_count, beast_l_remove=True)
     if beast_lure_details:  # Lure used
         min_rank, max_rank, limit = beast_lure_details[0], beast_lure_details[1], beast_lure_details[2]
-        lured_beasts: list[BeastDefinition] = [beast for beast in all_beasts if min_rank <= beast.rank <= max_rank]
-        if len(lured_beasts) < 1:
+        lured_pool: BeastPool = hunt_pool.rank_range(min_rank, max_rank)
+        if len(lured_pool) < 1:
             content.append(f"{EXCLAMATION} You have used the lure pill.. but there weren't enough any Rank {max_rank} to Rank {min_rank} beast to lure, hunting all the beasts instead")
-            lured_beasts = all_beasts
+            lured_pool = hunt_pool
         else:
             content.append(f"{EXCLAMATION} You have used a lure pill, hunting beast between {min_rank} - {max_rank} Rank")
 
-        lured_beast_dict: dict[int, list[BeastDefinition]] = beast_list_to_rank_dict(lured_beasts)
-        for i in range(hunt_count):
-            if limit > 0:
-                limit -= 1
-                beast: BeastDefinition = get_better_beast_rate(lured_beast_dict)
-            else:
-                beast: BeastDefinition = get_better_beast_rate(all_beast_dict)
-
-            beasts.append(beast)
-
-    else:  # Lure not used, rune may or not have been used, but it already filtered all_beast_dict if a rune was used
-        lured_beasts: list[BeastDefinition] = []
-        for i in range(hunt_count):
-            beast: BeastDefinition = get_better_beast_rate(all_beast_dict)
-            beasts.append(beast)
+        lured_count: int = min(max(limit, 0), hunt_count)
+        beasts: list[BeastDefinition] = lured_pool.choose_many(lured_count) + hunt_pool.choose_many(hunt_count - lured_count)
+    else:  # Lure not used, rune may or not have been used, but it already filtered the pool if a rune was used
+        lured_pool: Optional[BeastPool] = None
+        beasts: list[BeastDefinition] = hunt_pool.choose_many(hunt_count)
 
     player: Player = PlayerRoster().get(inter.author.id)
 
@@ -378,17 +434,21 @@ async def spawn_solo_hunt(inter: disnake.MessageInteraction, hunt_count: int, re
 
     pet_rank = await Pet.get_or_none(user_id=inter.author.id, main=1).values_list("pet__rank", flat=True)
 
+    player_damage = round(ParamsUtils.internal_cp_to_attack(internal_cp))
+    display_damage = ParamsUtils.format_num_abbr0(player_damage)
+    encounter_rate = get_hunt_encounter_rate(major)
+
+    # Resolve every hunt in memory first, then persist the whole run at once
+    loot_drops: list[tuple[str, int]] = []
+    killed_beasts: list[Beast] = []
+    pet_exp_amounts: list[int] = []
     for beast in beasts:
         if beast_lure_details:
-            if beast not in lured_beasts:
+            if beast not in lured_pool:
                 l_str = f"{EXCLAMATION} Your lure pill limit reached, hunting all beasts"
                 if l_str not in content:
                     content.append(l_str)
 
-        player_damage = round(ParamsUtils.internal_cp_to_attack(internal_cp))
-        display_damage = ParamsUtils.format_num_abbr0(player_damage)
-
-        encounter_rate = get_hunt_encounter_rate(major)
         if encounter_rate >= 100 or random.randint(1, 100) <= encounter_rate:  # Fail to encounter beast
             if player_damage >= beast.health:
                 content.append(f"{TICK} You have killed **Rank `{beast.rank}` {beast.name}**, dealing **`{display_damage}`** dmg!")
@@ -396,25 +456,24 @@ async def spawn_solo_hunt(inter: disnake.MessageInteraction, hunt_count: int, re
                 total_dmg_done += player_damage
 
                 loot: dict[str, int] = beast.loot.roll()
-                for item_id, item_count in loot.items():
-                    continue_check, d_ring_id, _ = await check_inv_weight(None, inter.author.id, item_id, item_count, ring_id=ring_id, confirm_prompt=False)
-                    if continue_check is True:
-                        await add_to_inventory(inter.author.id, item_id, item_count, d_ring_id)
-
+                loot_drops.extend(loot.items())
                 if pet_rank is not None:
-                    pet_exp_amount = calculate_hunt_exp(pet_rank, beast.rank)
-                    bestiary: Bestiary = Bestiary()
-                    await bestiary.add_pet_experience(inter.author.id, pet_exp_amount)
+                    pet_exp_amounts.append(calculate_hunt_exp(pet_rank, beast.rank))
 
-                await asyncio.sleep(random.uniform(0.1, 0.2))
-                await Beast.create(beast_id=beast.name, beast_type="hunt", msg_id=inter.message.id, current_health=(beast.health - player_damage), total_health=beast.health,
-                                   attackers=inter.author.id, mat_drops=loot, mcore_drop=None)
+                killed_beasts.append(Beast(beast_id=beast.name, beast_type="hunt", msg_id=inter.message.id, current_health=(beast.health - player_damage), total_health=beast.health,
+                                           attackers=inter.author.id, mat_drops=loot, mcore_drop=None))
             else:
                 content.append(f"{CROSS} You have failed to kill **Rank `{beast.rank}` {beast.name}**")
         else:
             fail_string = random.choice(HUNT_FAIL_STRINGS)
             content.append(f"{MINUS} *{fail_string}*")
 
+    await add_items_within_weight(inter.author.id, loot_drops, ring_id)
+    if len(killed_beasts) > 0:
+        await Beast.bulk_create(killed_beasts)
+
+    await Bestiary().add_pet_experience_batch(inter.author.id, pet_exp_amounts)
+
     async with PlayerRoster().get(inter.author.id) as player:
         await player.add_experience(total_beast_exp)
 
@@ -470,11 +529,10 @@ class SoloHuntEmbed(disnake.Embed):
 
 
 class SoloHuntView(disnake.ui.View):
-    def __init__(self, author: disnake.User, region_list, beasts: list[BeastDefinition], major: int):
+    def __init__(self, author: disnake.User, region_list, major: int):
         super().__init__(timeout=None)
 
         self.author: disnake.User = author
-        self.beast_data: list[BeastDefinition] = beasts
         self.major: int = major
 
         self.region = "Continental Plains"
@@ -493,7 +551,7 @@ class SoloHuntView(disnake.ui.View):
     async def start_hunt(self, _: disnake.ui.Button, inter: disnake.MessageInteraction):
         self.clear_items()
         await inter.response.edit_message(embed=BasicEmbeds.exclamation(f"Started your {self.hunt_count}x beast hunts in region {self.region}"), view=self)
-        await spawn_solo_hunt(inter, self.hunt_count, self.region, self.beast_data, self.major)
+        await spawn_solo_hunt(inter, self.hunt_count, self.region, self.major)
 
     @disnake.ui.button(label="Region Info", style=disnake.ButtonStyle.secondary)
     async def region_info(self, _: disnake.ui.Button, inter: disnake.MessageInteraction):
@@ -567,50 +625,26 @@ class PveBeast(BaseStarfallCog):
         self.beast_attack_button: bool = False
 
     async def _do_load(self):
-        if not self.beast_spawn_loop.is_running():
-            self.beast_spawn_loop.start()
-        if not self.raid_slain_loop.is_running():
-            self.raid_slain_loop.start()
-
-    def _do_unload(self):
-        self.beast_spawn_loop.cancel()
-        self.raid_slain_loop.cancel()
-
-    # ////////////////////////////////////////////
-
-    @tasks.loop(time=RAID_BEAST_SPAWN_TIMES)
-    async def beast_spawn_loop(self):
-        await self._spawn_default_beast_raid()
-
-    @beast_spawn_loop.before_loop
-    async def before_number(self):
-        await self.bot.wait_until_ready()
+        scheduler: Scheduler = Scheduler()
+        scheduler.schedule_daily(_JOB_RAID_SPAWN, self._spawn_default_beast_raid, RAID_BEAST_SPAWN_TIMES)
+        scheduler.schedule_recurring(_JOB_RAID_LOG_FLUSH, RaidManager().flush_all, RAID_LOG_FLUSH_INTERVAL)
+        scheduler.schedule_recurring(_JOB_RAID_CHECKPOINT, RaidManager().checkpoint_all, RAID_CHECKPOINT_INTERVAL)
 
-    # ////////////////////////////////////////////
+        # Each pending raid wakes up exactly when it's due instead of having a loop scan the whole table
+        boss_data = await Beast.filter(till__isnull=False).values_list("msg_id", "till")
+        for msg_id, till in boss_data:
+            schedule_raid_end(msg_id, till)
 
-    @tasks.loop(minutes=5)
-    async def raid_slain_loop(self):
-        boss_data = await Beast.all().values_list("msg_id", "till")
-
-        channel_id = Continent().beast_raid_channel_id
-        channel = self.bot.get_channel(channel_id)
-        if channel:
-            for boss in boss_data:
-                msg_id, till = boss
-                if till:
-                    if datetime.now().timestamp() > till.timestamp():
-                        try:
-                            msg: disnake.Message = await channel.fetch_message(msg_id)
-                            await slain_raid_beast(msg)
-                            await Beast.filter(msg_id=msg_id).update(till=None)
-                        except disnake.errors.NotFound:
-                            pass
-        else:
-            log_event("raid_slain_loop", "beast", f"Couldn't locate the beast raid channel (id = {channel_id})")
+        scheduler.start(self.bot)
 
-    @raid_slain_loop.before_loop
-    async def before_beast(self):
-        await self.bot.wait_until_ready()
+    def _do_unload(self):
+        scheduler: Scheduler = Scheduler()
+        scheduler.cancel(_JOB_RAID_SPAWN)
+        scheduler.cancel(_JOB_RAID_LOG_FLUSH)
+        scheduler.cancel(_JOB_RAID_CHECKPOINT)
+        for job in scheduler.jobs:
+            if job.name.startswith(_JOB_RAID_END_PREFIX):
+                scheduler.cancel(job.name)
 
     # ////////////////////////////////////////////
 
@@ -657,7 +691,7 @@ class PveBeast(BaseStarfallCog):
                     region_list.append((region_name, description_str, "⚔️"))
 
             embed = SoloHuntEmbed("All Regions", 1)
-            view = SoloHuntView(inter.author, region_list, beasts, cultivation.major)
+            view = SoloHuntView(inter.author, region_list, cultivation.major)
             await inter.edit_original_message(embed=embed, view=view)
 
         else:  # Unable to hunt beasts
@@ -702,6 +736,7 @@ class PveBeast(BaseStarfallCog):
     @slash_raid_admin.sub_command(name="end", description="Forcefully end a raid beast")
     async def slash_raid_admin_end(self, inter: disnake.CommandInteraction, message_id: str):
         msg: disnake.Message = await inter.channel.fetch_message(message_id)
+        cancel_raid_end(msg.id)
         await slain_raid_beast(msg)
         await Beast.filter(msg_id=message_id).update(till=None)
         await inter.send("Beast Slain", ephemeral=True)
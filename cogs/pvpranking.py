@@ -2,6 +2,7 @@ import asyncio
 import math
 import random
 from datetime import datetime
+from typing import Optional
 
 import disnake
 from disnake.ext import commands
@@ -14,6 +15,7 @@ from utils.Embeds import BasicEmbeds
 from utils.ParamsUtils import ELO_RANKS, ELO_SUB_RANKS, SUB_RANK_POINTS, MAX_EXCESS_POINTS, MAX_POINTS
 from utils.ParamsUtils import elo_from_rank_points
 from utils.Styles import BASIC_EMOJIS, LEFT, RIGHT
+from world.matchmaking import MatchmakingPool, is_frozen
 
 WIN_POINTS = 18  # Number of points gained upon win
 WIN_POINTS_DICT = {"Unranked": 18, "Huang": 18, "Xuan": 16, "Di": 14, "Tian": 12}
@@ -22,6 +24,8 @@ LOSS_POINTS_DICT = {"Unranked": 12, "Huang": 12, "Xuan": 14, "Di": 16, "Tian": 1
 PROMOTION_FAIL_PENALTY = 25
 DEMOTION_PENALTY = 25
 
+MATCH_FIELDS = ("pill_used", "cultivation__user_id", "cultivation__major", "cultivation__minor", "pvp__rank_points", "pvp__pvp_promo", "pvp__pvp_demote", "pvp__rank_points_before_promo", "pvp__pvp_cooldown")
+
 
 # Returns whether the opponent is valid given rank points
 def is_potential_opponent(rank_points, opponent_rank_points):
@@ -34,11 +38,10 @@ def is_potential_opponent(rank_points, opponent_rank_points):
 
     sub_rank = (rank_points - 1) // SUB_RANK_POINTS
     opponent_sub_rank = (opponent_rank_points - 1) // SUB_RANK_POINTS
-    opponent_excess_points = (opponent_rank_points - 1) % SUB_RANK_POINTS
 
     opponent_is_unranked = False  # TODO (opponent_rank_points == 0)
     within_one_sub_rank = (sub_rank - 1) <= opponent_sub_rank <= (sub_rank + 1)
-    opponent_frozen = (opponent_excess_points == MAX_EXCESS_POINTS) and (opponent_sub_rank == ELO_SUB_RANKS[-1])
+    opponent_frozen = is_frozen(opponent_rank_points)
 
     return within_one_sub_rank and not opponent_frozen and not opponent_is_unranked
 
@@ -96,19 +99,9 @@ class PvpRanking(commands.Cog):
     @ranked.sub_command(name="match", description="Play Ranked matches against other players")
     async def match(self, ctx: disnake.CommandInteraction):
         outcome = 'random'
-        all_users = await Users.all().prefetch_related("cultivation", "alchemy").values("pill_used", "cultivation__user_id", "cultivation__major", "cultivation__minor",
-                                                                                        "pvp__rank_points", "pvp__pvp_promo", "pvp__pvp_demote", "pvp__rank_points_before_promo", "pvp__pvp_cooldown")
-
-        # Represents potential opponents
-        allowed_users = [user for user in all_users if user["cultivation__major"] >= 1]
+        host = await Users.get_or_none(user_id=ctx.author.id).values(*MATCH_FIELDS)
 
         outcome_str = ""
-        host = None
-        for user in all_users:
-            if user["cultivation__user_id"] == ctx.author.id:  # You are allowed to play
-                host = user
-                allowed_users.remove(user)  # Can't play against yourself
-
         if host is not None:
             await ctx.response.defer()
 
@@ -151,15 +144,15 @@ class PvpRanking(commands.Cog):
             # Pick an opponent (+/-1 sub-rank)
             # Also, opponent excess points cannot be at MAX_EXCESS_POINTS
             # (Otherwise they would be passively entering promos)
-            # good_users = [user for user in allowed_users if ((user[3] % SUB_RANK_POINTS) < MAX_EXCESS_POINTS)]
-            good_users = [user for user in allowed_users if is_potential_opponent(host["pvp__rank_points"], user["pvp__rank_points"])]
+            pool: MatchmakingPool = MatchmakingPool()
+            opponent_id: Optional[int] = pool.pick(ctx.author.id, host["pvp__rank_points"])
+            opponent = None if opponent_id is None else await Users.get_or_none(user_id=opponent_id).values(*MATCH_FIELDS)
 
-            if len(good_users) == 0:  # No potential opponents
+            if opponent is None:  # No potential opponents
 
                 await ctx.edit_original_message(content=f'''No potential opponents found!''')
 
             else:  # Play a ranked match
-                opponent = random.choice(good_users)
 
                 # Get opponent elo information
                 opponent_elo_rank, opponent_elo_sub_rank, opponent_excess_points = elo_from_rank_points(opponent["pvp__rank_points"])
@@ -295,6 +288,10 @@ class PvpRanking(commands.Cog):
                             loser_rank_points = 1 if (loser["pvp__rank_points"] - LOSS_POINTS_DICT[opponent_elo_rank]) < 1 else (loser["pvp__rank_points"] - LOSS_POINTS_DICT[opponent_elo_rank])
                             await Pvp.filter(user_id=loser["cultivation__user_id"]).update(rank_points=loser_rank_points)
 
+                # Both rank points may have changed in any of the branches above
+                for user_id, rank_points in await Pvp.filter(user_id__in=[host["cultivation__user_id"], opponent["cultivation__user_id"]]).values_list("user_id", "rank_points"):
+                    pool.update_rank_points(user_id, rank_points)
+
                 # Report results
                 opponent_dcp = ParamsUtils.format_num_abbr0(opponent_cp)
                 host_dcp = ParamsUtils.format_num_abbr0(host_cp)
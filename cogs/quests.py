@@ -14,6 +14,7 @@ from utils.Embeds import BasicEmbeds
 from utils.InventoryUtils import check_item_in_inv, remove_from_inventory, ConfirmDelete, convert_id
 from utils.Styles import PLUS, RIGHT, CROSS
 from utils.base import BaseStarfallCog, BaseStarfallEmbed
+from utils.refresher import MessageRefresher
 from utils.loot import RandomLoot, uniform_quantity, FlatEnergyLoot, ChoiceLoot, Loot, uniform_distribution, PSEUDO_ITEM_ID_GOLD
 from world.compendium import ItemCompendium, ItemDefinition
 from world.continent import Continent
@@ -29,6 +30,8 @@ QUEST_RANK_NAMES = {
 PERSISTENT_QUEST_BOARD_PAGE_SIZE: int = 10
 EPHEMERAL_QUEST_BOARD_PAGE_SIZE: int = 5
 
+_QUEST_BOARD_REFRESH_KEY: str = "quest_board"
+
 
 def contributor_dict_to_str(contributors: dict[int, int]) -> str:
     list_prefix = "- "
@@ -396,6 +399,10 @@ class QuestBoard:
         return msg.id
 
     async def update_msg(self) -> None:
+        # Contributions come in bursts, so the board edits are coalesced and the board is rendered when the edit actually happens
+        MessageRefresher().request(_QUEST_BOARD_REFRESH_KEY, self._do_update_msg, Continent().quest_channel_id)
+
+    async def _do_update_msg(self) -> None:
         embed = self.embed
         msg_id = await self.board_id()
         if msg_id is None:
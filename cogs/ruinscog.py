@@ -2,9 +2,10 @@ from abc import ABC, abstractmethod
 
 import disnake
 
+from datetime import timedelta
 from typing import Union, Optional, cast
 
-from disnake.ext import commands, tasks
+from disnake.ext import commands
 
 from character.player import PlayerRoster, Player, PlayerActionButton
 from adventure.ruins import RuinsManager, Ruins, ENERGY_TO_START, RuinsLeftEmbed, RuinsWelcomeEmbed, Room, RoomEmbed, BASE_ENERGY_COST_SEARCH, BASE_ENERGY_COST_EXPLORE, BASE_ENERGY_COST_FIGHT, BASE_ENERGY_COST_SNEAK, \
@@ -13,9 +14,12 @@ from utils.Embeds import BasicEmbeds
 from utils.InventoryUtils import ConfirmDelete
 from utils.LoggingUtils import log_event
 from utils.base import BaseStarfallCog, PlayerInputException, PrerequisiteNotMetException, BaseStarfallPersistentView
+from utils.scheduler import Scheduler
 from world.cultivation import PlayerCultivationStage
 
 _SHORT_NAME: str = "ruins"
+_JOB_PURGE: str = "ruins.purge"
+_PURGE_INTERVAL: timedelta = timedelta(hours=12)
 MINIMUM_CULTIVATION_MAJOR = 4
 
 
@@ -76,10 +80,18 @@ class RuinsManagerCog(BaseStarfallCog):
     def searched_view(self) -> disnake.ui.View:
         return self._searched_view
 
-    # ============================================= Discord commands ============================================
+    # ========================================= Disnake lifecycle methods ========================================
+
+    async def _do_load(self):
+        scheduler: Scheduler = Scheduler()
+        scheduler.schedule_recurring(_JOB_PURGE, self.periodic_purge, _PURGE_INTERVAL, first_run=_PURGE_INTERVAL, jitter=timedelta(minutes=5))
+        scheduler.start(self.bot)
+
+    def _do_unload(self):
+        Scheduler().cancel(_JOB_PURGE)
 
-    @tasks.loop(hours=12)
-    async def periodic_purge(self):
+    @staticmethod
+    async def periodic_purge():
         # await RuinsManager().purge_irrelevant_ruins()
         pass
 
@@ -2,10 +2,12 @@ from datetime import datetime, timedelta
 from typing import Union, Optional
 
 import disnake
-from disnake.ext import commands, tasks
+from disnake.ext import commands
 from tortoise.expressions import F
 
-from world.continent import Continent
+from world.continent import Continent, ORIGIN_QI_CHECKPOINT_INTERVAL
+from world.leaderboard import Leaderboards
+from character.active_pills import ActivePills
 from character.player import PlayerRoster, Player, ENERGY_RECOVERY_RATE_MINUTES
 from utils.CommandUtils import check_for_temp
 
@@ -14,9 +16,13 @@ from utils.Embeds import BasicEmbeds
 from utils.LoggingUtils import log_event
 from utils.ParamsUtils import PATREON_ROLES
 from utils.base import BaseStarfallCog, CogNotLoadedError
+from utils.scheduler import Scheduler, CatchUpPolicy
+from utils.Database import Cultivation, Users, Pvp
 
-from utils.EconomyUtils import check_for_tax
-from utils.Database import Cultivation, Users, Pvp, GuildOptionsDict
+_JOB_DAILY_RESET: str = "timeflow.daily_reset"
+_JOB_TEMP_EFFECTS: str = "timeflow.temp_effects"
+_JOB_RECHARGE_ENERGY: str = "timeflow.recharge_energy"
+_JOB_ORIGIN_QI_CHECKPOINT: str = "timeflow.origin_qi_checkpoint"
 
 
 class TimeFlow(BaseStarfallCog):
@@ -27,29 +33,26 @@ class TimeFlow(BaseStarfallCog):
     # ========================================= Disnake lifecycle methods ========================================
 
     async def _do_load(self):
-        if not self.refresh_cooldown.is_running():
-            self.refresh_cooldown.start()
-        if not self.recharge_energy.is_running():
-            self.recharge_energy.start()
+        scheduler: Scheduler = Scheduler()
+        scheduler.schedule_daily(_JOB_DAILY_RESET, self.daily_reset, [self._daily_reset_time], catch_up=CatchUpPolicy.SKIP)
+        scheduler.schedule_recurring(_JOB_TEMP_EFFECTS, self.expire_temp_effects, timedelta(minutes=1), catch_up=CatchUpPolicy.RUN_ONCE)
+        scheduler.schedule_recurring(_JOB_RECHARGE_ENERGY, self.recharge_energy, timedelta(minutes=ENERGY_RECOVERY_RATE_MINUTES), first_run=timedelta(minutes=ENERGY_RECOVERY_RATE_MINUTES),
+                                     catch_up=CatchUpPolicy.RUN_ALL)
+        scheduler.schedule_recurring(_JOB_ORIGIN_QI_CHECKPOINT, Continent().checkpoint_origin_qi_counter, ORIGIN_QI_CHECKPOINT_INTERVAL)
+        scheduler.start(self.bot)
 
     def _do_unload(self):
-        self.refresh_cooldown.cancel()
-        self.recharge_energy.cancel()
-
-    @tasks.loop(minutes=1)
-    async def refresh_cooldown(self):
-        now: datetime = datetime.utcnow()  # We really want utcnow here
-        today_reset_time: datetime = datetime.combine(now.date(), self._daily_reset_time)
-        since_reset: timedelta = now - today_reset_time
-
-        if 0 <= since_reset.total_seconds() < 60:
-            await self.daily_reset()
+        scheduler: Scheduler = Scheduler()
+        scheduler.cancel(_JOB_DAILY_RESET)
+        scheduler.cancel(_JOB_TEMP_EFFECTS)
+        scheduler.cancel(_JOB_RECHARGE_ENERGY)
+        scheduler.cancel(_JOB_ORIGIN_QI_CHECKPOINT)
 
+    async def expire_temp_effects(self):
         # TODO: Declare 4 to 8 oqi increase times and divide the oqi counter drop chance value by the same factor (4 times per day but worth 100, or 8 times a day worth 50)
 
         await check_for_temp(self.bot)
 
-    @tasks.loop(minutes=ENERGY_RECOVERY_RATE_MINUTES)
     async def recharge_energy(self):
         to_notify: list[int] = []
         await Users.filter(energy__lt=F("max_energy")).update(energy=F("energy") + 1)
@@ -64,11 +67,6 @@ class TimeFlow(BaseStarfallCog):
             for user_id in to_notify:
                 await world.whisper(user_id, embed)
 
-    @refresh_cooldown.before_loop
-    @recharge_energy.before_loop
-    async def before_number(self):
-        await self.bot.wait_until_ready()
-
     async def daily_reset(self):
         await Cultivation.all().update(msg_limit=0)
         await Users.all().update(money_cooldown=0, patreon_cooldown=F("patreon_cooldown") - 1)
@@ -77,23 +75,22 @@ class TimeFlow(BaseStarfallCog):
         PlayerRoster().reset_local_daily_values()
         _log("ALL", "Reset Message limit, daily command, and pvp command")
 
-        new_tax, old_tax = await check_for_tax()
-        await GuildOptionsDict.filter(name="old_tax_details").update(value=new_tax)
-        await GuildOptionsDict.filter(name="new_tax_details").update(value='{}')
-        _log("ALL", "Reset New tax and updated Old Tax")
-
         await self._increase_qi_chance()
 
-        all_users = await Users.all().values_list("pill_used", "user_id")
-        for user in all_users:
-            pill_used_list, user_id = user
-            pill_list_update = [pill_id for pill_id in pill_used_list if pill_id != 'recpill']
-            if len(pill_list_update) < len(pill_used_list):
-                await Users.filter(user_id=user_id).update(pill_used=pill_list_update)
+        async with ActivePills().bulk_write():
+            all_users = await Users.all().values_list("pill_used", "user_id")
+            for user in all_users:
+                pill_used_list, user_id = user
+                pill_list_update = [pill_id for pill_id in pill_used_list if pill_id != 'recpill']
+                if len(pill_list_update) < len(pill_used_list):
+                    await Users.filter(user_id=user_id).update(pill_used=pill_list_update)
 
         _log("ALL", "Upgraded pill list (recpill) and added pvp rewards")
 
-        await Users.filter(money__lt=1).update(money=1)
+        broke_user_ids: list[int] = await Users.filter(money__lt=1).values_list("user_id", flat=True)
+        if len(broke_user_ids) > 0:
+            await Users.filter(user_id__in=broke_user_ids, money__lt=1).update(money=1)
+            await Leaderboards().load_gold(broke_user_ids)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: disnake.Member, after: disnake.Member):
@@ -16,6 +16,7 @@ from utils.LoggingUtils import log_event
 from utils.ParamsUtils import ranking_str, mention, parse_int
 from utils.base import singleton, BaseStarfallEmbed, FunctionalValidationException, BaseStarfallPersistentView, UnsupportedOperationError, PlayerInputException, BaseStarfallUserSelect, BaseStarfallTransientView, BaseStarfallChannelSelect, \
     PrerequisiteNotMetException
+from utils.refresher import MessageRefresher
 from utils.loot import Loot, is_pseudo_item_id, create_fixed_loot, loot_values
 from world.continent import Continent
 from world.compendium import ItemCompendium
@@ -528,6 +529,11 @@ class GamingHouse:
             await inter.response.edit_message(embed=GamingTableSetupEmbed(table), view=self._setup_view)
 
     async def refresh_message(self, table: GamingTable) -> None:
+        # Coalesced per table, the table state is only rendered when the edit actually happens
+        channel_id: Optional[int] = table.publish_channel_id if table.published else table.setup_channel_id
+        MessageRefresher().request((_MODULE_ID, table.id), lambda: self._do_refresh_message(table), channel_id)
+
+    async def _do_refresh_message(self, table: GamingTable) -> None:
         message: disnake.Message = await table.message()
         if table.ended:
             await message.edit(embed=GamingTableMainEmbed(table))
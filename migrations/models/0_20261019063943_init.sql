@@ -0,0 +1,229 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "alchemy_recipes" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "recipe_name" VARCHAR(100) NOT NULL,
+    "ingredients" JSON NOT NULL,
+    "result" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for alchemy recipes */;
+CREATE TABLE IF NOT EXISTS "all_beasts" (
+    "beast_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "name" VARCHAR(100) NOT NULL,
+    "description" TEXT NOT NULL,
+    "type" VARCHAR(50) NOT NULL,
+    "stats" JSON NOT NULL,
+    "rarity" VARCHAR(50) NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for all available beasts */;
+CREATE TABLE IF NOT EXISTS "all_items" (
+    "item_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "name" VARCHAR(100) NOT NULL,
+    "description" TEXT NOT NULL,
+    "type" VARCHAR(50) NOT NULL,
+    "stats" JSON NOT NULL,
+    "rarity" VARCHAR(50) NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for all available items */;
+CREATE TABLE IF NOT EXISTS "all_pets" (
+    "pet_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "name" VARCHAR(100) NOT NULL,
+    "description" TEXT NOT NULL,
+    "type" VARCHAR(50) NOT NULL,
+    "stats" JSON NOT NULL,
+    "rarity" VARCHAR(50) NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for all available pets */;
+CREATE TABLE IF NOT EXISTS "all_rings" (
+    "ring_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "name" VARCHAR(100) NOT NULL,
+    "description" TEXT NOT NULL,
+    "stats" JSON NOT NULL,
+    "rarity" VARCHAR(50) NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for all available rings */;
+CREATE TABLE IF NOT EXISTS "auctions" (
+    "auction_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "seller_id" BIGINT NOT NULL,
+    "item" JSON NOT NULL,
+    "starting_price" INT NOT NULL,
+    "current_bid" INT,
+    "bidder_id" BIGINT,
+    "end_time" TIMESTAMP NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for auction listings */;
+CREATE TABLE IF NOT EXISTS "beast_battles" (
+    "battle_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "user_id" BIGINT NOT NULL,
+    "beast_id" CHAR(36) NOT NULL,
+    "status" VARCHAR(20) NOT NULL  DEFAULT 'active',
+    "turn" INT NOT NULL  DEFAULT 0,
+    "player_energy" INT NOT NULL  DEFAULT 100,
+    "player_dou_qi" INT NOT NULL  DEFAULT 100,
+    "beast_energy" INT NOT NULL  DEFAULT 100,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for PvE beast battles */;
+CREATE TABLE IF NOT EXISTS "characters" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(100) NOT NULL,
+    "level" INT NOT NULL  DEFAULT 1,
+    "experience" INT NOT NULL  DEFAULT 0,
+    "stats" JSON NOT NULL,
+    "skills" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for player characters */;
+CREATE TABLE IF NOT EXISTS "crafted_items" (
+    "item_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "crafter_id" BIGINT NOT NULL,
+    "recipe_id" INT NOT NULL,
+    "quality" INT NOT NULL,
+    "stats" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for crafted items */;
+CREATE TABLE IF NOT EXISTS "cultivation" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "stage" VARCHAR(50) NOT NULL,
+    "experience" INT NOT NULL  DEFAULT 0,
+    "max_energy" INT NOT NULL  DEFAULT 100,
+    "max_dou_qi" INT NOT NULL  DEFAULT 100,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for cultivation progress */;
+CREATE TABLE IF NOT EXISTS "factions" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "faction" VARCHAR(50) NOT NULL,
+    "rank" VARCHAR(50) NOT NULL,
+    "reputation" INT NOT NULL  DEFAULT 0,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for player factions */;
+CREATE TABLE IF NOT EXISTS "guild_options" (
+    "guild_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(100),
+    "pvp_enabled" INT NOT NULL  DEFAULT 1,
+    "economy_enabled" INT NOT NULL  DEFAULT 1,
+    "value" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for guild-specific settings */;
+CREATE TABLE IF NOT EXISTS "guild_options_dict" (
+    "guild_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "options" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for guild options dictionary */;
+CREATE TABLE IF NOT EXISTS "inventory" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "items" JSON NOT NULL,
+    "equipment" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for player inventory */;
+CREATE TABLE IF NOT EXISTS "market" (
+    "listing_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "seller_id" BIGINT NOT NULL,
+    "item" JSON NOT NULL,
+    "price" INT NOT NULL,
+    "quantity" INT NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for marketplace listings */;
+CREATE TABLE IF NOT EXISTS "pets" (
+    "pet_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "user_id" BIGINT NOT NULL,
+    "name" VARCHAR(50) NOT NULL,
+    "type" VARCHAR(50) NOT NULL,
+    "level" INT NOT NULL  DEFAULT 1,
+    "experience" INT NOT NULL  DEFAULT 0,
+    "stats" JSON NOT NULL,
+    "skills" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for player pets */;
+CREATE TABLE IF NOT EXISTS "pvp_matches" (
+    "match_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "challenger_id" BIGINT NOT NULL,
+    "defender_id" BIGINT NOT NULL,
+    "status" VARCHAR(20) NOT NULL  DEFAULT 'pending',
+    "turn" INT NOT NULL  DEFAULT 0,
+    "challenger_energy" INT NOT NULL  DEFAULT 100,
+    "challenger_dou_qi" INT NOT NULL  DEFAULT 100,
+    "defender_energy" INT NOT NULL  DEFAULT 100,
+    "defender_dou_qi" INT NOT NULL  DEFAULT 100,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for active PvP matches */;
+CREATE TABLE IF NOT EXISTS "pvp_stats" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "wins" INT NOT NULL  DEFAULT 0,
+    "losses" INT NOT NULL  DEFAULT 0,
+    "draws" INT NOT NULL  DEFAULT 0,
+    "last_match" TIMESTAMP,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for PvP statistics */;
+CREATE TABLE IF NOT EXISTS "quests" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "active_quests" JSON NOT NULL,
+    "completed_quests" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for player quests */;
+CREATE TABLE IF NOT EXISTS "ring_inventory" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "rings" JSON NOT NULL,
+    "equipped_rings" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for ring inventory */;
+CREATE TABLE IF NOT EXISTS "ruins_explorations" (
+    "exploration_id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "user_id" BIGINT NOT NULL,
+    "ruin_id" CHAR(36) NOT NULL,
+    "status" VARCHAR(20) NOT NULL  DEFAULT 'exploring',
+    "progress" INT NOT NULL  DEFAULT 0,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for ruins exploration */;
+CREATE TABLE IF NOT EXISTS "techniques" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "techniques" JSON NOT NULL,
+    "equipped" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for player techniques */;
+CREATE TABLE IF NOT EXISTS "temp_data" (
+    "id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "user_id" BIGINT NOT NULL,
+    "data" JSON NOT NULL,
+    "expires_at" TIMESTAMP NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for temporary data storage */;
+CREATE TABLE IF NOT EXISTS "users" (
+    "user_id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "energy" INT NOT NULL  DEFAULT 100,
+    "dou_qi" INT NOT NULL  DEFAULT 100,
+    "max_energy" INT NOT NULL  DEFAULT 100,
+    "max_dou_qi" INT NOT NULL  DEFAULT 100,
+    "money" INT NOT NULL  DEFAULT 0,
+    "star" INT NOT NULL  DEFAULT 0,
+    "money_cooldown" INT NOT NULL  DEFAULT 0,
+    "status_effects" JSON NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* Database model for user accounts */;
+CREATE TABLE IF NOT EXISTS "aerich" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSON NOT NULL
+);
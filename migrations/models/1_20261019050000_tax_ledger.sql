@@ -0,0 +1,12 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "tax_ledger" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "user_id" BIGINT NOT NULL,
+    "period" DATE NOT NULL,
+    "amount" BIGINT NOT NULL  DEFAULT 0,
+    CONSTRAINT "uid_tax_ledger_user_id_ab82c4" UNIQUE ("user_id", "period")
+);
+CREATE INDEX IF NOT EXISTS "idx_tax_ledger_period_5b8d3e" ON "tax_ledger" ("period");
+-- The new_tax_details and old_tax_details blobs are moved in on startup by import_legacy_tax_details
+-- downgrade --
+DROP TABLE IF EXISTS "tax_ledger";
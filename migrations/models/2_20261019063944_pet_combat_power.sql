@@ -0,0 +1,5 @@
+-- upgrade --
+ALTER TABLE "pets" ADD "combat_power" BIGINT NOT NULL  DEFAULT 0;
+-- The values depend on the beast definitions, they are filled in on startup by Bestiary.recompute_pet_combat_power
+-- downgrade --
+ALTER TABLE "pets" DROP COLUMN "combat_power";
@@ -0,0 +1,8 @@
+-- upgrade --
+ALTER TABLE "beast_battles" ADD "finished" INT NOT NULL  DEFAULT 0;
+CREATE INDEX IF NOT EXISTS "idx_beast_battl_finishe_6f2c1d" ON "beast_battles" ("finished");
+-- Anything no longer active is over, battles finished without their status persisted are flagged by BattleManager.load
+UPDATE "beast_battles" SET "finished" = 1 WHERE "status" != 'active';
+-- downgrade --
+DROP INDEX IF EXISTS "idx_beast_battl_finishe_6f2c1d";
+ALTER TABLE "beast_battles" DROP COLUMN "finished";
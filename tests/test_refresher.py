@@ -0,0 +1,103 @@
+import asyncio
+from datetime import timedelta
+from typing import Any
+
+from utils.refresher import MessageRefresher
+
+_DEBOUNCE: timedelta = timedelta(milliseconds=20)
+_SPACING: timedelta = timedelta(milliseconds=50)
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id: int = channel_id
+
+
+class FakeMessage:
+    # Stands in for a disnake.Message, only records the edits it receives
+    def __init__(self, msg_id: int, channel: FakeChannel, fail: bool = False):
+        self.id: int = msg_id
+        self.channel: FakeChannel = channel
+        self.fail: bool = fail
+        self.edits: list[tuple[float, dict[str, Any]]] = []
+
+    async def edit(self, **kwargs):
+        if self.fail:
+            raise RuntimeError("Unknown Message")
+
+        self.edits.append((asyncio.get_running_loop().time(), kwargs))
+
+
+def _refresher() -> MessageRefresher:
+    refresher: MessageRefresher = MessageRefresher()
+    refresher.configure(debounce=_DEBOUNCE, channel_spacing=_SPACING)
+    refresher.start()
+    return refresher
+
+
+def _request(refresher: MessageRefresher, msg: FakeMessage, content: str) -> bool:
+    async def _refresh():
+        await msg.edit(content=content)
+
+    return refresher.request(msg.id, _refresh, msg.channel.id)
+
+
+def test_burst_is_merged_into_the_latest_state():
+    async def scenario():
+        refresher: MessageRefresher = _refresher()
+        msg: FakeMessage = FakeMessage(1, FakeChannel(10))
+        scheduled: list[bool] = [_request(refresher, msg, f"health {health}") for health in (300, 200, 100)]
+        await refresher.drain()
+        return scheduled, msg
+
+    scheduled, msg = asyncio.run(scenario())
+    assert scheduled == [True, False, False]
+    assert [kwargs for _, kwargs in msg.edits] == [{"content": "health 100"}]
+
+
+def test_edits_in_a_channel_are_spaced():
+    async def scenario():
+        refresher: MessageRefresher = _refresher()
+        channel: FakeChannel = FakeChannel(20)
+        messages: list[FakeMessage] = [FakeMessage(msg_id, channel) for msg_id in (21, 22, 23)]
+        for msg in messages:
+            _request(refresher, msg, "refreshed")
+
+        await refresher.drain()
+        return messages
+
+    messages = asyncio.run(scenario())
+    times: list[float] = sorted(edit_time for msg in messages for edit_time, _ in msg.edits)
+    assert len(times) == 3
+    assert all(later - earlier >= _SPACING.total_seconds() * 0.9 for earlier, later in zip(times, times[1:]))
+
+
+def test_failed_edit_is_counted_and_not_raised():
+    async def scenario():
+        refresher: MessageRefresher = _refresher()
+        failures: int = refresher.stats.failure_count
+        _request(refresher, FakeMessage(31, FakeChannel(30), fail=True), "refreshed")
+        await refresher.drain()
+        return refresher.stats.failure_count - failures, refresher.stats.last_error
+
+    new_failures, last_error = asyncio.run(scenario())
+    assert new_failures == 1
+    assert "Unknown Message" in last_error
+
+
+def test_shutdown_sends_pending_edits_then_drops_new_requests():
+    async def scenario():
+        refresher: MessageRefresher = _refresher()
+        msg: FakeMessage = FakeMessage(41, FakeChannel(40))
+        _request(refresher, msg, "before shutdown")
+        await refresher.shutdown()
+        accepted: bool = _request(refresher, msg, "after shutdown")
+        await asyncio.sleep(_DEBOUNCE.total_seconds() * 2)
+        pending: int = refresher.pending_count
+        refresher.start()
+        return accepted, pending, msg
+
+    accepted, pending, msg = asyncio.run(scenario())
+    assert not accepted
+    assert pending == 0
+    assert [kwargs for _, kwargs in msg.edits] == [{"content": "before shutdown"}]
@@ -5,10 +5,12 @@ from time import time
 import disnake
 from tortoise.expressions import F
 
-from utils.Database import GuildOptions, Inventory, Market, RingInventory, Temp, Crafted, Users
+from utils.Database import Inventory, Market, RingInventory, Temp, Crafted, Users
 from utils.InventoryUtils import ITEM_TYPE_ORIGIN_QI, add_to_inventory, check_item_everywhere, convert_id
 from utils.LoggingUtils import log_event
 from utils.ParamsUtils import PATREON_ROLES
+from world.continent import Continent
+from world.market_book import MarketBook
 
 MAX_CHOICE_ITEMS = 25
 
@@ -65,12 +67,8 @@ async def destroy_crafted_item(item_id: str) -> bool:
 
 
 async def drop_origin_qi(guild: disnake.Guild, user_id):
-    qi_counter = await GuildOptions.get_or_none(name="qi_counter").values_list("value", flat=True)
-    if qi_counter is None:
-        await GuildOptions.create(name="qi_counter", value=1)
-        qi_counter = 1
-
-    qi_counter = int(qi_counter)
+    # The counter is held in memory by the Continent and checkpointed periodically
+    qi_counter: int = Continent().origin_qi_counter
 
     qi_chance = ORIGIN_QI_BASE_CHANCE_DENOMINATOR
     qi_chance -= qi_counter * ORIGIN_QI_COUNTER_DENOMINATOR_VALUE
@@ -91,7 +89,7 @@ async def drop_origin_qi(guild: disnake.Guild, user_id):
                 await user.send("Congratulations! You found Origin Qi")
             log_event(user_id, ITEM_TYPE_ORIGIN_QI, f"Gave origin qi for 3 days (chance = 1/{qi_chance}, days = {qi_counter})")
 
-        await GuildOptions.filter(name="qi_counter").update(value=0)
+        await Continent().reset_origin_qi_counter()
 
 
 async def add_temp_item(user_id, item_id, duration: timedelta):
@@ -188,6 +186,7 @@ async def check_for_temp(bot):
                     await Inventory.filter(item_id=item_id).delete()
                     await RingInventory.filter(item_id=item_id).delete()
                     await Market.filter(item_id=item_id).delete()
+                    MarketBook().remove_item(item_id)
                     log_event(user_id, "temp", f"Removed {item_id} from everywhere")
 
             await Temp.filter(user_id=user_id, role_id=role_id, item_id=item_id, event_cp=event_cp, event_exp=event_exp, cp=cp, exp=exp, till=till).delete()
@@ -28,7 +28,7 @@ class RuinsDao(Model):
         """Get all active explorations for a user"""
         return await cls.filter(user_id=user_id, status='exploring')
 
-__all__ = ['Alchemy', 'Cultivation', 'PvpStatsDao', 'Users', 'Pvp', 'RingInventory', 'Pet', 'Temp', 'Factions', 'Inventory', 'Techniques', 'Quests', 'AllRings', 'AllItems', 'Market', 'GuildOptions', 'Crafted', 'GuildOptionsDict', 'AllBeasts', 'AllPets', 'Character', 'AuctionDao', 'BeastBattleDao', 'ID_UNCREATED', 'RuinsDao']
+__all__ = ['Alchemy', 'Cultivation', 'PvpStatsDao', 'Users', 'Pvp', 'RingInventory', 'Pet', 'Temp', 'Factions', 'Inventory', 'Techniques', 'Quests', 'AllRings', 'AllItems', 'Market', 'GuildOptions', 'Crafted', 'GuildOptionsDict', 'AllBeasts', 'AllPets', 'Character', 'AuctionDao', 'AuctionBidLedgerDao', 'BeastBattleDao', 'BeastBattleArchiveDao', 'BeastBattleAttackDao', 'RaidAttackLog', 'TaxLedger', 'ID_UNCREATED', 'RuinsDao']
 
 # Move Character model to top of file
 class Character(Model):
@@ -232,6 +232,7 @@ class Pet(Model):
     experience = fields.IntField(default=0)
     stats = fields.JSONField(default={})
     skills = fields.JSONField(default=[])
+    combat_power = fields.BigIntField(default=0)  # Persisted CP, kept current on every growth, stage or inherited CP change
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
@@ -333,6 +334,24 @@ class AuctionDao(Model):
         """Get all active auctions"""
         return await cls.filter(end_time__gt=datetime.now(timezone.utc))
 
+class AuctionBidLedgerDao(Model):
+    """Append-only ledger of every bid received by the auction house along with the winning bid it resulted in, one row per bid"""
+    id = fields.BigIntField(pk=True)
+    auction_id = fields.BigIntField(index=True)
+    bidder_id = fields.BigIntField()
+    amount = fields.BigIntField()
+    maximum_amount = fields.BigIntField()
+    outcome = fields.CharField(max_length=20)
+    winner_id = fields.BigIntField(null=True)
+    winning_amount = fields.BigIntField(null=True)
+    winning_maximum_amount = fields.BigIntField(null=True)
+    winning_reserved_amount = fields.BigIntField(null=True)
+    winning_tax_rate = fields.IntField(null=True)
+    created_at = fields.DatetimeField()
+
+    class Meta:
+        table = "auction_bid_ledger"
+
 class BeastBattleDao(Model):
     """Database model for PvE beast battles"""
     battle_id = fields.UUIDField(pk=True)
@@ -343,6 +362,7 @@ class BeastBattleDao(Model):
     player_energy = fields.IntField(default=100)
     player_dou_qi = fields.IntField(default=100)
     beast_energy = fields.IntField(default=100)
+    finished = fields.BooleanField(default=False, index=True)
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
@@ -359,6 +379,44 @@ class BeastBattleDao(Model):
         """Get all active battles for a user"""
         return await cls.filter(user_id=user_id, status='active')
 
+class BeastBattleArchiveDao(Model):
+    """Archived PvE beast battles, the header and attack log are stored as zlib compressed JSON"""
+    id = fields.BigIntField(pk=True)
+    data = fields.BinaryField()
+    created_at = fields.DatetimeField()
+    updated_at = fields.DatetimeField()
+    archived_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "beast_battle_archives"
+
+class BeastBattleAttackDao(Model):
+    """Append-only log of the attacks made during PvE beast battles, one row per attack"""
+    id = fields.BigIntField(pk=True)
+    battle_id = fields.BigIntField(index=True)
+    round_number = fields.IntField()
+    round_player_id = fields.BigIntField()
+    player_id = fields.BigIntField()
+    damage_dealt = fields.BigIntField()
+    source = fields.CharField(max_length=20)
+    initiative = fields.IntField()
+    created_at = fields.DatetimeField()
+
+    class Meta:
+        table = "beast_battle_attacks"
+
+class RaidAttackLog(Model):
+    """Append-only log of the attacks made on raid beasts"""
+    id = fields.BigIntField(pk=True)
+    msg_id = fields.BigIntField(index=True)
+    user_id = fields.BigIntField()
+    attack_index = fields.SmallIntField()
+    damage = fields.BigIntField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "raid_attack_log"
+
 class RuinsDao(Model):
     """Database model for ruins exploration"""
     exploration_id = fields.UUIDField(pk=True)
@@ -382,6 +440,17 @@ class RuinsDao(Model):
         """Get all active explorations for a user"""
         return await cls.filter(user_id=user_id, status='exploring')
 
+class TaxLedger(Model):
+    """Market and auction tax paid by each player, one row per user per tax period"""
+    id = fields.BigIntField(pk=True)
+    user_id = fields.BigIntField()
+    period = fields.DateField(index=True)
+    amount = fields.BigIntField(default=0)
+
+    class Meta:
+        table = "tax_ledger"
+        unique_together = (("user_id", "period"),)
+
 class PvpStatsDao(Model):
     """Database model for PvP statistics"""
     user_id = fields.BigIntField(pk=True)
@@ -427,13 +496,21 @@ class PvpStatsDao(Model):
         self.last_match = fields.now()
         await self.save()
 
+# Shared with aerich through pyproject.toml, schema changes are shipped as migrations in ./migrations/models
+DB_CONFIG = {
+    "connections": {"default": "sqlite://db.sqlite3"},
+    "apps": {
+        "models": {
+            "models": ["utils.Database", "aerich.models"],
+            "default_connection": "default",
+        },
+    },
+}
+
 async def init_database():
     """Initialize database connection"""
     from tortoise import Tortoise
-    await Tortoise.init(
-        db_url='sqlite://db.sqlite3',
-        modules={'models': ['utils.Database']}
-    )
+    await Tortoise.init(config=DB_CONFIG)
     await Tortoise.generate_schemas()
 
 __all__.append('init_database')
@@ -2,7 +2,8 @@
 # DatabaseUtils.py
 # =====================================
 # Contains helper functions for getting info from the database
-from utils.Database import Crafted, Users, AllItems, Cultivation, Alchemy
+from character.active_pills import ActivePills
+from utils.Database import Crafted, Users, Cultivation, Alchemy
 from utils.LoggingUtils import log_event
 
 MARKET_TIERS: dict[int, dict[str, int]] = {
@@ -60,64 +61,8 @@ async def compute_cauldron_bonus(user_id):
 
 
 async def compute_pill_bonus(user_id: int, battle: int = 0, refine_pill: bool = False, flame_remove: bool = False, beast_l_remove: bool = False):
-    all_pills = await AllItems.filter(type="pill").values_list("id", "name", "properties")
-
-    user_data = await Cultivation.get_or_none(user_id=user_id).values_list("user__pill_used", "user__bonuses", "user__battle_boost", "major", "minor")
-    pill_used_list, bonuses, battle_boost, major, minor = user_data
-    if battle_boost is None:
-        battle_boost = [0, 0]
-    pill_refine, flame_swallow, b_boost, beast_l = 0, 0, battle_boost[0], None
-
-    for pill in all_pills:
-        pill_id, pill_name, properties = pill
-
-        if pill_id in pill_used_list:
-
-            pill_effects = properties["effects"]
-            refine_effect = pill_effects.get("PILL_REFINE")
-            flame_effect = pill_effects.get("FLAME_SWALLOW")
-            beast_lure_eff = pill_effects.get("BEAST_LURE")
-
-            consumed = False
-
-            if refine_effect:
-                pill_refine += refine_effect
-                if refine_pill is True:
-                    pill_used_list.remove(pill_id)
-                    consumed = True
-
-            if flame_effect:
-                if "icypill" in pill_used_list and "pathpill" in pill_used_list:
-                    flame_swallow += 25
-                    if flame_remove is True:
-                        pill_used_list.remove("icypill")
-                        pill_used_list.remove("pathpill")
-                else:
-                    flame_swallow += flame_effect
-
-                    if pill_id != "bloodlotuspill":
-                        if flame_remove is True:
-                            pill_used_list.remove(pill_id)
-                consumed = True
-
-            if beast_lure_eff:
-                if beast_l is None:
-                    beast_l = beast_lure_eff
-                    if beast_l_remove is True:
-                        pill_used_list.remove(pill_id)
-                    consumed = True
-
-            if consumed is True:
-                await Users.filter(user_id=user_id).update(pill_used=pill_used_list)
-
-    if battle > 0:
-        battle_boost[1] -= battle
-        if battle_boost[1] <= 0:
-            battle_boost = [0, 0]
-
-        await Users.filter(user_id=user_id).update(battle_boost=battle_boost)
-
-    return pill_refine, flame_swallow, b_boost, beast_l
+    # Served from memory, the used pills and battle boost are written back by the periodic ActivePills flush
+    return await ActivePills().compute_bonus(user_id, battle, refine_pill, flame_remove, beast_l_remove)
 
 
 async def compute_market_userinfo(user_id):
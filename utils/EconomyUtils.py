@@ -1,12 +1,19 @@
 import math
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
 
 import disnake
 from disnake.interactions import MessageInteraction
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F
+from tortoise.functions import Sum
+from tortoise.transactions import in_transaction
 
-from utils.Database import AllItems, GuildOptionsDict
+from utils.Database import GuildOptionsDict, TaxLedger
+from utils.LoggingUtils import log_event
 from utils.ParamsUtils import TECH_TIER_NAMES, format_num_simple, CURRENCY_NAME_GOLD, CURRENCY_NAME_ARENA_COIN, CURRENCY_NAME_STAR, CURRENCY_NAME_EVENT
 from utils.Styles import RIGHT, LEFT, ITEM_EMOJIS
+from utils.base import singleton
 
 # =====================================
 # EconomyUtils specific params
@@ -28,6 +35,9 @@ CURRENCY_COLUMN_ARENA_COIN = "pvp_coins"
 CURRENCY_COLUMN_GOLD = "money"
 CURRENCY_COLUMN_STAR = "star"
 
+TAX_PERIOD_OFFSET: timedelta = timedelta(hours=5)  # Same as the daily reset time, 05:00 UTC
+_LEGACY_TAX_DETAILS: tuple[tuple[str, int], ...] = (("new_tax_details", 0), ("old_tax_details", 1))  # Blob name and how many periods ago it was paid
+
 DEFAULT_CURRENCY_TYPES = ["Gold Shop", "Pvp Shop (ac)", "FSP Star Echelon", "Clear Filter"]
 
 CURRENCY_TYPE_DICT = {
@@ -70,78 +80,111 @@ class ConfirmCurrency(disnake.ui.View):
         return inter.author.id == self.author_id
 
 
-async def prepare_embeds(max_items, currency_type: str = None, shop_type: str = None):
+SHOP_PAGE_SIZE: int = 6
 
-    all_items_types = await AllItems.all().order_by("type", "tier").values_list("type", "id", "name", "buy_cost_d", "description", "e_description", "tier")
-    if shop_type:
-        all_items = await AllItems.filter(type=shop_type).order_by("type", "tier").values_list("type", "id", "name", "buy_cost_d", "description", "e_description", "tier")
-    else:
-        all_items = all_items_types
+ShopItemRow = tuple[str, str, str, dict[str, int], str, str, int]  # type, id, name, buy prices, description, effect description, tier
 
-    embeds = []
-    # menu_item_list = [item[0] for item in all_items_types for key, value in item[3].items() if int(value) > 0 if currency_type is not None]
-    menu_item_dict = {}
-    for item in all_items_types:
-        item_type, item_id, item_name, item_cost_dict, item_desc, item_effect_desc, item_tier = item
 
-        if EVENT_SHOP.is_active and currency_type == 'ec' and item_id not in EVENT_SHOP._items:
-            continue
-        
-        for key, value in item_cost_dict.items():
-            if int(value) > 0:
-                if currency_type is not None:
-                    if key == currency_type:
-                        if item_type not in menu_item_dict.keys():
-                            menu_item_dict[item_type] = 0
-
-                        menu_item_dict[item_type] += 1
-                        # print(item_name, item_type, "ADDED CURRENCY")
-                else:
-                    if item_type not in menu_item_dict.keys():
-                        menu_item_dict[item_type] = 0
-
-                    menu_item_dict[item_type] += 1
-                    # print(item_name, item_type, "ADDED ONCE")
-                    break
-    
-    # Split items across multiple pages
+@singleton
+class ShopCatalog:
+    """
+    Shop pages rendered from the ItemCompendium definitions, one page list per currency and shop category. The compendium rebuilds the catalog
+    whenever it's loaded again and the event shop pages are rebuilt whenever the event shop changes, so opening the shop never touches the database.
+    """
 
-    items_list = all_items
-    page_item_count = 0
-    item_count = 0
+    def __init__(self):
+        self._items: list[ShopItemRow] = []
+        self._pages: dict[tuple[Optional[str], Optional[str]], list[disnake.Embed]] = {}
+        self._shop_counts: dict[Optional[str], dict[str, int]] = {}
+        self._event_shop_active: bool = False
+
+    # ============================================= Special methods =============================================
+
+    def __repr__(self) -> str:
+        return f"ShopCatalog {{items: {len(self._items)}, page lists: {len(self._pages)}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ============================================== "Real" methods =============================================
+
+    def pages(self, currency_type: Optional[str] = None, shop_type: Optional[str] = None) -> tuple[list[disnake.Embed], dict[str, int]]:
+        """
+        Retrieve the shop pages along with the number of items of each shop category, both for the specified currency.
+
+        :param currency_type: the currency the items must be buyable with, None for any currency
+        :param shop_type:     the item type to restrict the pages to, None for every type
+
+        :return: the pages and the item count of each shop category
+        """
+        if currency_type == CURRENCY_NAME_EVENT and EVENT_SHOP.is_active != self._event_shop_active:
+            # The event shop ended on its own since the last rebuild
+            self.rebuild_event_shop()
+
+        key: tuple[Optional[str], Optional[str]] = (currency_type, shop_type)
+        pages: Optional[list[disnake.Embed]] = self._pages.get(key)
+        if pages is None:
+            pages = self._render_pages(currency_type, shop_type)
+            self._pages[key] = pages
+
+        shop_counts: Optional[dict[str, int]] = self._shop_counts.get(currency_type)
+        if shop_counts is None:
+            shop_counts = self._count_shop_items(currency_type)
+            self._shop_counts[currency_type] = shop_counts
+
+        return list(pages), shop_counts.copy()
+
+    def rebuild(self, definitions: Iterable):
+        # Same order as the AllItems query the shop used to run, the sort being stable items keep their file order within a tier
+        self._items = [(definition.type, definition.id, definition.name, definition.shop_buy_prices, definition.description, definition.effect_description, definition.tier)
+                       for definition in sorted(definitions, key=lambda definition: (definition.type, definition.tier))]
+        self._pages = {}
+        self._shop_counts = {}
+        self._event_shop_active = EVENT_SHOP.is_active
+        for currency_type in CURRENCY_TYPE_DICT.values():
+            self._render_currency(currency_type)
+
+    def rebuild_event_shop(self):
+        self._event_shop_active = EVENT_SHOP.is_active
+        self._pages = {key: pages for key, pages in self._pages.items() if key[0] != CURRENCY_NAME_EVENT}
+        self._shop_counts.pop(CURRENCY_NAME_EVENT, None)
+        self._render_currency(CURRENCY_NAME_EVENT)
+
+    def _count_shop_items(self, currency_type: Optional[str]) -> dict[str, int]:
+        shop_counts: dict[str, int] = {}
+        for item_type, item_id, _, item_cost_dict, _, _, _ in self._items:
+            if self._hidden_by_event(currency_type, item_id):
+                continue
 
-    for i in range(math.ceil(len(items_list) / max_items)):
-        embed = disnake.Embed(
-            color=disnake.Color(0x2e3135)
-        )
+            if any(int(value) > 0 and (currency_type is None or key == currency_type) for key, value in item_cost_dict.items()):
+                shop_counts[item_type] = shop_counts.get(item_type, 0) + 1
 
-        if shop_type:
-            embed.title = shop_type.capitalize() + " Shop"
-        elif currency_type == 'ec':
-            embed.title = EVENT_SHOP._name
-        else:
-            embed.title = "All Items"
+        return shop_counts
+
+    @staticmethod
+    def _hidden_by_event(currency_type: Optional[str], item_id: str) -> bool:
+        return EVENT_SHOP.is_active and currency_type == CURRENCY_NAME_EVENT and item_id not in EVENT_SHOP._items
 
+    def _render_currency(self, currency_type: Optional[str]):
+        self._shop_counts[currency_type] = self._count_shop_items(currency_type)
+        for shop_type in [None, *self._shop_counts[currency_type].keys()]:
+            self._pages[(currency_type, shop_type)] = self._render_pages(currency_type, shop_type)
+
+    def _render_pages(self, currency_type: Optional[str], shop_type: Optional[str]) -> list[disnake.Embed]:
         if currency_type is not None:
-            embed.description = f"Showing only **{currency_type.capitalize()}** currency items"
+            description: str = f"Showing only **{currency_type.capitalize()}** currency items"
         else:
-            embed.description = "Showing all currency items"
-
-        for item in items_list[item_count:]:  # Each item on a page
-            item_count += 1
-            item_type, item_id, item_name, item_cost_dict, item_desc, item_effect_desc, item_tier = item
+            description: str = "Showing all currency items"
 
-            if EVENT_SHOP.is_active and currency_type == 'ec' and item_id not in EVENT_SHOP._items:
+        entries: list[str] = []
+        for item_type, item_id, item_name, item_cost_dict, item_desc, item_effect_desc, item_tier in self._items:
+            if (shop_type is not None and item_type != shop_type) or self._hidden_by_event(currency_type, item_id):
                 continue
 
             item_cost_str = ""
             for key, value in item_cost_dict.items():
-                if int(value) > 0:
-                    if currency_type is not None:
-                        if key == currency_type:
-                            item_cost_str += f"{str(key).capitalize()}: `{format_num_simple(int(value))}` | "
-                    else:
-                        item_cost_str += f"{str(key).capitalize()}: `{format_num_simple(int(value))}` | "
+                if int(value) > 0 and (currency_type is None or key == currency_type):
+                    item_cost_str += f"{str(key).capitalize()}: `{format_num_simple(int(value))}` | "
 
             if len(item_cost_str) == 0:
                 continue
@@ -150,35 +193,34 @@ async def prepare_embeds(max_items, currency_type: str = None, shop_type: str =
             if item_type in ["fight_technique", "qi_method"]:
                 final_str = f"{ITEM_EMOJIS.get(item_id, ' ')} **{item_name} (`{item_id}`)**\n> **Tier : `{TECH_TIER_NAMES[item_tier - 1]}`**\n**Cost :**{item_cost_str[:-2]} \n> **Description :** \n> {item_desc}\n> **Effect :** \n> {item_effect_desc}"
 
-            embed.add_field(name="\u200b", value=final_str)
+            entries.append(final_str)
 
-            page_item_count += 1
-            if page_item_count % max_items == 0:
-                break
-        if embed.fields is not None and len(embed.fields) > 0:
-            embeds.append(embed)
-
-    for i, embed in enumerate(embeds):
-        embed.set_footer(text=f"Page {i + 1} of {len(embeds)}")
+        if len(entries) == 0:
+            embed = disnake.Embed(color=disnake.Color(0x2e3135), description=description + "\n\nNo item of such type available")
+            if shop_type:
+                embed.title = shop_type.capitalize()
 
-    if len(embeds) < 1:
-        embed = disnake.Embed(
-            color=disnake.Color(0x2e3135)
-        )
+            return [embed]
 
         if shop_type:
-            embed.title = shop_type.capitalize()
-
-        if currency_type is not None:
-            embed.description = f"Showing only **{currency_type.capitalize()}** currency items"
+            title: str = shop_type.capitalize() + " Shop"
+        elif currency_type == CURRENCY_NAME_EVENT:
+            title: str = EVENT_SHOP._name
         else:
-            embed.description = "Showing all currency items"\
+            title: str = "All Items"
 
-        embed.description += "\n\nNo item of such type available"
+        # Split items across multiple pages
+        embeds: list[disnake.Embed] = []
+        page_count: int = math.ceil(len(entries) / SHOP_PAGE_SIZE)
+        for i in range(page_count):
+            embed = disnake.Embed(color=disnake.Color(0x2e3135), title=title, description=description)
+            for final_str in entries[i * SHOP_PAGE_SIZE:(i + 1) * SHOP_PAGE_SIZE]:
+                embed.add_field(name="\u200b", value=final_str)
 
-        embeds.append(embed)
+            embed.set_footer(text=f"Page {i + 1} of {page_count}")
+            embeds.append(embed)
 
-    return embeds, menu_item_dict
+        return embeds
 
 
 class ShopDropdown(disnake.ui.Select):
@@ -196,7 +238,7 @@ class ShopDropdown(disnake.ui.Select):
         )
 
     async def callback(self, inter):
-        self.view.embeds, self.view.shop_type_dict = await prepare_embeds(6, currency_type=self.view.currency_type, shop_type=inter.values[0])
+        self.view.embeds, self.view.shop_type_dict = ShopCatalog().pages(currency_type=self.view.currency_type, shop_type=inter.values[0])
         self.view.embed_count = 0
 
         self.view.prev_page.disabled = True
@@ -233,7 +275,7 @@ class CurrencyDropdown(disnake.ui.Select):
 
     async def callback(self, inter):
         self.view.currency_type = CURRENCY_TYPE_DICT[inter.values[0]]
-        self.view.embeds, self.view.shop_type_dict = await prepare_embeds(6, currency_type=self.view.currency_type)
+        self.view.embeds, self.view.shop_type_dict = ShopCatalog().pages(currency_type=self.view.currency_type)
         self.view.embed_count = 0
 
         self.view.prev_page.disabled = True
@@ -289,7 +331,7 @@ class ShopMenu(disnake.ui.View):
 
 
 async def shop_view(author):
-    embeds, shop_menu_dict = await prepare_embeds(6)
+    embeds, shop_menu_dict = ShopCatalog().pages()
     view = ShopMenu(author, embeds, shop_menu_dict)
     return embeds[0], view
 
@@ -304,42 +346,29 @@ def currency_dict_to_str(currency_dict):
     return item_cost_str
 
 
-async def check_for_tax():
-    new_tax_details = await GuildOptionsDict.get_or_none(name="new_tax_details").values_list("value", flat=True)
-    if new_tax_details is None:
-        await GuildOptionsDict.create(name="new_tax_details", value='{}')
-        new_tax_details = {}
-    else:
-        new_tax_details = new_tax_details
-
-    old_tax_details = await GuildOptionsDict.get_or_none(name="old_tax_details").values_list("value", flat=True)
-    if old_tax_details is None:
-        await GuildOptionsDict.create(name="old_tax_details", value='{}')
-        old_tax_details = {}
-    else:
-        old_tax_details = old_tax_details
-
-    return new_tax_details, old_tax_details
+def tax_period(now: Optional[datetime] = None) -> date:
+    # Tax periods follow the daily reset, the period of a naive UTC date-time is the day its last reset happened
+    return ((now or datetime.utcnow()) - TAX_PERIOD_OFFSET).date()
 
 
 async def add_tax_amount(user_id: int, amount: int):
-    new_tax_details, _ = await check_for_tax()
-    if str(user_id) not in new_tax_details.keys():
-        new_tax_details[str(user_id)] = 0
+    # Atomic increment of the player row for the current period, the row is only created by the first tax of the period
+    period: date = tax_period()
+    if await TaxLedger.filter(user_id=user_id, period=period).update(amount=F("amount") + amount) > 0:
+        return
 
-    new_tax_details[str(user_id)] += amount
-
-    await GuildOptionsDict.filter(name="new_tax_details").update(value=new_tax_details)
+    try:
+        await TaxLedger.create(user_id=user_id, period=period, amount=amount)
+    except IntegrityError:
+        # Another sale created the row in the meantime
+        await TaxLedger.filter(user_id=user_id, period=period).update(amount=F("amount") + amount)
 
 
 async def get_tax_details(user_id: int):
-    _, old_tax_details = await check_for_tax()
-    total_tax = sum(list(old_tax_details.values()))
-
-    if str(user_id) not in old_tax_details.keys():
-        old_tax_details[str(user_id)] = 0
-
-    user_amount = old_tax_details[str(user_id)]
+    # Shares are computed on the previous period, the current one is still being paid
+    period: date = tax_period() - timedelta(days=1)
+    total_tax = await TaxLedger.filter(period=period).annotate(total=Sum("amount")).first().values_list("total", flat=True) or 0
+    user_amount = await TaxLedger.get_or_none(user_id=user_id, period=period).values_list("amount", flat=True) or 0
 
     user_tax_percent = 0
     if total_tax > 0:
@@ -348,6 +377,26 @@ async def get_tax_details(user_id: int):
     return user_tax_percent, user_amount, total_tax
 
 
+async def import_legacy_tax_details():
+    # Moves the tax blobs used before the ledger existed into it, only does something on the first start after the upgrade
+    for name, periods_ago in _LEGACY_TAX_DETAILS:
+        tax_details = await GuildOptionsDict.get_or_none(name=name).values_list("value", flat=True)
+        if tax_details is None:
+            continue
+
+        period: date = tax_period() - timedelta(days=periods_ago)
+        # The blobs were created as '{}' strings and only became dicts with the first tax paid
+        rows: list[TaxLedger] = [TaxLedger(user_id=int(user_id), period=period, amount=int(amount)) for user_id, amount in tax_details.items() if int(amount) > 0] if isinstance(tax_details, dict) else []
+        async with in_transaction():
+            await TaxLedger.filter(period=period, user_id__in=[row.user_id for row in rows]).delete()
+            if len(rows) > 0:
+                await TaxLedger.bulk_create(rows)
+
+            await GuildOptionsDict.filter(name=name).delete()
+
+        log_event("system", "tax", f"Imported {len(rows):,} rows of {name} into the tax ledger")
+
+
 class EventShopConfig:
     def __init__(self):
         self._enabled = False
@@ -367,14 +416,17 @@ class EventShopConfig:
     def enable(self, duration_hours: int = 168):  # Default 1 week
         self._enabled = True
         self._end_time = datetime.now() + timedelta(hours=duration_hours)
+        ShopCatalog().rebuild_event_shop()
     
     def disable(self):
         self._enabled = False
         self._end_time = None
-    
+        ShopCatalog().rebuild_event_shop()
+
     def set_name_and_items(self, name: str, items: list):
         self._name = name
         self._items = items
+        ShopCatalog().rebuild_event_shop()
 
 # Current event shop instance
 EVENT_SHOP = EventShopConfig()
@@ -643,6 +643,107 @@ async def add_to_inventory(user_id: int, itemid: str, amount: int = 1, ring_id:
         await add_item(user_id, itemid, amount, unique_item_id=unique_item_id)
 
 
+async def add_items_to_inventory(user_id: int, items: dict[str, int], ring_id: Optional[int] = None) -> None:
+    """
+    Grouped version of add_to_inventory for several items given to the same player, using one query per kind of change instead of
+    a few queries per item. Meant to be called within a transaction when the items come from somewhere else.
+
+    :param user_id: the player receiving the items
+    :param items:   the quantity of each item, by item id including the unique id part if any
+    :param ring_id: the ring receiving the items instead of the base inventory, chests always go to the base inventory
+    """
+    if len(items) == 0:
+        return
+
+    item_codes: list[str] = list({convert_id(full_id)[0] for full_id in items.keys()})
+    item_types: dict[str, str] = dict(await AllItems.filter(id__in=item_codes).values_list("id", "type"))
+
+    base_items: dict[tuple[str, Optional[str]], int] = {}
+    ring_items: dict[tuple[str, Optional[str]], int] = {}
+    for full_id, amount in items.items():
+        itemid, unique_item_id = convert_id(full_id)
+        item_type: Optional[str] = item_types.get(itemid)
+        if item_type == ITEM_TYPE_RING:
+            # Rings come with their own storage, there are very few of them anyway
+            await add_ring_to_inventory(user_id, itemid, unique_item_id, True)
+        elif ring_id and item_type != "chest":
+            ring_items[(itemid, unique_item_id)] = ring_items.get((itemid, unique_item_id), 0) + amount
+        else:
+            base_items[(itemid, unique_item_id)] = base_items.get((itemid, unique_item_id), 0) + amount
+
+    await _upsert_items(Inventory, {"user_id": user_id}, base_items)
+    await _upsert_items(RingInventory, {"ring_id": ring_id}, ring_items)
+    log_event(user_id, "inventory", f"Added {', '.join(f'{amount}x {full_id}' for full_id, amount in items.items())}", "DEBUG")
+
+
+async def add_items_within_weight(user_id: int, items: list[tuple[str, int]], ring_id: Optional[int] = None) -> list[tuple[str, int]]:
+    """
+    Grouped version of calling check_inv_weight without prompt then add_to_inventory for each of the items, in order. The weights are read once then
+    tracked in memory: each item goes to the ring if it fits, else to the base inventory if it fits, and is lost otherwise.
+
+    :param user_id: the player receiving the items
+    :param items:   the items to give with their quantity, the same item can appear several times
+    :param ring_id: the equipped ring of the player, if any
+
+    :return: the items that were lost for lack of space
+    """
+    if len(items) == 0:
+        return []
+
+    item_codes: list[str] = list({convert_id(full_id)[0] for full_id, _ in items})
+    item_details: dict[str, tuple[int, str]] = {itemid: (weight, item_type) for itemid, weight, item_type in await AllItems.filter(id__in=item_codes).values_list("id", "weight", "type")}
+    current_inv_weight, current_ring_weight, ring_weight = await give_total_user_weight(user_id, ring_id)
+
+    base_items: dict[str, int] = {}
+    ring_items: dict[str, int] = {}
+    lost_items: list[tuple[str, int]] = []
+    for full_id, quantity in items:
+        item_weight, item_type = item_details[convert_id(full_id)[0]]
+        total_item_weight: int = int(quantity * int(item_weight))
+        if ring_id is not None:
+            if (ring_weight - current_ring_weight) >= total_item_weight:
+                ring_items[full_id] = ring_items.get(full_id, 0) + quantity
+                # Chests and rings never end up in a ring
+                if item_type in (ITEM_TYPE_CHEST, ITEM_TYPE_RING):
+                    current_inv_weight += total_item_weight
+                else:
+                    current_ring_weight += total_item_weight
+
+                continue
+
+            log_event(user_id, "ring", f"Ring full for {quantity}x {full_id} ({total_item_weight})", "WARN")
+
+        if (BASE_WEIGHT - current_inv_weight) >= total_item_weight or item_type == ITEM_TYPE_RING:
+            base_items[full_id] = base_items.get(full_id, 0) + quantity
+            current_inv_weight += total_item_weight
+        else:
+            log_event(user_id, "inventory", f"Inv full for {quantity}x {full_id} ({total_item_weight})", "WARN")
+            lost_items.append((full_id, quantity))
+
+    await add_items_to_inventory(user_id, base_items)
+    await add_items_to_inventory(user_id, ring_items, ring_id)
+    return lost_items
+
+
+async def _upsert_items(model, owner: dict[str, int], items: dict[tuple[str, Optional[str]], int]) -> None:
+    # One select to find the stacks that already exist, one update per existing stack and a single insert for everything else
+    if len(items) == 0:
+        return
+
+    stackable: dict[str, int] = {itemid: amount for (itemid, unique_item_id), amount in items.items() if unique_item_id is None}
+    new_rows: list = [model(item_id=itemid, count=amount, unique_id=unique_item_id, **owner) for (itemid, unique_item_id), amount in items.items() if unique_item_id is not None]
+    if len(stackable) > 0:
+        existing_ids: set[str] = set(await model.filter(item_id__in=list(stackable.keys()), unique_id=None, **owner).values_list("item_id", flat=True))
+        for itemid, amount in stackable.items():
+            if itemid in existing_ids:
+                await model.filter(item_id=itemid, **owner).update(count=F("count") + amount)
+            else:
+                new_rows.append(model(item_id=itemid, count=amount, unique_id=None, **owner))
+
+    if len(new_rows) > 0:
+        await model.bulk_create(new_rows)
+
+
 async def add_item(user_id, itemid, amount, ring_id: Optional[int] = None, unique_item_id: Optional[int] = None) -> None:
     if not ring_id:
         item_check = await Inventory.get_or_none(item_id=itemid, user_id=user_id, unique_id=unique_item_id).values_list("count")
@@ -0,0 +1,179 @@
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import timedelta
+from io import BytesIO
+from time import time
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from PIL import Image, ImageDraw
+
+from utils.LoggingUtils import log_event
+from utils.base import singleton
+
+_SHORT_NAME: str = "avatar_cache"
+
+AVATAR_SIZE: tuple[int, int] = (350, 350)
+AVATAR_CACHE_DIR: str = "./temp/avatars"
+
+_DEFAULT_CACHE_SIZE: int = 512
+_DEFAULT_TTL: timedelta = timedelta(hours=6)
+_DEFAULT_DISK_TTL: timedelta = timedelta(days=14)
+
+# Receives the avatar asset, anything exposing a key and an async read(), and returns its encoded image
+AvatarFetcher = Callable[[Any], Awaitable[bytes]]
+
+_circle_mask: Optional[Image.Image] = None
+
+
+def avatar_mask() -> Image.Image:
+    # Drawn 3 times larger then scaled down for smooth edges, computed once and shared by every render
+    global _circle_mask
+    if _circle_mask is None:
+        big_size: tuple[int, int] = (AVATAR_SIZE[0] * 3, AVATAR_SIZE[1] * 3)
+        mask: Image.Image = Image.new("L", big_size, 0)
+        ImageDraw.Draw(mask).ellipse((0, 0) + big_size, fill=255)
+        _circle_mask = mask.resize(AVATAR_SIZE, Image.LANCZOS)
+
+    return _circle_mask
+
+
+async def read_asset(asset: Any) -> bytes:
+    return await asset.read()
+
+
+@singleton
+class AvatarCache:
+    def __init__(self, fetcher: AvatarFetcher = read_asset, cache_dir: Optional[str] = AVATAR_CACHE_DIR, cache_size: int = _DEFAULT_CACHE_SIZE, ttl: timedelta = _DEFAULT_TTL, disk_ttl: timedelta = _DEFAULT_DISK_TTL):
+        self._fetcher: AvatarFetcher = fetcher
+        self._cache_dir: Optional[str] = cache_dir
+        self._cache_size: int = cache_size
+        self._ttl: float = ttl.total_seconds()
+        self._disk_ttl: float = disk_ttl.total_seconds()
+        self._avatars: OrderedDict[str, tuple[float, Image.Image]] = OrderedDict()
+        self._memory_hit_count: int = 0
+        self._disk_hit_count: int = 0
+        self._fetch_count: int = 0
+
+    # ============================================= Special methods =============================================
+
+    def __contains__(self, avatar_hash: str) -> bool:
+        entry: Optional[tuple[float, Image.Image]] = self._avatars.get(avatar_hash)
+        return entry is not None and entry[0] > time()
+
+    def __repr__(self) -> str:
+        return f"AvatarCache {{cached: {len(self._avatars)}, memory_hits: {self._memory_hit_count}, disk_hits: {self._disk_hit_count}, fetches: {self._fetch_count}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def disk_hits(self) -> int:
+        return self._disk_hit_count
+
+    @property
+    def fetches(self) -> int:
+        return self._fetch_count
+
+    @property
+    def memory_hits(self) -> int:
+        return self._memory_hit_count
+
+    # ============================================== "Real" methods =============================================
+
+    def clear(self):
+        self._avatars.clear()
+
+    async def get(self, asset: Any) -> Image.Image:
+        """
+        Retrieve the avatar resized to AVATAR_SIZE, looking into memory first, then into the disk cache and only then fetching it.
+
+        :param asset: the avatar asset, its key is the hash of the avatar so a new avatar never hits an older entry
+
+        :return: the decoded and resized avatar, shared between callers so it must not be modified
+        """
+        avatar_hash: str = asset.key
+        now: float = time()
+        entry: Optional[tuple[float, Image.Image]] = self._avatars.get(avatar_hash)
+        if entry is not None and entry[0] > now:
+            self._avatars.move_to_end(avatar_hash)
+            self._memory_hit_count += 1
+            return entry[1]
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        avatar: Optional[Image.Image] = await loop.run_in_executor(None, self._read_disk, avatar_hash)
+        if avatar is not None:
+            self._disk_hit_count += 1
+        else:
+            data: bytes = await self._fetcher(asset)
+            self._fetch_count += 1
+            avatar = await loop.run_in_executor(None, self._decode_and_store, avatar_hash, data)
+
+        self._avatars[avatar_hash] = (now + self._ttl, avatar)
+        self._avatars.move_to_end(avatar_hash)
+        while len(self._avatars) > self._cache_size:
+            self._avatars.popitem(last=False)
+
+        return avatar
+
+    def purge_disk(self) -> int:
+        # Removes the disk entries older than the disk TTL, returns the number of removed files
+        if self._cache_dir is None or not os.path.isdir(self._cache_dir):
+            return 0
+
+        limit: float = time() - self._disk_ttl
+        removed: int = 0
+        for file_name in os.listdir(self._cache_dir):
+            path: str = os.path.join(self._cache_dir, file_name)
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+                removed += 1
+
+        if removed > 0:
+            _log("system", f"Removed {removed} expired avatars from {self._cache_dir}")
+
+        return removed
+
+    def set_fetcher(self, fetcher: AvatarFetcher):
+        # Mostly meant for tests and benchmarks, to avoid any network access
+        self._fetcher = fetcher
+
+    def _decode_and_store(self, avatar_hash: str, data: bytes) -> Image.Image:
+        with Image.open(BytesIO(data)) as image:
+            avatar: Image.Image = image.resize(AVATAR_SIZE)
+
+        path: Optional[str] = self._disk_path(avatar_hash)
+        if path is not None:
+            try:
+                os.makedirs(self._cache_dir, exist_ok=True)
+                avatar.save(path, "png")
+            except OSError as e:
+                _log("system", f"Failed to store avatar {avatar_hash} on disk: {e!r}", "WARN")
+
+        return avatar
+
+    def _disk_path(self, avatar_hash: str) -> Optional[str]:
+        # Hashes are plain alphanumerical strings, optionally prefixed by a_ for animated avatars, so they make safe file names
+        return None if self._cache_dir is None else os.path.join(self._cache_dir, f"{avatar_hash}.png")
+
+    def _read_disk(self, avatar_hash: str) -> Optional[Image.Image]:
+        path: Optional[str] = self._disk_path(avatar_hash)
+        if path is None or not os.path.isfile(path):
+            return None
+
+        try:
+            with Image.open(path) as image:
+                image.load()
+                avatar: Image.Image = image.copy()
+        except OSError:
+            return None
+
+        # Touch the file so that avatars still in use are not purged
+        os.utime(path)
+        return avatar
+
+
+def _log(user_id: Union[int, str], message: str, level: str = "INFO"):
+    log_event(user_id, _SHORT_NAME, message, level)
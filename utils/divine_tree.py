@@ -1,9 +1,12 @@
 from PIL import Image, ImageDraw, ImageFont
 from typing import Dict, Tuple, List
 from items.divine_weapons import TIER_1_WEAPONS, TIER_2_WEAPONS, TIER_3_WEAPONS
+from utils.render_cache import RenderCache
 import os
 from io import BytesIO
 
+DIVINE_TREE_RENDER_NAMESPACE: str = "divine_tree"
+
 class WeaponNode:
     def __init__(self, weapon_id: str, name: str, x: int, y: int, cp: int):
         self.id = weapon_id
@@ -14,6 +17,17 @@ class WeaponNode:
         self.connections: List['WeaponNode'] = []
 
 def generate_divine_weapon_tree(output_path: str = "temp/divine_tree") -> None:
+    with open(f"{output_path}.png", "wb") as file:
+        file.write(render_divine_weapon_tree(_weapon_tiers()))
+
+async def divine_weapon_tree_image() -> bytes:
+    """Get the tree as PNG bytes, only rendered again (off the event loop) when the weapon definitions change"""
+    return await RenderCache().get(DIVINE_TREE_RENDER_NAMESPACE, _weapon_tiers(), render_divine_weapon_tree)
+
+def _weapon_tiers() -> List[Dict]:
+    return [TIER_1_WEAPONS, TIER_2_WEAPONS, TIER_3_WEAPONS]
+
+def render_divine_weapon_tree(weapon_tiers: List[Dict]) -> bytes:
     # Create base image with a darker background
     base = Image.new(mode="RGB", size=(1920, 1080), color=(40, 44, 52))
     draw = ImageDraw.Draw(base)
@@ -36,9 +50,9 @@ def generate_divine_weapon_tree(output_path: str = "temp/divine_tree") -> None:
 
     # Position nodes for each tier
     for tier, weapons, y_pos in [
-        (1, TIER_1_WEAPONS, 200),
-        (2, TIER_2_WEAPONS, 500),
-        (3, TIER_3_WEAPONS, 800)
+        (1, weapon_tiers[0], 200),
+        (2, weapon_tiers[1], 500),
+        (3, weapon_tiers[2], 800)
     ]:
         # Draw tier label
         draw.text((100, y_pos), f"Tier {tier}", 
@@ -53,7 +67,7 @@ def generate_divine_weapon_tree(output_path: str = "temp/divine_tree") -> None:
             )
 
     # Draw connections first (so they appear behind nodes)
-    for tier_weapons in [TIER_1_WEAPONS, TIER_2_WEAPONS]:
+    for tier_weapons in weapon_tiers[:2]:
         for weapon_id, weapon in tier_weapons.items():
             start_node = weapon_nodes[weapon_id]
             for evolution in weapon['evolution_paths']:
@@ -94,7 +108,9 @@ def generate_divine_weapon_tree(output_path: str = "temp/divine_tree") -> None:
 
     # Save with antialiasing
     base = base.resize((1920, 1080), Image.LANCZOS)
-    base.save(f"{output_path}.png", quality=95)
+    buffer = BytesIO()
+    base.save(buffer, "png", quality=95)
+    return buffer.getvalue()
 
 def _get_curve_points(x1: int, y1: int, x2: int, y2: int) -> List[Tuple[int, int]]:
     """Generate points for a curved line between two positions"""
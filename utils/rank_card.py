@@ -0,0 +1,237 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Hashable, Optional, Union
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.LoggingUtils import log_event
+from utils.avatar_cache import avatar_mask
+from utils.base import singleton
+
+_SHORT_NAME: str = "rank_card"
+
+RANK_ASSET_DIR: str = "./media/Rank"
+RANK_CARD_FILENAME: str = "base.png"
+
+TITLE_NAMES: list[str] = [
+    "Fight_Disciple",
+    "Fight_Practitioner",
+    "Fight_Master",
+    "Fight_Grandmaster",
+    "Fight_Spirit",
+    "Fight_King",
+    "Fight_Emperor",
+    "Fight_Ancestor",
+    "Fight_Venerate",
+    "Peak_Fight_Venerate",
+    "Half_Saint",
+    "Fight_Saint",
+    "Fight_God",
+    "Fight_God",
+    "Fight_God",
+    "Fight_God"
+]
+TITLE_NAME_MORTAL: str = "Mortal"
+
+_CARD_SIZE: tuple[int, int] = (2160, 722)
+_AVATAR_POSITION: tuple[int, int] = (130, 105)
+_DIGIT_SIZE: tuple[int, int] = (35, 57)
+_EXP_BAR_SIZE: tuple[int, int] = (2050, 140)
+_EXP_BAR_POSITION: tuple[int, int] = (70, 495)
+_RANK_DIGITS: int = 5
+_RANK_POSITION: tuple[int, int] = (298, 533)
+_TITLE_SIZE: tuple[int, int] = (525, 130)
+_TITLE_POSITION: tuple[int, int] = (47, 355)
+
+_DEFAULT_WORKERS: int = 4
+_DEFAULT_CACHE_SIZE: int = 128  # Cards weigh up to about 1 MB once encoded
+_PNG_COMPRESS_LEVEL: int = 3  # Noticeably faster than the default level 6 for a few percent larger files
+
+
+class RankCardData:
+    """Everything drawn on a rank card, computed on the event loop so the render itself doesn't touch any game state"""
+
+    def __init__(self, user_id: int, member_name: str, chinese_name: bool, realm: str, small_realm: bool, stage_key: tuple[int, int], title_name: str, percent_floor: int, exp_text: str, exp_over_cap: bool, rank: int,
+                 avatar_hash: Hashable):
+        self.user_id: int = user_id
+        self.member_name: str = member_name
+        self.chinese_name: bool = chinese_name
+        self.realm: str = realm
+        self.small_realm: bool = small_realm
+        self.stage_key: tuple[int, int] = stage_key
+        self.title_name: str = title_name
+        self.percent_floor: int = percent_floor
+        self.exp_text: str = exp_text
+        self.exp_over_cap: bool = exp_over_cap
+        self.rank: int = rank
+        self.avatar_hash: Hashable = avatar_hash
+
+    def __repr__(self) -> str:
+        return f"RankCardData {{user_id: {self.user_id}, stage: {self.stage_key}, exp_bucket: {self.percent_floor}, rank: {self.rank}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    @property
+    def cache_key(self) -> tuple:
+        # The exp text is printed on the card so it's part of the key as well, the exp bucket alone would show a stale value
+        return self.user_id, self.stage_key, self.percent_floor, self.rank, self.avatar_hash, self.member_name, self.realm, self.exp_text
+
+
+class _RankAssets:
+    def __init__(self, asset_dir: str):
+        self.asset_dir: str = asset_dir
+        self.base: Image.Image = _load_image(os.path.join(asset_dir, "base.png"), _CARD_SIZE)
+        self.digits: dict[str, Image.Image] = {str(digit): _load_image(os.path.join(asset_dir, "Number_Rank", f"{digit}.png"), _DIGIT_SIZE) for digit in range(10)}
+        self.titles: dict[str, Image.Image] = _load_directory(os.path.join(asset_dir, "Titles"), _TITLE_SIZE)
+        self.exp_bars: dict[str, Image.Image] = _load_directory(os.path.join(asset_dir, "ExpBar"), _EXP_BAR_SIZE)
+
+        # Fonts are loaded once per worker thread since FreeType faces should not be shared between threads
+        self._fonts: threading.local = threading.local()
+
+    @property
+    def image_count(self) -> int:
+        return 1 + len(self.digits) + len(self.titles) + len(self.exp_bars)
+
+    def fonts(self) -> dict[str, ImageFont.FreeTypeFont]:
+        fonts: Optional[dict[str, ImageFont.FreeTypeFont]] = getattr(self._fonts, "fonts", None)
+        if fonts is None:
+            font_path: str = os.path.join(self.asset_dir, "edosz.ttf")
+            fonts = {
+                "name": ImageFont.truetype(font_path, 74),
+                "small": ImageFont.truetype(font_path, 58),
+                "very_small": ImageFont.truetype(font_path, 42),
+                "chinese": ImageFont.truetype(os.path.join(self.asset_dir, "SentyZHAO-20180827.ttf"), 64)
+            }
+            self._fonts.fonts = fonts
+
+        return fonts
+
+
+@singleton
+class RankCardRenderer:
+    def __init__(self, asset_dir: str = RANK_ASSET_DIR, workers: int = _DEFAULT_WORKERS, cache_size: int = _DEFAULT_CACHE_SIZE):
+        self._asset_dir: str = asset_dir
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rank_card")
+        self._cache_size: int = cache_size
+        self._assets: Optional[_RankAssets] = None
+        self._cards: OrderedDict[tuple, bytes] = OrderedDict()
+        self._hit_count: int = 0
+        self._miss_count: int = 0
+
+    # ============================================= Special methods =============================================
+
+    def __repr__(self) -> str:
+        return f"RankCardRenderer {{cached: {len(self._cards)}, hits: {self._hit_count}, misses: {self._miss_count}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def hits(self) -> int:
+        return self._hit_count
+
+    @property
+    def loaded(self) -> bool:
+        return self._assets is not None
+
+    @property
+    def misses(self) -> int:
+        return self._miss_count
+
+    # ============================================== "Real" methods =============================================
+
+    def cached(self, data: RankCardData) -> Optional[bytes]:
+        # Lets the caller skip fetching the avatar when the card is already rendered
+        card: Optional[bytes] = self._cards.get(data.cache_key)
+        if card is not None:
+            self._cards.move_to_end(data.cache_key)
+            self._hit_count += 1
+
+        return card
+
+    def clear(self):
+        self._cards.clear()
+
+    async def load(self):
+        assets: _RankAssets = await asyncio.get_running_loop().run_in_executor(self._executor, _RankAssets, self._asset_dir)
+        self._assets = assets
+        self.clear()
+        _log("system", f"Loaded {assets.image_count} rank card images from {self._asset_dir}")
+
+    async def render(self, data: RankCardData, avatar: Image.Image) -> bytes:
+        """
+        Render a rank card as PNG bytes in the worker pool, the event loop is only used to hand over the data.
+
+        :param data:   the content of the card
+        :param avatar: the avatar of the member as returned by the AvatarCache
+
+        :return: the PNG encoded card
+        """
+        card: Optional[bytes] = self.cached(data)
+        if card is not None:
+            return card
+
+        self._miss_count += 1
+        if self._assets is None:
+            await self.load()
+
+        card = await asyncio.get_running_loop().run_in_executor(self._executor, self._render, data, avatar)
+        self._cards[data.cache_key] = card
+        while len(self._cards) > self._cache_size:
+            self._cards.popitem(last=False)
+
+        return card
+
+    def _render(self, data: RankCardData, avatar: Image.Image) -> bytes:
+        assets: _RankAssets = self._assets
+        fonts: dict[str, ImageFont.FreeTypeFont] = assets.fonts()
+        base: Image.Image = assets.base.copy()
+
+        card_text: ImageDraw.ImageDraw = ImageDraw.Draw(base)
+        card_text.text((585, 260), data.member_name, (0, 0, 0), anchor="lm", font=fonts["chinese"] if data.chinese_name else fonts["name"])
+        card_text.text((1545, 458), data.exp_text, (255, 77, 77) if data.exp_over_cap else (0, 0, 0), anchor="lm", font=fonts["small"])
+        card_text.text((595, 458), data.realm, (0, 0, 0), anchor="lm", font=fonts["very_small"] if data.small_realm else fonts["small"])
+
+        x_cords, y_cords = _AVATAR_POSITION
+        base.paste(avatar, (x_cords, y_cords, x_cords + avatar.size[0], y_cords + avatar.size[1]), avatar_mask())
+
+        exp_bar: Image.Image = assets.exp_bars[f"{data.title_name}{data.percent_floor}"]
+        bar_x_cords, bar_y_cords = _EXP_BAR_POSITION
+        base.paste(exp_bar, (bar_x_cords, bar_y_cords, bar_x_cords + exp_bar.size[0], bar_y_cords + exp_bar.size[1]), exp_bar)
+
+        card_text.text((123, 563), "RANK :", (255, 255, 255), anchor="lm", font=fonts["small"])
+
+        rank_x_cords, rank_y_cords = _RANK_POSITION
+        for digit in str(data.rank).zfill(_RANK_DIGITS):
+            image: Image.Image = assets.digits[digit]
+            base.paste(image, (rank_x_cords, rank_y_cords, image.size[0] + rank_x_cords, image.size[1] + rank_y_cords), image)
+            rank_x_cords += (3 + image.size[0])
+
+        user_title: Image.Image = assets.titles[data.title_name]
+        title_x_cords, title_y_cords = _TITLE_POSITION
+        base.paste(user_title, (title_x_cords, title_y_cords, title_x_cords + user_title.size[0], title_y_cords + user_title.size[1]), user_title)
+
+        buffer: BytesIO = BytesIO()
+        base.save(buffer, "png", compress_level=_PNG_COMPRESS_LEVEL)
+        return buffer.getvalue()
+
+
+def _load_directory(directory: str, size: tuple[int, int]) -> dict[str, Image.Image]:
+    return {os.path.splitext(file_name)[0]: _load_image(os.path.join(directory, file_name), size) for file_name in sorted(os.listdir(directory)) if file_name.lower().endswith(".png")}
+
+
+def _load_image(path: str, size: tuple[int, int]) -> Image.Image:
+    # resize() returns a fully decoded copy so the file handle can be released right away
+    with Image.open(path) as image:
+        return image.resize(size)
+
+
+def _log(user_id: Union[int, str], message: str):
+    log_event(user_id, _SHORT_NAME, message)
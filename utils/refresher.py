@@ -0,0 +1,171 @@
+import asyncio
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Hashable, Optional, Union
+
+from utils.LoggingUtils import log_event
+from utils.base import singleton
+
+_SHORT_NAME: str = "refresher"
+
+# Discord allows about 5 message edits per 5 seconds per channel
+DEFAULT_DEBOUNCE: timedelta = timedelta(seconds=1)
+DEFAULT_CHANNEL_SPACING: timedelta = timedelta(seconds=1)
+
+RefreshCallback = Callable[[], Coroutine[Any, Any, Any]]
+
+
+class RefreshStats:
+    def __init__(self):
+        self.requested_count: int = 0
+        self.sent_count: int = 0
+        self.merged_count: int = 0
+        self.dropped_count: int = 0
+        self.failure_count: int = 0
+        self.last_error: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"RefreshStats(requested={self.requested_count}, sent={self.sent_count}, merged={self.merged_count}, dropped={self.dropped_count}, failures={self.failure_count})"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+
+class _PendingRefresh:
+    def __init__(self, key: Hashable, channel_id: Optional[int], callback: RefreshCallback):
+        self.key: Hashable = key
+        self.channel_id: Optional[int] = channel_id
+        self.callback: RefreshCallback = callback
+        self.task: Optional[asyncio.Task] = None
+
+
+@singleton
+class MessageRefresher:
+    def __init__(self, debounce: timedelta = DEFAULT_DEBOUNCE, channel_spacing: timedelta = DEFAULT_CHANNEL_SPACING):
+        self._debounce: float = debounce.total_seconds()
+        self._channel_spacing: float = channel_spacing.total_seconds()
+        self._pending: dict[Hashable, _PendingRefresh] = {}
+        self._channel_next_slots: dict[int, float] = {}
+        self._in_flight: set[asyncio.Task] = set()
+        self._stats: RefreshStats = RefreshStats()
+        self._stopped: bool = False
+
+    # ============================================= Special methods =============================================
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._pending
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    @property
+    def stats(self) -> RefreshStats:
+        return self._stats
+
+    # ============================================== "Real" methods =============================================
+
+    def cancel(self, key: Hashable) -> bool:
+        pending: Optional[_PendingRefresh] = self._pending.pop(key, None)
+        if pending is None:
+            return False
+
+        pending.task.cancel()
+        self._stats.dropped_count += 1
+        return True
+
+    def configure(self, debounce: Optional[timedelta] = None, channel_spacing: Optional[timedelta] = None):
+        if debounce is not None:
+            self._debounce = debounce.total_seconds()
+
+        if channel_spacing is not None:
+            self._channel_spacing = channel_spacing.total_seconds()
+
+    async def drain(self):
+        # Waits for every pending and in-flight refresh to complete, mostly useful at shutdown and in tests
+        while len(self._pending) > 0 or len(self._in_flight) > 0:
+            await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+
+    def request(self, key: Hashable, callback: RefreshCallback, channel_id: Optional[int] = None) -> bool:
+        """
+        Request a refresh of the message identified by key. The callback renders the message state at the time it runs, so when several requests
+        arrive within the debounce window only the latest callback runs. The edits made in the same channel are spaced by the channel spacing.
+
+        :param key:        the message identifier, usually the message id
+        :param callback:   the coroutine function performing the edit
+        :param channel_id: the channel the message belongs to, used to space edits within a channel
+
+        :return: True if a new refresh was scheduled, False if the request was merged into an already pending one or the refresher is stopped
+        """
+        self._stats.requested_count += 1
+        if self._stopped:
+            self._stats.dropped_count += 1
+            return False
+
+        pending: Optional[_PendingRefresh] = self._pending.get(key)
+        if pending is not None:
+            pending.callback = callback
+            self._stats.merged_count += 1
+            return False
+
+        pending = _PendingRefresh(key, channel_id, callback)
+        self._pending[key] = pending
+        pending.task = asyncio.get_running_loop().create_task(self._run(pending))
+        self._in_flight.add(pending.task)
+        pending.task.add_done_callback(self._in_flight.discard)
+        return True
+
+    async def shutdown(self):
+        # Refuses any new request then lets the pending refreshes go out, the bot must still be connected
+        self._stopped = True
+        await self.drain()
+        _log("system", f"Shut down after draining the pending message refreshes, {self._stats}")
+
+    def start(self):
+        # Accepts requests again after a shutdown
+        self._stopped = False
+
+    def stop(self) -> int:
+        # Drops every pending refresh, returns the number of dropped refreshes
+        dropped: int = 0
+        for key in list(self._pending.keys()):
+            if self.cancel(key):
+                dropped += 1
+
+        if dropped > 0:
+            _log("system", f"Dropped {dropped} pending message refreshes, {self._stats}")
+
+        return dropped
+
+    async def _run(self, pending: _PendingRefresh):
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        await asyncio.sleep(self._debounce)
+
+        if pending.channel_id is not None:
+            # Reserve the next free edit slot of the channel
+            now: float = loop.time()
+            slot: float = max(now, self._channel_next_slots.get(pending.channel_id, now))
+            self._channel_next_slots[pending.channel_id] = slot + self._channel_spacing
+            if slot > now:
+                await asyncio.sleep(slot - now)
+
+        # Any request arriving from now on must schedule a new refresh since this one may already be rendering an older state
+        if self._pending.get(pending.key) is pending:
+            self._pending.pop(pending.key)
+
+        try:
+            await pending.callback()
+            self._stats.sent_count += 1
+        except Exception as e:
+            self._stats.failure_count += 1
+            self._stats.last_error = repr(e)
+            _log("system", f"Failed to refresh message {pending.key}: {e!r}", "WARN")
+
+
+def _log(user_id: Union[int, str], message: str, level: str = "INFO"):
+    log_event(user_id, _SHORT_NAME, message, level)
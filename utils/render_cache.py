@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Union
+
+from utils.LoggingUtils import log_event
+from utils.base import singleton
+
+_SHORT_NAME: str = "render_cache"
+
+_DEFAULT_RENDERS_PER_NAMESPACE: int = 2
+
+RenderFunction = Callable[[Any], bytes]
+
+
+def content_key(inputs: Any) -> str:
+    # Canonical JSON so that equal inputs always produce the same key, whatever the dict ordering
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")).hexdigest()
+
+
+@singleton
+class RenderCache:
+    """
+    Content addressed cache of rendered images. Each namespace (one per kind of image) keeps its latest renders, keyed by the hash of the data the
+    image was rendered from, so an image is only rendered again when its data changes.
+    """
+
+    def __init__(self, renders_per_namespace: int = _DEFAULT_RENDERS_PER_NAMESPACE):
+        self._renders_per_namespace: int = renders_per_namespace
+        self._renders: dict[str, OrderedDict[str, bytes]] = {}
+        self._pending: dict[tuple[str, str], asyncio.Future] = {}
+        self._hit_count: int = 0
+        self._render_count: int = 0
+
+    # ============================================= Special methods =============================================
+
+    def __repr__(self) -> str:
+        return f"RenderCache {{namespaces: {len(self._renders)}, hits: {self._hit_count}, renders: {self._render_count}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def hits(self) -> int:
+        return self._hit_count
+
+    @property
+    def renders(self) -> int:
+        return self._render_count
+
+    # ============================================== "Real" methods =============================================
+
+    def clear(self, namespace: Optional[str] = None):
+        if namespace is None:
+            self._renders.clear()
+        else:
+            self._renders.pop(namespace, None)
+
+    async def get(self, namespace: str, inputs: Any, render: RenderFunction) -> bytes:
+        """
+        Retrieve the image rendered from the inputs, rendering it in the default executor if it isn't cached yet.
+
+        :param namespace: the kind of image, each namespace only keeps its most recent renders
+        :param inputs:    the JSON serializable data the image is rendered from, it's both the cache key and the render function argument
+        :param render:    the function rendering the inputs into encoded image bytes, runs outside the event loop
+
+        :return: the encoded image
+        """
+        key: str = content_key(inputs)
+        renders: OrderedDict[str, bytes] = self._renders.setdefault(namespace, OrderedDict())
+        image: Optional[bytes] = renders.get(key)
+        if image is not None:
+            renders.move_to_end(key)
+            self._hit_count += 1
+            return image
+
+        # Concurrent requests for the same image wait for a single render
+        pending: Optional[asyncio.Future] = self._pending.get((namespace, key))
+        if pending is not None:
+            self._hit_count += 1
+            return await asyncio.shield(pending)
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        pending = loop.run_in_executor(None, render, inputs)
+        self._pending[(namespace, key)] = pending
+        try:
+            image = await asyncio.shield(pending)
+        finally:
+            self._pending.pop((namespace, key), None)
+
+        self._render_count += 1
+        renders = self._renders.setdefault(namespace, OrderedDict())
+        renders[key] = image
+        while len(renders) > self._renders_per_namespace:
+            renders.popitem(last=False)
+
+        _log("system", f"Rendered {namespace} {key[:12]} ({len(image):,} bytes)")
+        return image
+
+
+def _log(user_id: Union[int, str], message: str):
+    log_event(user_id, _SHORT_NAME, message)
@@ -0,0 +1,427 @@
+import asyncio
+import heapq
+import random
+from datetime import datetime, timedelta, time, timezone
+from enum import Enum
+from time import perf_counter
+from typing import Any, Callable, Coroutine, Optional, Union
+
+from disnake.ext import commands
+
+from utils.LoggingUtils import log_event
+from utils.base import singleton
+
+_SHORT_NAME: str = "scheduler"
+_MISFIRE_GRACE: timedelta = timedelta(seconds=30)
+
+JobCallback = Callable[[], Coroutine[Any, Any, Any]]
+
+
+class CatchUpPolicy(Enum):
+    SKIP = "skip"  # Runs that are late by more than the grace period are dropped, the job resumes at its next future slot
+    RUN_ONCE = "run_once"  # A late job runs once no matter how many slots were missed (coalescing)
+    RUN_ALL = "run_all"  # A late job runs once per missed slot, back to back
+
+
+class JobMetrics:
+    def __init__(self):
+        self.run_count: int = 0
+        self.failure_count: int = 0
+        self.overlap_skip_count: int = 0
+        self.missed_run_count: int = 0
+        self.total_runtime: float = 0.0
+        self.max_runtime: float = 0.0
+        self.last_runtime: float = 0.0
+        self.last_started_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return (f"JobMetrics(runs={self.run_count}, failures={self.failure_count}, overlap_skips={self.overlap_skip_count}, missed={self.missed_run_count}, "
+                f"avg={self.average_runtime:.3f}s, max={self.max_runtime:.3f}s, last={self.last_runtime:.3f}s)")
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def average_runtime(self) -> float:
+        return self.total_runtime / self.run_count if self.run_count > 0 else 0.0
+
+    # ============================================== "Real" methods =============================================
+
+    def record(self, started_at: datetime, runtime: float, error: Optional[BaseException] = None):
+        self.run_count += 1
+        self.total_runtime += runtime
+        self.last_runtime = runtime
+        self.max_runtime = max(self.max_runtime, runtime)
+        self.last_started_at = started_at
+        if error is not None:
+            self.failure_count += 1
+            self.last_error = repr(error)
+
+
+class ScheduledJob:
+    def __init__(self, name: str, callback: JobCallback, first_run: datetime, interval: Optional[timedelta] = None, daily_times: Optional[list[time]] = None,
+                 jitter: timedelta = timedelta(0), catch_up: CatchUpPolicy = CatchUpPolicy.RUN_ONCE, allow_overlap: bool = False):
+        self._name: str = name
+        self._callback: JobCallback = callback
+        self._interval: Optional[timedelta] = interval
+        self._daily_times: Optional[list[time]] = sorted(daily_times) if daily_times else None
+        self._jitter: timedelta = jitter
+        self._catch_up: CatchUpPolicy = catch_up
+        self._allow_overlap: bool = allow_overlap
+        self._nominal_run: datetime = first_run
+        self._next_run: datetime = self._apply_jitter(first_run)
+        self._generation: int = 0
+        self._running_count: int = 0
+        self._cancelled: bool = False
+        self._metrics: JobMetrics = JobMetrics()
+
+    def __repr__(self) -> str:
+        return f"ScheduledJob({self._name}, next_run={self._next_run.isoformat()}, {self._metrics})"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def allow_overlap(self) -> bool:
+        return self._allow_overlap
+
+    @property
+    def callback(self) -> JobCallback:
+        return self._callback
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def catch_up(self) -> CatchUpPolicy:
+        return self._catch_up
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def metrics(self) -> JobMetrics:
+        return self._metrics
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def next_run(self) -> datetime:
+        return self._next_run
+
+    @property
+    def nominal_run(self) -> datetime:
+        return self._nominal_run
+
+    @property
+    def recurring(self) -> bool:
+        return self._interval is not None or self._daily_times is not None
+
+    @property
+    def running(self) -> bool:
+        return self._running_count > 0
+
+    # ============================================== "Real" methods =============================================
+
+    def cancel(self):
+        self._cancelled = True
+        self._generation += 1
+
+    def count_missed_slots(self, now: datetime) -> int:
+        # Number of nominal slots that elapsed after the one currently being dispatched
+        missed: int = 0
+        slot: Optional[datetime] = self._following_slot(self._nominal_run)
+        while slot is not None and slot <= now:
+            missed += 1
+            slot = self._following_slot(slot)
+
+        return missed
+
+    def mark_started(self):
+        self._running_count += 1
+
+    def mark_finished(self):
+        self._running_count -= 1
+
+    def move_to(self, when: datetime):
+        self._nominal_run = when
+        self._next_run = self._apply_jitter(when)
+        self._generation += 1
+
+    def advance(self, now: datetime, skip_missed: bool) -> bool:
+        # Moves the job to its next nominal slot, returns False if the job has no further slot (one-shot)
+        slot: Optional[datetime] = self._following_slot(self._nominal_run)
+        if slot is None:
+            return False
+
+        if skip_missed:
+            while slot <= now:
+                slot = self._following_slot(slot)
+
+        self.move_to(slot)
+        return True
+
+    def _apply_jitter(self, when: datetime) -> datetime:
+        if self._jitter.total_seconds() <= 0:
+            return when
+
+        return when + timedelta(seconds=random.uniform(0, self._jitter.total_seconds()))
+
+    def _following_slot(self, after: datetime) -> Optional[datetime]:
+        if self._interval is not None:
+            return after + self._interval
+
+        if self._daily_times is not None:
+            return next_daily_occurrence(self._daily_times, after)
+
+        return None
+
+
+@singleton
+class Scheduler:
+    def __init__(self):
+        self._bot: Optional[commands.Bot] = None
+        self._heap: list[tuple[datetime, int, int, ScheduledJob]] = []
+        self._jobs: dict[str, ScheduledJob] = {}
+        self._sequence: int = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._running_tasks: set[asyncio.Task] = set()
+
+    # ============================================= Special methods =============================================
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._jobs
+
+    def __getitem__(self, name: str) -> Optional[ScheduledJob]:
+        return self._jobs.get(name)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def jobs(self) -> list[ScheduledJob]:
+        return sorted(self._jobs.values(), key=lambda job: job.next_run)
+
+    @property
+    def started(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    # ============================================== "Real" methods =============================================
+
+    def start(self, bot: Optional[commands.Bot] = None):
+        if bot is not None:
+            self._bot = bot
+
+        if not self.started:
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.get_event_loop().create_task(self._run())
+            _log("system", f"Scheduler started with {len(self._jobs)} registered jobs")
+
+    def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+
+        for task in list(self._running_tasks):
+            task.cancel()
+
+        self._running_tasks.clear()
+        _log("system", f"Scheduler stopped")
+
+    def schedule_once(self, name: str, callback: JobCallback, when: Union[datetime, timedelta]) -> ScheduledJob:
+        first_run: datetime = _to_deadline(when)
+        return self._register(ScheduledJob(name, callback, first_run))
+
+    def schedule_recurring(self, name: str, callback: JobCallback, interval: timedelta, first_run: Optional[Union[datetime, timedelta]] = None, jitter: timedelta = timedelta(0),
+                           catch_up: CatchUpPolicy = CatchUpPolicy.RUN_ONCE, allow_overlap: bool = False) -> ScheduledJob:
+        start: datetime = _to_deadline(first_run if first_run is not None else timedelta(0))
+        return self._register(ScheduledJob(name, callback, start, interval=interval, jitter=jitter, catch_up=catch_up, allow_overlap=allow_overlap))
+
+    def schedule_daily(self, name: str, callback: JobCallback, times: list[time], jitter: timedelta = timedelta(0), catch_up: CatchUpPolicy = CatchUpPolicy.SKIP,
+                       allow_overlap: bool = False) -> ScheduledJob:
+        first_run: datetime = next_daily_occurrence(times, _utcnow())
+        return self._register(ScheduledJob(name, callback, first_run, daily_times=times, jitter=jitter, catch_up=catch_up, allow_overlap=allow_overlap))
+
+    def reschedule(self, name: str, when: Union[datetime, timedelta]) -> bool:
+        job: Optional[ScheduledJob] = self._jobs.get(name)
+        if job is None:
+            return False
+
+        job.move_to(_to_deadline(when))
+        self._push(job)
+        return True
+
+    def cancel(self, name: str) -> bool:
+        job: Optional[ScheduledJob] = self._jobs.pop(name, None)
+        if job is None:
+            return False
+
+        job.cancel()
+        return True
+
+    def metrics(self) -> dict[str, JobMetrics]:
+        return {name: job.metrics for name, job in self._jobs.items()}
+
+    def _register(self, job: ScheduledJob) -> ScheduledJob:
+        existing: Optional[ScheduledJob] = self._jobs.get(job.name)
+        if existing is not None:
+            existing.cancel()
+
+        self._jobs[job.name] = job
+        self._push(job)
+        return job
+
+    def _push(self, job: ScheduledJob):
+        self._sequence += 1
+        heapq.heappush(self._heap, (job.next_run, self._sequence, job.generation, job))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _pop_due(self, now: datetime) -> Optional[ScheduledJob]:
+        # Stale heap entries (cancelled or moved jobs) are dropped lazily rather than searched for on every change
+        while len(self._heap) > 0:
+            deadline, _, generation, job = self._heap[0]
+            if job.cancelled or generation != job.generation:
+                heapq.heappop(self._heap)
+                continue
+
+            if deadline > now:
+                return None
+
+            heapq.heappop(self._heap)
+            return job
+
+        return None
+
+    def _next_deadline(self) -> Optional[datetime]:
+        while len(self._heap) > 0:
+            deadline, _, generation, job = self._heap[0]
+            if job.cancelled or generation != job.generation:
+                heapq.heappop(self._heap)
+                continue
+
+            return deadline
+
+        return None
+
+    async def _run(self):
+        if self._bot is not None:
+            await self._bot.wait_until_ready()
+
+        while True:
+            self._wakeup.clear()
+            now: datetime = _utcnow()
+            job: Optional[ScheduledJob] = self._pop_due(now)
+            while job is not None:
+                self._dispatch(job, now)
+                job = self._pop_due(now)
+
+            deadline: Optional[datetime] = self._next_deadline()
+            timeout: Optional[float] = None if deadline is None else max(0.0, (deadline - _utcnow()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, job: ScheduledJob, now: datetime):
+        scheduled_for: datetime = job.nominal_run
+        missed: int = job.count_missed_slots(now)
+        late: bool = now - scheduled_for > _MISFIRE_GRACE
+
+        if job.running and not job.allow_overlap:
+            job.metrics.overlap_skip_count += 1
+            _log("system", f"Skipped {job.name} run scheduled for {scheduled_for.isoformat()} since the previous run is still going", "DEBUG")
+            self._advance_or_forget(job, now, True)
+            return
+
+        if late and job.catch_up == CatchUpPolicy.SKIP:
+            job.metrics.missed_run_count += missed + 1
+            _log("system", f"Dropped {missed + 1} late run(s) of {job.name}", "WARN")
+            self._advance_or_forget(job, now, True)
+            return
+
+        run_count: int = 1
+        if missed > 0:
+            if job.catch_up == CatchUpPolicy.RUN_ALL:
+                run_count += missed
+            else:
+                job.metrics.missed_run_count += missed
+
+        self._advance_or_forget(job, now, True)
+
+        job.mark_started()
+        task: asyncio.Task = asyncio.get_event_loop().create_task(self._execute(job, run_count))
+        self._running_tasks.add(task)
+        task.add_done_callback(self._running_tasks.discard)
+
+    def _advance_or_forget(self, job: ScheduledJob, now: datetime, skip_missed: bool):
+        if job.advance(now, skip_missed):
+            self._push(job)
+        elif self._jobs.get(job.name) is job:
+            self._jobs.pop(job.name)
+
+    @staticmethod
+    async def _execute(job: ScheduledJob, run_count: int):
+        try:
+            for _ in range(0, run_count):
+                if job.cancelled:
+                    break
+
+                started_at: datetime = _utcnow()
+                start: float = perf_counter()
+                error: Optional[BaseException] = None
+                try:
+                    await job.callback()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+                    _log("system", f"Job {job.name} failed: {e!r}", "ERROR")
+
+                job.metrics.record(started_at, perf_counter() - start, error)
+        finally:
+            job.mark_finished()
+
+
+# =================================== Bootstrap and util class-level functions ==================================
+
+
+def next_daily_occurrence(times: list[time], after: datetime) -> datetime:
+    # Naive times are considered UTC, matching disnake's tasks.loop(time=...) behaviour
+    after_utc: datetime = after.astimezone(timezone.utc)
+    for day_offset in range(0, 2):
+        day = (after_utc + timedelta(days=day_offset)).date()
+        for moment in sorted(times):
+            candidate: datetime = datetime.combine(day, moment.replace(tzinfo=moment.tzinfo or timezone.utc)).astimezone(timezone.utc)
+            if candidate > after_utc:
+                return candidate
+
+    raise ValueError(f"Could not compute the next daily occurrence for {times}")
+
+
+def _to_deadline(when: Union[datetime, timedelta]) -> datetime:
+    if isinstance(when, timedelta):
+        return _utcnow() + when
+
+    # Naive datetimes are considered local time, the same convention as datetime.timestamp()
+    return when.astimezone(timezone.utc)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _log(user_id: Union[int, str], message: str, level: str = "INFO"):
+    log_event(user_id, _SHORT_NAME, message, level)
@@ -7,6 +7,7 @@ import disnake
 import random
 
 from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
 from functools import cmp_to_key
 from typing import Callable, Optional, TypeVar, Union, Any, cast
 
@@ -18,8 +19,9 @@ from utils.CommandUtils import MAX_CHOICE_ITEMS
 from utils.Database import AllBeasts, AllPets, Pet
 from utils.InventoryUtils import ITEM_TYPE_MONSTER_CORE, ITEM_TYPE_MONSTER_PART, ITEM_TYPE_EGG, ITEM_TYPE_CHEST, ITEM_TYPE_MAP_FRAGMENT
 from utils.LoggingUtils import log_event
-from world.cultivation import BeastCultivationStage
+from world.cultivation import BeastCultivationStage, CultivationStageTable, get_beast_stage_table
 from world.compendium import ItemCompendium, ItemDefinition, EggDefinition, LOOT_TYPE_MIXED, MapFragmentDefinition
+from world.leaderboard import Leaderboards
 
 # Could maybe add a flame and amplifier drop transform there, or not, we'll see how the bestiary gets used first
 D = TypeVar("D", bound="BeastDefinition")
@@ -49,6 +51,7 @@ RAID_SPAWN_MIN_RANK = 2
 RAID_SPAWN_MAX_RANK = 8
 RAID_FIRE_SPAWN_BONUS_CHANCE = 50
 RAID_AMPLIFIER_DROP_RATE: int = 20
+PET_RECOMPUTE_BATCH_SIZE: int = 500
 
 AFFINITY_BLOOD = "Blood"
 AFFINITY_DARK = "Dark"
@@ -661,6 +664,53 @@ class PetBeastDefinition:
             return source._compute_parent_beast_name()
 
 
+class BeastPool:
+    """
+    Immutable hunt candidates bucketed by ascending rank. A draw picks a rank uniformly then a beast of that rank uniformly, so rare ranks are as likely
+    as crowded ones. Rank ranges are views sharing the same buckets.
+    """
+
+    def __init__(self, ranks: tuple[int, ...], buckets: tuple[tuple[BeastDefinition, ...], ...], start: int = 0, end: Optional[int] = None):
+        self._ranks: tuple[int, ...] = ranks
+        self._buckets: tuple[tuple[BeastDefinition, ...], ...] = buckets
+        self._start: int = start
+        self._end: int = len(ranks) if end is None else end
+
+    # ============================================= Special methods =============================================
+
+    def __contains__(self, beast: BeastDefinition) -> bool:
+        position: int = bisect_left(self._ranks, beast.rank, self._start, self._end)
+        return position < self._end and self._ranks[position] == beast.rank and beast in self._buckets[position]
+
+    def __len__(self) -> int:
+        return sum(len(self._buckets[position]) for position in range(self._start, self._end))
+
+    def __repr__(self) -> str:
+        return f"BeastPool {{ranks: {list(self._ranks[self._start:self._end])}, candidates: {len(self)}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ============================================== "Real" methods =============================================
+
+    def choose(self) -> BeastDefinition:
+        bucket: tuple[BeastDefinition, ...] = self._buckets[random.randrange(self._start, self._end)]
+        return bucket[random.randrange(len(bucket))]
+
+    def choose_many(self, count: int) -> list[BeastDefinition]:
+        return [self.choose() for _ in range(count)]
+
+    @staticmethod
+    def from_rank_dict(beasts_by_rank: dict[int, list[BeastDefinition]]) -> BeastPool:
+        ranks: list[int] = sorted(beasts_by_rank.keys())
+        return BeastPool(tuple(ranks), tuple(tuple(beasts_by_rank[rank]) for rank in ranks))
+
+    def rank_range(self, min_rank: int, max_rank: int) -> BeastPool:
+        start: int = bisect_left(self._ranks, min_rank, self._start, self._end)
+        end: int = bisect_right(self._ranks, max_rank, start, self._end)
+        return BeastPool(self._ranks, self._buckets, start, end)
+
+
 @singleton
 class Bestiary:
     def __init__(self):
@@ -668,6 +718,7 @@ class Bestiary:
         self._pet_definitions: dict[str, PetBeastDefinition] = {}
         self._max_rank: int = 0
         self._variants: dict[str, BeastVariant] = {}
+        self._hunt_pools: dict[tuple[frozenset[str], Optional[int]], BeastPool] = {}
 
     # ============================================= Special methods =============================================
 
@@ -851,6 +902,36 @@ class Bestiary:
 
         return normal, mat_properties, pet_by_parent_and_rarity
 
+    @staticmethod
+    def _advance_pet(definition: PetBeastDefinition, cultivation: BeastCultivationStage, exp: int) -> tuple[BeastCultivationStage, int, int, bool]:
+        """
+        Find the stage a pet reaches with the specified exp accumulated in its current stage, in O(log stages) whatever the number of breakthroughs.
+
+        :param definition:  the pet definition, its next evolution stage caps the pet growth
+        :param cultivation: the current stage of the pet
+        :param exp:         the exp accumulated in the current stage, at least its breakthrough exp
+
+        :return: the reached stage, the exp left in that stage, the number of breakthroughs and whether the pet got capped by its evolution stage
+        """
+        table: CultivationStageTable = get_beast_stage_table(cultivation.rarity)
+        position: int = table.position(cultivation.major, cultivation.minor)
+        total_exp: int = table.total_experience(position) + exp
+
+        cap: BeastCultivationStage = definition.next_evolution.required_stage
+        cap_position: int = table.position(cap.major, cap.minor)
+        if position <= cap_position and total_exp >= table.total_experience(cap_position + 1):
+            reached: BeastCultivationStage = cultivation.advance_by(cap_position - position)
+            return reached, reached.breakthrough_experience - 1, cap_position - position, True
+
+        reached_position: int = table.position_for(total_exp)
+        reached: BeastCultivationStage = cultivation.advance_by(reached_position - position)
+        remaining_exp: int = total_exp - table.total_experience(reached_position)
+        if remaining_exp >= reached.breakthrough_experience:
+            # Maxed out, the exp of the extra breakthroughs is lost
+            remaining_exp %= reached.breakthrough_experience
+
+        return reached, remaining_exp, reached_position - position, False
+
     def _finalize_load(self, definitions: dict[str, BeastDefinition], pet_definitions: dict[str, PetBeastDefinition], max_rank: int) -> None:
         hatch_origins: dict[str, str] = self._load_pet_origins(ItemCompendium())
         for pet in pet_definitions.values():
@@ -859,46 +940,35 @@ class Bestiary:
         self._beasts: dict[str, BeastDefinition] = definitions
         self._pet_definitions: dict[str, PetBeastDefinition] = pet_definitions
         self._max_rank: int = max_rank
+        self._hunt_pools = {}
 
     # ============================================== "Real" methods =============================================
-    async def add_pet_experience(self, user_id: int, amount: int, pet_info: Optional[tuple[PetBeastDefinition, float, BeastCultivationStage, int]] = None):
+    async def add_pet_experience(self, user_id: int, amount: int, pet_info: Optional[tuple[PetBeastDefinition, float, BeastCultivationStage, int, int]] = None):
         if not pet_info:
-            data = await Pet.get_or_none(user_id=user_id, main=1).values_list("pet_id", "growth_rate", "p_major", "p_minor", "p_exp")
+            data = await Pet.get_or_none(user_id=user_id, main=1).values_list("pet_id", "growth_rate", "p_major", "p_minor", "p_exp", "p_cp")
             if not data:
                 _log(user_id, f"Could not locate main pet to award {amount:,} exp to", "WARN")
                 return
 
-            pet_name, growth_rate, pet_major, pet_minor, exp = data
+            pet_name, growth_rate, pet_major, pet_minor, exp, inherited_cp = data
             definition: PetBeastDefinition = self.get_pet_definition(pet_name)
             cultivation: BeastCultivationStage = BeastCultivationStage(pet_major, pet_minor, definition.rarity)
         else:
-            definition, growth_rate, cultivation, exp = pet_info
+            definition, growth_rate, cultivation, exp, inherited_cp = pet_info
 
         content = f"Your pet have gained {amount:,} exp."
         _log(user_id, f"Rank {definition.rank} {cultivation.name} gained {amount:,} EXP", "DEBUG")
 
         remaining_exp: int = exp + amount
         if remaining_exp >= cultivation.breakthrough_experience:
-            evolution: PetBeastEvolution = definition.next_evolution
-
-            count = 0
             content += f"\n\n{EXCLAMATION} Your pet's exp has reached its limit!"
 
-            while remaining_exp >= cultivation.breakthrough_experience:
-                remaining_exp -= cultivation.breakthrough_experience
-                if cultivation.major == evolution.required_stage.major and cultivation.minor == evolution.required_stage.minor:
-                    if definition.can_evolve:
-                        content += f"\n\n{EXCLAMATION} Your pet has reached its maximum potential for its current evolution! \nPlease evolve your pet to continue growing."
-                    else:
-                        content += f"\n\n{EXCLAMATION} Your pet has reached its maximum potential!"
-
-                    remaining_exp = cultivation.breakthrough_experience - 1
-                    break
-
-                next_stage: Optional[BeastCultivationStage] = cultivation.next_stage
-                if next_stage is not None:
-                    count += 1
-                    cultivation = next_stage
+            cultivation, remaining_exp, count, capped = self._advance_pet(definition, cultivation, remaining_exp)
+            if capped:
+                if definition.can_evolve:
+                    content += f"\n\n{EXCLAMATION} Your pet has reached its maximum potential for its current evolution! \nPlease evolve your pet to continue growing."
+                else:
+                    content += f"\n\n{EXCLAMATION} Your pet has reached its maximum potential!"
 
             if count == 1:
                 content += f"\n{PLUS} Your pet has broken through to **`{cultivation.name}`**"
@@ -910,9 +980,40 @@ class Bestiary:
         if remaining_exp < 0:
             remaining_exp = 0
 
-        await Pet.filter(user_id=user_id, pet_id=definition.name, main=1).update(p_exp=remaining_exp, p_major=cultivation.major, p_minor=cultivation.minor)
+        combat_power: int = definition.combat_power(cultivation, growth_rate, inherited_cp)
+        await Pet.filter(user_id=user_id, pet_id=definition.name, main=1).update(p_exp=remaining_exp, p_major=cultivation.major, p_minor=cultivation.minor, combat_power=combat_power)
+        Leaderboards().update_pet(user_id, combat_power)
         return content
 
+    async def add_pet_experience_batch(self, user_id: int, amounts: list[int]):
+        # Applies the exp of a whole session (e.g. a multi hunt) with a single read and write, the outcome only depends on the total so it's the same as
+        # applying each amount separately
+        if len(amounts) == 0:
+            return None
+
+        _log(user_id, f"Applying {len(amounts):,} pet exp gains at once", "DEBUG")
+        return await self.add_pet_experience(user_id, sum(amounts))
+
+    async def recompute_pet_combat_power(self) -> tuple[int, int]:
+        # Refresh the persisted CP of every pet in a single pass, needed whenever the pet definitions or the CP formula change
+        pets: list[Pet] = await Pet.all().only("id", "pet_id", "growth_rate", "p_cp", "p_major", "p_minor", "combat_power")
+        outdated: list[Pet] = []
+        for pet in pets:
+            definition: Optional[PetBeastDefinition] = self._pet_definitions.get(pet.pet_id)
+            if definition is None:
+                continue
+
+            combat_power: int = definition.combat_power(BeastCultivationStage(pet.p_major, pet.p_minor, definition.rarity), pet.growth_rate, pet.p_cp)
+            if combat_power != pet.combat_power:
+                pet.combat_power = combat_power
+                outdated.append(pet)
+
+        if len(outdated) > 0:
+            await Pet.bulk_update(outdated, fields=["combat_power"], batch_size=PET_RECOMPUTE_BATCH_SIZE)
+
+        _log("system", f"Recomputed the combat power of {len(pets):,} pets, {len(outdated):,} were outdated")
+        return len(pets), len(outdated)
+
     def choose_random(self,
                       rank: Optional[int] = None,
                       rank__gt: Optional[int] = None,
@@ -1056,6 +1157,31 @@ class Bestiary:
     def get_pet_definition(self, name: str) -> Optional[PetBeastDefinition]:
         return self._pet_definitions.get(name, None)
 
+    def hunt_pool(self, affinities: list[str], max_rank: Optional[int] = None) -> BeastPool:
+        """
+        Retrieve the hunt candidates having any of the specified affinities, built once per affinity set and rank cap until the next load.
+
+        :param affinities: the affinities of the hunt region
+        :param max_rank:   the highest rank that can be encountered, None for no limit
+
+        :return: the pool to draw the hunted beasts from
+        """
+        key: tuple[frozenset[str], Optional[int]] = (frozenset(affinities), max_rank)
+        pool: Optional[BeastPool] = self._hunt_pools.get(key)
+        if pool is None:
+            beasts_by_rank: dict[int, list[BeastDefinition]] = {}
+            for beast in self.list(True):
+                if max_rank is None or beast.rank <= max_rank:
+                    # Beasts matching several of the affinities are listed once per affinity, making them more likely within their rank
+                    matches: int = len(key[0] & beast.affinities)
+                    if matches > 0:
+                        beasts_by_rank.setdefault(beast.rank, []).extend([beast] * matches)
+
+            pool = BeastPool.from_rank_dict(beasts_by_rank)
+            self._hunt_pools[key] = pool
+
+        return pool
+
     def list(self, sort: bool = False) -> list[BeastDefinition]:
         beast_list: list[BeastDefinition] = [beast for beast in self._beasts.values()]
         if sort:
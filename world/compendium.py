@@ -9,7 +9,7 @@ import disnake
 
 from utils.CommandUtils import MAX_CHOICE_ITEMS
 from utils.Database import AllItems
-from utils.EconomyUtils import currency_dict_to_str
+from utils.EconomyUtils import ShopCatalog, currency_dict_to_str
 from utils.InventoryUtils import ITEM_TYPE_CAULDRON, ITEM_TYPE_RING, ITEM_TYPE_MONSTER_CORE, ITEM_TYPE_MONSTER_PART, ITEM_TYPE_ORIGIN_QI, ITEM_TYPE_WEAPON, ITEM_TYPE_BEAST_FLAME, ITEM_TYPE_MISCELLANEOUS, ITEM_TYPE_EGG, \
     ITEM_TYPE_FIGHT_TECHNIQUE_MANUAL, ITEM_TYPE_HEAVENLY_FLAME, ITEM_TYPE_HERB, ITEM_TYPE_PILL, ITEM_TYPE_QI_FLAME, ITEM_TYPE_QI_METHOD_MANUAL, ITEM_TYPE_VALUABLE, convert_id, ITEM_TYPE_CHEST, ITEM_TYPE_MAP_FRAGMENT
 from utils.LoggingUtils import log_event
@@ -1110,6 +1110,7 @@ class ItemCompendium:
         self._items: dict[str, ItemDefinition] = definitions
         self._item_types: set[str] = {item.type for item in definitions.values()}
         self._max_tier: int = max_tier
+        ShopCatalog().rebuild(definitions.values())
 
     # ============================================== "Real" methods =============================================
 
@@ -1506,6 +1507,8 @@ class ItemCompendium:
             await AllItems.filter(id=item_id).delete()
             deleted_count += 1
 
+        # Keep the shop in line with what was just written
+        ShopCatalog().rebuild(self._items.values())
         return created_count, updated_count, deleted_count
 
     @staticmethod
@@ -1,3 +1,5 @@
+import asyncio
+from datetime import timedelta
 from typing import Optional, Union
 
 import disnake
@@ -13,6 +15,8 @@ from world.config import ServerConfig
 
 _SHORT_NAME: str = "continent"
 
+ORIGIN_QI_CHECKPOINT_INTERVAL: timedelta = timedelta(minutes=1)
+
 
 class ContinentNotLoadedException(Exception):
     def __init__(self):
@@ -25,6 +29,8 @@ class Continent:
         self._bot: Optional[commands.Bot] = None
         self._config: Optional[ServerConfig] = None
         self._origin_qi_counter: int = 0
+        self._origin_qi_checkpoint: int = 0  # Last value written to GuildOptions
+        self._origin_qi_lock: asyncio.Lock = asyncio.Lock()
 
     async def load(self, bot: commands.Bot):
         self._bot: commands.Bot = bot
@@ -42,7 +48,9 @@ class Continent:
             await GuildOptions.create(name="qi_counter", value=1)
             qi_counter = 1
 
-        self._origin_qi_counter: int = int(qi_counter)
+        async with self._origin_qi_lock:
+            self._origin_qi_counter = int(qi_counter)
+            self._origin_qi_checkpoint = self._origin_qi_counter
 
     # ================================================ Properties ===============================================
 
@@ -56,6 +64,11 @@ class Continent:
         self._ensure_loaded()
         return self.channel(self._config.auction_channel_id)
 
+    @property
+    def auction_channel_id(self) -> int:
+        self._ensure_loaded()
+        return self._config.auction_channel_id
+
     @property
     def beast_raid_channel(self) -> Optional[Union[GuildChannel, Thread, PrivateChannel]]:
         self._ensure_loaded()
@@ -146,8 +159,21 @@ class Continent:
         else:
             return None
 
+    async def checkpoint_origin_qi_counter(self) -> None:
+        # The counter only lives in memory between checkpoints, this is the only place writing it to GuildOptions
+        async with self._origin_qi_lock:
+            counter: int = self._origin_qi_counter
+            if counter == self._origin_qi_checkpoint:
+                return
+
+            await GuildOptions.filter(name="qi_counter").update(value=counter)
+            self._origin_qi_checkpoint = counter
+
+        _log("system", f"Checkpointed the origin qi counter at {counter}", "DEBUG")
+
     async def increase_origin_qi_counter(self, increment: int = 1) -> None:
-        await self.set_origin_qi_counter(self._origin_qi_counter + increment)
+        async with self._origin_qi_lock:
+            self._origin_qi_counter += increment
 
     async def member(self, user_id: int) -> Optional[Member]:
         self._ensure_loaded()
@@ -164,10 +190,16 @@ class Continent:
         except disnake.NotFound as e:
             _log("system", f"Could not locate the message {message_id} on channel {channel_id}: {e}", "WARN")
 
+    async def reset_origin_qi_counter(self) -> int:
+        # Returns the counter value before the reset
+        async with self._origin_qi_lock:
+            previous_counter: int = self._origin_qi_counter
+            self._origin_qi_counter = 0
+            return previous_counter
+
     async def set_origin_qi_counter(self, new_counter: int) -> None:
-        if self._origin_qi_counter != new_counter:
+        async with self._origin_qi_lock:
             self._origin_qi_counter = new_counter
-            await GuildOptions.filter(name="qi_counter").update(value=self._origin_qi_counter)
 
     async def whisper(self, user_id: int, embed: Embed) -> Optional[Message]:
         self._ensure_loaded()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import math
+from bisect import bisect_right
 from typing import Optional, TypeVar
 
 MAJOR_CULTIVATION_REALMS: list[str] = ["Fight Disciple", "Fight Practitioner", "Fight Master", "Fight Grandmaster", "Fight Spirit", "Fight King", "Fight Emperor", "Fight Ancestor", "Fight Venerate", "Peak Fight Venerate", "Half Saint",
@@ -369,32 +370,6 @@ C = TypeVar("C", bound="CultivationStage")
 B = TypeVar("B", bound="BeastCultivationStage")
 
 
-def _find_next_stage(entries: list[list[tuple[str, int, int, float]]], major: int, minor: int) -> Optional[tuple[int, int]]:
-    minor_entries: list[tuple[str, int, int, float]] = entries[major]
-    if minor == len(minor_entries) - 1:
-        # Last entry of a major
-        if major == len(entries) - 1:
-            # Last major too, so maxed out
-            return None
-        else:
-            return major + 1, 0
-    else:
-        return major, minor + 1
-
-
-def _find_previous_stage(entries: list[list[tuple[str, int, int, float]]], major: int, minor: int) -> Optional[tuple[int, int]]:
-    if minor == 0:
-        # First entry of a major
-        if major == 0:
-            # First major too, so already at lowest stage
-            return None
-        else:
-            minor_entries: list[tuple[str, int, int, float]] = entries[major - 1]
-            return major - 1, len(minor_entries) - 1
-    else:
-        return major, minor - 1
-
-
 def _get_cultivation_entry(entries: list[list[tuple[str, int, int, float]]], major: int, minor: int) -> tuple[str, int, int, float]:
     if major < 0:
         raise ValueError(f"Major must be positive, found {major}")
@@ -445,14 +420,86 @@ def get_player_max_energy(major: int, minor: int) -> int:
     return _get_player_cultivation_entry(major, minor)[2]
 
 
+# =======================================================================================================================
+# =============================================== CultivationStageTable =================================================
+# =======================================================================================================================
+class CultivationStageTable:
+    """
+    Every stage of a cultivation system flattened in progression order along with the total experience required to reach each of them from the
+    first stage, so that stage distances and experience queries are answered by indexing or bisecting instead of walking the stages.
+    """
+
+    def __init__(self, entries: list[list[tuple[str, int, int, float]]], exp_factor: Optional[float] = None):
+        self._keys: list[tuple[int, int]] = []
+        self._major_bounds: list[tuple[int, int]] = []
+        self._total_experience: list[int] = [0]  # One more value than stages, the last one being the experience needed to complete the last stage
+        for major, minor_entries in enumerate(entries):
+            self._major_bounds.append((len(self._keys), len(self._keys) + len(minor_entries) - 1))
+            for minor, entry in enumerate(minor_entries):
+                breakthrough_experience: int = entry[1] if exp_factor is None else int(entry[1] * exp_factor)
+                self._keys.append((major, minor))
+                self._total_experience.append(self._total_experience[-1] + breakthrough_experience)
+
+        self._positions: dict[tuple[int, int], int] = {key: position for position, key in enumerate(self._keys)}
+
+    # ============================================= Special methods =============================================
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"CultivationStageTable {{stages: {len(self._keys)}, total experience: {self._total_experience[-1]:,}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ============================================== "Real" methods =============================================
+
+    def key_at(self, position: int) -> tuple[int, int]:
+        return self._keys[position]
+
+    def major_bounds(self, major: int) -> tuple[int, int]:
+        # First and last position of the stages of the major
+        return self._major_bounds[major]
+
+    def position(self, major: int, minor: int) -> int:
+        return self._positions[(major, minor)]
+
+    def position_for(self, total_experience: int) -> int:
+        # Last stage whose required total experience is reached, experience beyond the end of the table stays in the last stage
+        return min(max(bisect_right(self._total_experience, total_experience) - 1, 0), len(self._keys) - 1)
+
+    def total_experience(self, position: int) -> int:
+        return self._total_experience[position]
+
+
+PLAYER_STAGE_TABLE: CultivationStageTable = CultivationStageTable(PLAYER_CULTIVATION_TABLE)
+
+_BEAST_STAGE_TABLES: dict[Optional[float], CultivationStageTable] = {}
+_PLAYER_STAGES: dict[tuple[int, int], PlayerCultivationStage] = {}
+_BEAST_STAGES: dict[tuple[int, int, str], BeastCultivationStage] = {}
+
+
+def get_beast_stage_table(rarity: str) -> CultivationStageTable:
+    exp_factor: Optional[float] = BEAST_EXPERIENCE_RARITY_INCREASE.get(rarity)
+    table: Optional[CultivationStageTable] = _BEAST_STAGE_TABLES.get(exp_factor)
+    if table is None:
+        table = CultivationStageTable(BASE_BEAST_CULTIVATION_TABLE, exp_factor)
+        _BEAST_STAGE_TABLES[exp_factor] = table
+
+    return table
+
+
 # =======================================================================================================================
 # =============================================== CultivationStage ======================================================
 # =======================================================================================================================
 class CultivationStage:
-    def __init__(self, major: int, minor: int, entry: Optional[tuple[str, int, int, float]] = None, exp_factor: Optional[float] = None):
+    def __init__(self, major: int, minor: int, entry: Optional[tuple[str, int, int, float]] = None, exp_factor: Optional[float] = None, table: Optional[CultivationStageTable] = None):
         super().__init__()
         self._major: int = major
         self._minor: int = minor
+        self._table: Optional[CultivationStageTable] = table
+        self._position: int = table.position(major, minor) if table is not None else -1
 
         if entry is None:
             self._name: str = get_beast_cultivation_title(major, minor)
@@ -521,30 +568,31 @@ class CultivationStage:
 
     @property
     def next_stage(self) -> Optional[CultivationStage]:
-        return None
+        if self._table is None or self._position == len(self._table) - 1:
+            return None
+
+        return self._stage_at(self._position + 1)
 
     @property
     def previous_stage(self) -> Optional[CultivationStage]:
-        return None
+        if self._table is None or self._position == 0:
+            return None
+
+        return self._stage_at(self._position - 1)
+
+    @property
+    def required_total_experience(self) -> int:
+        # Experience needed to reach this stage from the first one
+        return self._table.total_experience(self._position) if self._table is not None else 0
 
     # ================================================ "Real" methods ===============================================
 
     def advance_by(self, count: int, maintain_major: bool = False) -> CultivationStage:
-        if count == 0:
+        if count == 0 or self._table is None:
             return self
-        elif count > 0:
-            next_stage: Optional[CultivationStage] = self.next_stage
-            if next_stage is None or maintain_major and next_stage.major != self.major:
-                return self
-
-            return next_stage.advance_by(count - 1)
-        else:
-            # count < 0
-            previous_stage: Optional[CultivationStage] = self.previous_stage
-            if previous_stage is None or maintain_major and previous_stage.major != self.major:
-                return self
 
-            return previous_stage.advance_by(count + 1)
+        first, last = self._table.major_bounds(self._major) if maintain_major else (0, len(self._table) - 1)
+        return self._stage_at(min(max(self._position + count, first), last))
 
     def required_exp_to_reach(self, stage: C, exp_in_stage: int = 0) -> int:
         """
@@ -569,55 +617,39 @@ class CultivationStage:
             If the specified target stage is unreachable from this stage. The result can be negative if this stage is more advanced than the specified one
         """
 
-        current_stage: CultivationStage = self
         if type(self) is not type(stage):
             raise ValueError(f"{self} is not the same cultivation system as {stage}")
 
-        if current_stage == stage:
-            return current_stage.breakthrough_experience - exp_in_stage - 1
-
-        # Normal mode
-        if current_stage < stage:
-            total_exp: int = self.breakthrough_experience - exp_in_stage
-            next_stage: Optional[CultivationStage] = self.next_stage
-            while next_stage is not None and next_stage != stage:
-                total_exp += next_stage.breakthrough_experience
-                current_stage = next_stage
-                next_stage = current_stage.next_stage
-
-            if next_stage is None:
-                # Shouldn't really happen
-                raise ValueError(f"Cannot reach {stage} from {self}")
+        if self == stage:
+            return self.breakthrough_experience - exp_in_stage - 1
 
-            total_exp += next_stage.breakthrough_experience - 1
-        else:
-            # Reverse mode
-            total_exp: int = -exp_in_stage - 1
-            previous_stage: Optional[CultivationStage] = self.previous_stage
-            while previous_stage is not None and previous_stage != stage:
-                total_exp -= previous_stage.breakthrough_experience
-                current_stage = previous_stage
-                previous_stage = current_stage.previous_stage
+        if self._table is None:
+            raise ValueError(f"Cannot reach {stage} from {self}")
 
-            if previous_stage is None:
-                # Shouldn't really happen
-                raise ValueError(f"Cannot reach {stage} from {self}")
+        # Whatever the direction, it's the experience needed to complete the target stage minus what was already gathered up to now
+        return self._table.total_experience(stage._position + 1) - self._table.total_experience(self._position) - exp_in_stage - 1
 
-        return total_exp
+    def _stage_at(self, position: int) -> CultivationStage:
+        return self
 
 
 # =======================================================================================================================
 # =============================================== PlayerCultivationStage ================================================
 # =======================================================================================================================
 class PlayerCultivationStage(CultivationStage):
+    def __new__(cls, major: int, minor: int):
+        # Stages are immutable so each of them is only created once
+        stage: Optional[PlayerCultivationStage] = _PLAYER_STAGES.get((major, minor))
+        if stage is None:
+            stage = super().__new__(cls)
+            stage._setup(major, minor)
+            _PLAYER_STAGES[(major, minor)] = stage
+
+        return stage
+
     def __init__(self, major: int, minor: int):
-        entry: tuple[str, int, int, float] = _get_player_cultivation_entry(major, minor)
-        super().__init__(major, minor, entry)
-        self._previous_stage: Optional[PlayerCultivationStage] = None
-        self._next_stage: Optional[PlayerCultivationStage] = None
-        self._required_total_experience: Optional[int] = None
-        self._max_energy: int = entry[2]
-        self._combat_power: float = entry[3]
+        # Already set up by __new__
+        pass
 
     def __repr__(self) -> str:
         return f"PlayerCultivationStage {self._major}, {self._minor}"
@@ -647,59 +679,43 @@ class PlayerCultivationStage(CultivationStage):
     def maximum_energy(self) -> int:
         return self._max_energy
 
-    @property
-    def next_stage(self) -> Optional[PlayerCultivationStage]:
-        if self._next_stage is None:
-            next_stage: Optional[tuple[int, int]] = _find_next_stage(PLAYER_CULTIVATION_TABLE, self._major, self._minor)
-            if next_stage is not None:
-                self._next_stage = PlayerCultivationStage(next_stage[0], next_stage[1])
-                self._next_stage._previous_stage = self
-
-        return self._next_stage
-
-    @property
-    def previous_stage(self) -> Optional[PlayerCultivationStage]:
-        if self._previous_stage is None:
-            prev_stage: Optional[tuple[int, int]] = _find_previous_stage(PLAYER_CULTIVATION_TABLE, self._major, self._minor)
-            if prev_stage is not None:
-                self._previous_stage = PlayerCultivationStage(prev_stage[0], prev_stage[1])
-                self._previous_stage._next_stage = self
-
-        return self._previous_stage
+    @staticmethod
+    def from_total_experience(total_experience: int) -> tuple[PlayerCultivationStage, int]:
+        # Stage reached with the specified experience gathered since the first stage, along with the experience left in that stage
+        position: int = PLAYER_STAGE_TABLE.position_for(total_experience)
+        return PlayerCultivationStage(*PLAYER_STAGE_TABLE.key_at(position)), total_experience - PLAYER_STAGE_TABLE.total_experience(position)
 
-    @property
-    def required_total_experience(self) -> int:
-        if self._required_total_experience is None:
-            previous_stage: Optional[PlayerCultivationStage] = self.previous_stage
-            if previous_stage is None:
-                self._required_total_experience: int = 0
-            else:
-                self._required_total_experience: int = previous_stage.required_total_experience + previous_stage.breakthrough_experience
+    def _setup(self, major: int, minor: int):
+        entry: tuple[str, int, int, float] = _get_player_cultivation_entry(major, minor)
+        super().__init__(major, minor, entry, table=PLAYER_STAGE_TABLE)
+        self._max_energy: int = entry[2]
+        self._combat_power: float = entry[3]
 
-        return self._required_total_experience
+    def _stage_at(self, position: int) -> PlayerCultivationStage:
+        return PlayerCultivationStage(*PLAYER_STAGE_TABLE.key_at(position))
 
 
 # =======================================================================================================================
 # =============================================== BeastCultivationStage =================================================
 # =======================================================================================================================
 class BeastCultivationStage(CultivationStage):
+    def __new__(cls, major: int, minor: int, rarity: str = "abundant"):
+        # Stages are immutable so each of them is only created once per rarity
+        stage: Optional[BeastCultivationStage] = _BEAST_STAGES.get((major, minor, rarity))
+        if stage is None:
+            stage = super().__new__(cls)
+            stage._setup(major, minor, rarity)
+            _BEAST_STAGES[(major, minor, rarity)] = stage
+
+        return stage
+
     def __init__(self, major: int, minor: int, rarity: str = "abundant"):
-        super().__init__(major, minor, _get_beast_cultivation_entry(major, minor), BEAST_EXPERIENCE_RARITY_INCREASE[rarity] if rarity in BEAST_EXPERIENCE_RARITY_INCREASE else None)
-        self._rarity: str = rarity
+        # Already set up by __new__
+        pass
 
     def __repr__(self) -> str:
         return f"BeastCultivationStage {self._rarity}, {self._major}, {self._minor}"
 
-    @property
-    def next_stage(self) -> Optional[BeastCultivationStage]:
-        next_stage: Optional[tuple[int, int]] = _find_next_stage(BASE_BEAST_CULTIVATION_TABLE, self._major, self._minor)
-        return BeastCultivationStage(next_stage[0], next_stage[1], self._rarity) if next_stage is not None else None
-
-    @property
-    def previous_stage(self) -> Optional[BeastCultivationStage]:
-        prev_stage: Optional[tuple[int, int]] = _find_previous_stage(BASE_BEAST_CULTIVATION_TABLE, self._major, self._minor)
-        return BeastCultivationStage(prev_stage[0], prev_stage[1], self._rarity) if prev_stage is not None else None
-
     @property
     def rarity(self) -> str:
         return self._rarity
@@ -721,30 +737,32 @@ class BeastCultivationStage(CultivationStage):
 
         return current_cp
 
+    @staticmethod
+    def from_total_experience(total_experience: int, rarity: str = "abundant") -> tuple[BeastCultivationStage, int]:
+        # Stage reached with the specified experience gathered since the first stage, along with the experience left in that stage
+        table: CultivationStageTable = get_beast_stage_table(rarity)
+        position: int = table.position_for(total_experience)
+        return BeastCultivationStage(*table.key_at(position), rarity), total_experience - table.total_experience(position)
+
     @staticmethod
     def max(rarity: str) -> B:
         max_major: int = len(BASE_BEAST_CULTIVATION_TABLE) - 1
         max_minor: int = len(BASE_BEAST_CULTIVATION_TABLE[max_major]) - 1
         return BeastCultivationStage(max_major, max_minor, rarity)
 
+    def _setup(self, major: int, minor: int, rarity: str):
+        exp_factor: Optional[float] = BEAST_EXPERIENCE_RARITY_INCREASE[rarity] if rarity in BEAST_EXPERIENCE_RARITY_INCREASE else None
+        super().__init__(major, minor, _get_beast_cultivation_entry(major, minor), exp_factor, table=get_beast_stage_table(rarity))
+        self._rarity: str = rarity
 
-def generate_player_cultivation_stage_matrix() -> list[list[PlayerCultivationStage]]:
-    start: PlayerCultivationStage = PlayerCultivationStage(0, 0)
+    def _stage_at(self, position: int) -> BeastCultivationStage:
+        return BeastCultivationStage(*self._table.key_at(position), self._rarity)
 
-    current_major: int = -1
-    major_list: list[list[PlayerCultivationStage]] = []
 
-    # Create, chain and structure everything
-    current_stage: PlayerCultivationStage = start
-    while current_stage is not None:
-        if current_stage.major > current_major:
-            current_major: int = current_stage.major
-            minor_list: list[PlayerCultivationStage] = []
-            major_list.append(minor_list)
-        else:
-            minor_list: list[PlayerCultivationStage] = major_list[current_major]
-
-        minor_list.append(current_stage)
-        current_stage: Optional[PlayerCultivationStage] = current_stage.next_stage
+def generate_player_cultivation_stage_matrix() -> list[list[PlayerCultivationStage]]:
+    major_list: list[list[PlayerCultivationStage]] = []
+    for major in range(len(PLAYER_CULTIVATION_TABLE)):
+        first, last = PLAYER_STAGE_TABLE.major_bounds(major)
+        major_list.append([PlayerCultivationStage(*PLAYER_STAGE_TABLE.key_at(position)) for position in range(first, last + 1)])
 
     return major_list
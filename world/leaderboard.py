@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import random
+from collections import deque
+from typing import Callable, Generic, Optional, TypeVar, Union
+
+from utils.Database import Alchemy, Cultivation, Pet, Users
+from utils.LoggingUtils import log_event
+from utils.base import singleton
+
+_SHORT_NAME: str = "leaderboard"
+_MAX_LEVEL: int = 16
+_LEVEL_PROBABILITY: float = 0.25
+_CHANGE_LOG_SIZE: int = 512
+_UNBOUNDED: int = 2 ** 62
+
+BOARD_CULTIVATION: str = "cultivation"
+BOARD_ALCHEMY: str = "alchemy"
+BOARD_CRAFT: str = "craft"
+BOARD_PET: str = "pet"
+BOARD_BALANCE: str = "balance"
+ALL_BOARDS: list[str] = [BOARD_CULTIVATION, BOARD_ALCHEMY, BOARD_CRAFT, BOARD_PET, BOARD_BALANCE]
+
+S = TypeVar("S", bound=tuple)
+
+
+class _SkipNode:
+    __slots__ = ("key", "member", "score", "next", "width")
+
+    def __init__(self, key: Optional[tuple], member: Optional[int], score: Optional[tuple], level: int):
+        self.key: Optional[tuple] = key
+        self.member: Optional[int] = member
+        self.score: Optional[tuple] = score
+        self.next: list[Optional[_SkipNode]] = [None] * level
+        self.width: list[int] = [1] * level
+
+
+class RankedIndex(Generic[S]):
+    """
+    Indexable skip list ordering members by descending score tuple, ties being broken by ascending member id.
+    Rank lookups and updates are O(log n) and fetching a page of k entries is O(log n + k).
+    """
+
+    def __init__(self):
+        self._head: _SkipNode = _SkipNode(None, None, None, _MAX_LEVEL)
+        self._tail: _SkipNode = _SkipNode(None, None, None, 0)
+        self._head.next = [self._tail] * _MAX_LEVEL
+        self._keys: dict[int, tuple] = {}
+        self._version: int = 0
+        self._changes: deque[tuple[int, int, int]] = deque(maxlen=_CHANGE_LOG_SIZE)  # (version, first_position, last_position), 0-based and inclusive
+
+    # ============================================= Special methods =============================================
+
+    def __contains__(self, member: int) -> bool:
+        return member in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # ================================================ Properties ===============================================
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # ============================================== "Real" methods =============================================
+
+    def clear(self):
+        self._head.next = [self._tail] * _MAX_LEVEL
+        self._head.width = [1] * _MAX_LEVEL
+        self._keys.clear()
+        self._record_change(0, _UNBOUNDED)
+
+    def changed_since(self, version: int, start: int, end: int) -> bool:
+        # Whether any position in [start, end[ may have changed since the specified version
+        if version == self._version:
+            return False
+
+        if len(self._changes) == 0 or self._changes[0][0] > version + 1:
+            # The change log doesn't go back far enough, assume the worst
+            return True
+
+        for change_version, first_position, last_position in reversed(self._changes):
+            if change_version <= version:
+                break
+
+            if first_position < end and last_position >= start:
+                return True
+
+        return False
+
+    def count_at_least(self, score: tuple) -> int:
+        # Number of members whose score is greater or equal to the specified one, the score may be a prefix such as (major,)
+        bound: tuple = _negate(score)
+        size: int = len(bound)
+        node: _SkipNode = self._head
+        position: int = 0
+        for level in reversed(range(0, _MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.next[level].key[0][:size] <= bound:
+                position += node.width[level]
+                node = node.next[level]
+
+        return position
+
+    def page(self, start: int, count: int) -> list[tuple[int, S]]:
+        # Entries in [start, start + count[ as (member, score) tuples, start being 0-based
+        if start < 0 or start >= len(self._keys) or count <= 0:
+            return []
+
+        node: _SkipNode = self._node_at(start)
+        entries: list[tuple[int, S]] = []
+        while node is not self._tail and len(entries) < count:
+            entries.append((node.member, node.score))
+            node = node.next[0]
+
+        return entries
+
+    def rank(self, member: int) -> Optional[int]:
+        # 1-based rank of the member, None if the member is not indexed
+        key: Optional[tuple] = self._keys.get(member)
+        if key is None:
+            return None
+
+        node: _SkipNode = self._head
+        position: int = 0
+        for level in reversed(range(0, _MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+
+        return position
+
+    def remove(self, member: int) -> bool:
+        if member not in self._keys:
+            return False
+
+        position: int = self.rank(member) - 1
+        self._unlink(member)
+        self._record_change(position, len(self._keys))
+        return True
+
+    def score(self, member: int) -> Optional[S]:
+        key: Optional[tuple] = self._keys.get(member)
+        return None if key is None else _negate(key[0])
+
+    def touch(self, member: int):
+        # Marks the member position as changed even though its score didn't, e.g. when displayed details changed
+        if member in self._keys:
+            position: int = self.rank(member) - 1
+            self._record_change(position, position)
+
+    def update(self, member: int, score: S) -> bool:
+        # Returns True if the member position may have changed
+        key: tuple = (_negate(score), member)
+        if self._keys.get(member) == key:
+            return False
+
+        if member in self._keys:
+            old_position: int = self.rank(member) - 1
+            self._unlink(member)
+            self._link(member, score, key)
+            new_position: int = self.rank(member) - 1
+            self._record_change(min(old_position, new_position), max(old_position, new_position))
+        else:
+            self._link(member, score, key)
+            self._record_change(self.rank(member) - 1, len(self._keys) - 1)
+
+        return True
+
+    def _record_change(self, first_position: int, last_position: int):
+        self._version += 1
+        self._changes.append((self._version, first_position, last_position))
+
+    def _unlink(self, member: int):
+        key: tuple = self._keys.pop(member)
+        chain: list[_SkipNode] = [self._head] * _MAX_LEVEL
+        node: _SkipNode = self._head
+        for level in reversed(range(0, _MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target: _SkipNode = chain[0].next[0]
+        target_level: int = len(target.next)
+        for level in range(0, target_level):
+            previous: _SkipNode = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+
+        for level in range(target_level, _MAX_LEVEL):
+            chain[level].width[level] -= 1
+
+    def _link(self, member: int, score: S, key: tuple):
+        chain: list[_SkipNode] = [self._head] * _MAX_LEVEL
+        steps_at_level: list[int] = [0] * _MAX_LEVEL
+        node: _SkipNode = self._head
+        for level in reversed(range(0, _MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        new_level: int = _random_level()
+        new_node: _SkipNode = _SkipNode(key, member, score, new_level)
+        steps: int = 0
+        for level in range(0, new_level):
+            previous: _SkipNode = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+
+        for level in range(new_level, _MAX_LEVEL):
+            chain[level].width[level] += 1
+
+        self._keys[member] = key
+
+    def _node_at(self, index: int) -> _SkipNode:
+        node: _SkipNode = self._head
+        remaining: int = index + 1
+        for level in reversed(range(0, _MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        return node
+
+
+@singleton
+class Leaderboards:
+    def __init__(self):
+        self._boards: dict[str, RankedIndex] = {board: RankedIndex() for board in ALL_BOARDS}
+        self._gold: dict[int, int] = {}
+        self._escrow_provider: Optional[Callable[[int], int]] = None
+
+    # ============================================= Special methods =============================================
+
+    def __getitem__(self, board: str) -> RankedIndex:
+        return self._boards[board]
+
+    # ============================================== "Real" methods =============================================
+
+    async def load(self):
+        for index in self._boards.values():
+            index.clear()
+
+        self._gold.clear()
+
+        await self.load_cultivation()
+
+        alchemy_data = await Alchemy.filter(a_lvl__gt=0).values_list("user_id", "a_lvl", "a_exp")
+        for user_id, level, exp in alchemy_data:
+            self.update_alchemy(user_id, level, exp)
+
+        # Imported lazily so that importing the leaderboards, and the modules depending on them, never requires the crafting model
+        from utils.Database import Crafting
+        craft_data = await Crafting.all().values_list("user_id", "c_lvl", "c_exp")
+        for user_id, level, exp in craft_data:
+            self.update_craft(user_id, level, exp)
+
+        await self.load_pets()
+        await self.load_gold()
+
+        _log("system", f"Loaded leaderboards: {', '.join(f'{board}={len(index)}' for board, index in self._boards.items())}")
+
+    async def load_cultivation(self):
+        # Also used to re-index every player after a bulk update of the cultivation table
+        cultivation_data = await Cultivation.all().values_list("user_id", "major", "minor", "current_exp")
+        for user_id, major, minor, current_exp in cultivation_data:
+            self.update_cultivation(user_id, major, minor, current_exp)
+
+    async def load_gold(self, user_ids: Optional[list[int]] = None):
+        # Also used to re-index the players whose gold was changed by a bulk update, all of them by default
+        query = Users.all() if user_ids is None else Users.filter(user_id__in=user_ids)
+        gold_data = await query.values_list("user_id", "money")
+        for user_id, gold in gold_data:
+            self.update_gold(user_id, gold)
+
+    async def load_pets(self):
+        index: RankedIndex = self._boards[BOARD_PET]
+        index.clear()
+        pet_data = await Pet.filter(main=1).values_list("user_id", "combat_power")
+        for user_id, combat_power in pet_data:
+            self.update_pet(user_id, combat_power)
+
+    def is_top_ranked(self, board: str, user_id: int, top: int) -> bool:
+        rank: Optional[int] = self._boards[board].rank(user_id)
+        return rank is not None and rank <= top
+
+    def page(self, board: str, start: int, count: int) -> list[tuple[int, tuple]]:
+        return self._boards[board].page(start, count)
+
+    def rank(self, board: str, user_id: int) -> Optional[int]:
+        return self._boards[board].rank(user_id)
+
+    def size(self, board: str) -> int:
+        return len(self._boards[board])
+
+    def version(self, board: str) -> int:
+        return self._boards[board].version
+
+    def changed_since(self, board: str, version: int, start: int, end: int) -> bool:
+        return self._boards[board].changed_since(version, start, end)
+
+    def touch(self, board: str, user_id: int):
+        self._boards[board].touch(user_id)
+
+    def register_escrow_provider(self, provider: Callable[[int], int]):
+        self._escrow_provider = provider
+
+    def update_cultivation(self, user_id: int, major: int, minor: int, current_exp: int) -> bool:
+        return self._boards[BOARD_CULTIVATION].update(user_id, (int(major), int(minor), int(current_exp)))
+
+    def update_alchemy(self, user_id: int, level: int, exp: int) -> bool:
+        if level <= 0:
+            return self._boards[BOARD_ALCHEMY].remove(user_id)
+
+        return self._boards[BOARD_ALCHEMY].update(user_id, (int(level), int(exp)))
+
+    def update_craft(self, user_id: int, level: int, exp: int) -> bool:
+        return self._boards[BOARD_CRAFT].update(user_id, (int(level), int(exp)))
+
+    def update_gold(self, user_id: int, gold: int) -> bool:
+        self._gold[user_id] = int(gold)
+        return self.refresh_balance(user_id)
+
+    def refresh_balance(self, user_id: int) -> bool:
+        gold: int = self._gold.get(user_id, 0)
+        escrow: int = self._escrow_provider(user_id) if self._escrow_provider is not None else 0
+        return self._boards[BOARD_BALANCE].update(user_id, (gold + escrow,))
+
+    def update_pet(self, user_id: int, combat_power: int) -> bool:
+        return self._boards[BOARD_PET].update(user_id, (int(combat_power),))
+
+    def remove_pet(self, user_id: int) -> bool:
+        return self._boards[BOARD_PET].remove(user_id)
+
+    async def refresh_pet(self, user_id: int) -> bool:
+        # Re-index the user's main pet after it changed in a way other than through experience (hatch, evolution, main swap, reroll...)
+        combat_power: Optional[int] = await Pet.get_or_none(user_id=user_id, main=1).values_list("combat_power", flat=True)
+        if combat_power is None:
+            return self.remove_pet(user_id)
+
+        return self.update_pet(user_id, combat_power)
+
+
+# =================================== Bootstrap and util class-level functions ==================================
+
+
+def _negate(values: tuple) -> tuple:
+    return tuple(-value for value in values)
+
+
+def _random_level() -> int:
+    level: int = 1
+    while level < _MAX_LEVEL and random.random() < _LEVEL_PROBABILITY:
+        level += 1
+
+    return level
+
+
+def _log(user_id: Union[int, str], message: str, level: str = "INFO"):
+    log_event(user_id, _SHORT_NAME, message, level)
@@ -0,0 +1,238 @@
+import heapq
+from datetime import datetime
+from typing import Optional, Union
+
+from utils.Database import Market
+from utils.InventoryUtils import combine_id
+from utils.LoggingUtils import log_event
+from utils.base import singleton
+from world.leaderboard import RankedIndex
+
+_SHORT_NAME: str = "market_book"
+
+# Same values as the Market.order_by arguments they replace
+SORT_PRICE_HIGH: str = "-price"
+SORT_PRICE_LOW: str = "price"
+SORT_CREATED_NEW: str = "-created"
+SORT_CREATED_OLD: str = "created"
+
+SEARCH_ALL_TYPES: str = "all"
+
+_ALL_LISTINGS: tuple[str, Optional[str]] = ("all", None)
+_EXPIRY_HEAP_SLACK: int = 256
+
+
+class MarketListing:
+    def __init__(self, listing_id: int, user_id: int, item_id: str, unique_id: Optional[str], item_type: str, quantity: int, price: int, expiry: datetime, created: datetime):
+        self.id: int = listing_id
+        self.user_id: int = user_id
+        self.item_id: str = item_id
+        self.unique_id: Optional[str] = unique_id
+        self.item_type: str = item_type
+        self.quantity: int = quantity
+        self.price: int = price
+        self.expiry: datetime = expiry
+        self.created: datetime = created
+
+    def __repr__(self) -> str:
+        return f"MarketListing {{id: {self.id}, user_id: {self.user_id}, item: {self.quantity}x {self.full_id}, price: {self.price:,}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    @property
+    def full_id(self) -> str:
+        return combine_id(self.item_id, self.unique_id)
+
+
+class MarketSearch:
+    """Live view over one of the book indexes, listings are only materialized for the requested pages"""
+
+    def __init__(self, book: "MarketBook", price_index: RankedIndex, time_index: RankedIndex, sorting: str):
+        self._book: MarketBook = book
+        self._index: RankedIndex = price_index if sorting in (SORT_PRICE_HIGH, SORT_PRICE_LOW) else time_index
+        self._descending: bool = sorting in (SORT_PRICE_HIGH, SORT_CREATED_NEW)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def page_count(self, page_size: int) -> int:
+        return (len(self._index) + page_size - 1) // page_size
+
+    def slice(self, start: int, count: int) -> list[MarketListing]:
+        # O(log n + count), descending orders read the ascending index backward
+        if self._descending:
+            end: int = len(self._index) - start
+            first: int = max(0, end - count)
+            entries: list[tuple[int, tuple]] = list(reversed(self._index.page(first, end - first)))
+        else:
+            entries: list[tuple[int, tuple]] = self._index.page(start, count)
+
+        return [self._book[listing_id] for listing_id, _ in entries]
+
+    def page(self, page_index: int, page_size: int) -> list[MarketListing]:
+        return self.slice(page_index * page_size, page_size)
+
+
+@singleton
+class MarketBook:
+    """
+    In-memory copy of the market listings, indexed by item id, item type and owner. Each item id and item type has a (price, listing time) index
+    and a listing time index so that searches return any page in O(log n + k).
+    """
+
+    def __init__(self):
+        self._listings: dict[int, MarketListing] = {}
+        self._by_owners: dict[int, dict[int, MarketListing]] = {}
+        self._price_indexes: dict[tuple[str, Optional[str]], RankedIndex] = {}
+        self._time_indexes: dict[tuple[str, Optional[str]], RankedIndex] = {}
+        self._expiries: list[tuple[float, int]] = []  # Min-heap of (expiry timestamp, listing_id), entries of removed listings are skipped when they come up
+
+    # ============================================= Special methods =============================================
+
+    def __contains__(self, listing_id: int) -> bool:
+        return listing_id in self._listings
+
+    def __getitem__(self, listing_id: int) -> MarketListing:
+        return self._listings[listing_id]
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    def __repr__(self) -> str:
+        return f"MarketBook {{listings: {len(self._listings)}, sellers: {len(self._by_owners)}, item types: {len(self.item_types())}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ============================================== "Real" methods =============================================
+
+    def add(self, listing: MarketListing):
+        if listing.id in self._listings:
+            self.remove(listing.id)
+
+        self._listings[listing.id] = listing
+        self._by_owners.setdefault(listing.user_id, {})[listing.id] = listing
+
+        # Scores are sorted descending, so negated values keep the cheapest and oldest listings first
+        created: float = listing.created.timestamp()
+        for key in self._index_keys(listing):
+            self._price_indexes.setdefault(key, RankedIndex()).update(listing.id, (-listing.price, -created))
+            self._time_indexes.setdefault(key, RankedIndex()).update(listing.id, (-created,))
+
+        heapq.heappush(self._expiries, (listing.expiry.timestamp(), listing.id))
+        if len(self._expiries) > 2 * len(self._listings) + _EXPIRY_HEAP_SLACK:
+            # Too many entries of bought or removed listings, start over from the live listings
+            self._rebuild_expiries()
+
+    def cheapest(self, item_id: str, count: int) -> list[MarketListing]:
+        return self.search(item_id=item_id, sorting=SORT_PRICE_LOW).slice(0, count)
+
+    def count_by_owner(self, user_id: int) -> int:
+        return len(self._by_owners.get(user_id, {}))
+
+    def get(self, listing_id: int) -> Optional[MarketListing]:
+        return self._listings.get(listing_id)
+
+    def item_types(self) -> list[str]:
+        return sorted(value for kind, value in self._price_indexes.keys() if kind == "type")
+
+    async def load(self):
+        self._listings = {}
+        self._by_owners = {}
+        self._price_indexes = {}
+        self._time_indexes = {}
+        self._expiries = []
+
+        market_data = await Market.all().values_list("id", "user_id", "item_id", "unique_id", "item__type", "amount", "price", "expiry", "created")
+        for listing_id, user_id, item_id, unique_id, item_type, quantity, price, expiry, created in market_data:
+            self.add(MarketListing(listing_id, user_id, item_id, unique_id, item_type, quantity, price, expiry, created))
+
+        self._rebuild_expiries()
+        _log("system", f"Loaded {self}")
+
+    def next_expiry(self) -> Optional[datetime]:
+        while len(self._expiries) > 0:
+            due, listing_id = self._expiries[0]
+            listing: Optional[MarketListing] = self._listings.get(listing_id)
+            if listing is not None and listing.expiry.timestamp() == due:
+                return listing.expiry
+
+            heapq.heappop(self._expiries)
+
+        return None
+
+    def owned_by(self, user_id: int) -> list[MarketListing]:
+        # In listing order since listing ids are sequential
+        return sorted(self._by_owners.get(user_id, {}).values(), key=lambda listing: listing.id)
+
+    def pop_expired(self, now: datetime) -> list[MarketListing]:
+        # Removes and returns the listings expired at the specified time, in expiry order
+        limit: float = now.timestamp()
+        expired: list[MarketListing] = []
+        while len(self._expiries) > 0 and self._expiries[0][0] <= limit:
+            due, listing_id = heapq.heappop(self._expiries)
+            listing: Optional[MarketListing] = self._listings.get(listing_id)
+            if listing is not None and listing.expiry.timestamp() == due:
+                expired.append(self.remove(listing_id))
+
+        return expired
+
+    def remove(self, listing_id: int) -> Optional[MarketListing]:
+        listing: Optional[MarketListing] = self._listings.pop(listing_id, None)
+        if listing is None:
+            return None
+
+        owned: dict[int, MarketListing] = self._by_owners[listing.user_id]
+        owned.pop(listing_id)
+        if len(owned) == 0:
+            self._by_owners.pop(listing.user_id)
+
+        for key in self._index_keys(listing):
+            for indexes in (self._price_indexes, self._time_indexes):
+                index: RankedIndex = indexes[key]
+                index.remove(listing_id)
+                if len(index) == 0 and key != _ALL_LISTINGS:
+                    indexes.pop(key)
+
+        return listing
+
+    def remove_item(self, item_id: str) -> list[MarketListing]:
+        # Drops every listing of the item, e.g. when the item stops existing
+        index: Optional[RankedIndex] = self._time_indexes.get(("item", item_id))
+        if index is None:
+            return []
+
+        listing_ids: list[int] = [listing_id for listing_id, _ in index.page(0, len(index))]
+        return [self.remove(listing_id) for listing_id in listing_ids]
+
+    def search(self, item_type: Optional[str] = None, item_id: Optional[str] = None, sorting: str = SORT_CREATED_OLD) -> MarketSearch:
+        """
+        Search the listings, optionally restricted to an item id or an item type.
+
+        :param item_type: the item type to restrict the search to, None or SEARCH_ALL_TYPES for any type
+        :param item_id:   the item id to restrict the search to, takes precedence over item_type
+        :param sorting:   one of the SORT_* constants
+
+        :return: a lazy view over the matching listings
+        """
+        if item_id is not None:
+            key: tuple[str, Optional[str]] = ("item", item_id)
+        elif item_type is not None and item_type != SEARCH_ALL_TYPES:
+            key: tuple[str, Optional[str]] = ("type", item_type)
+        else:
+            key: tuple[str, Optional[str]] = _ALL_LISTINGS
+
+        return MarketSearch(self, self._price_indexes.get(key, RankedIndex()), self._time_indexes.get(key, RankedIndex()), sorting)
+
+    @staticmethod
+    def _index_keys(listing: MarketListing) -> list[tuple[str, Optional[str]]]:
+        return [_ALL_LISTINGS, ("item", listing.item_id), ("type", listing.item_type)]
+
+    def _rebuild_expiries(self):
+        self._expiries = [(listing.expiry.timestamp(), listing_id) for listing_id, listing in self._listings.items()]
+        heapq.heapify(self._expiries)
+
+
+def _log(user_id: Union[int, str], message: str):
+    log_event(user_id, _SHORT_NAME, message)
@@ -0,0 +1,175 @@
+import random
+from typing import Optional, Union
+
+from utils.Database import Users
+from utils.LoggingUtils import log_event
+from utils.ParamsUtils import ELO_SUB_RANKS, SUB_RANK_POINTS, MAX_EXCESS_POINTS
+from utils.base import singleton
+
+_SHORT_NAME: str = "matchmaking"
+
+MATCHMAKING_MIN_MAJOR: int = 1  # Fight Practitioner
+MATCHMAKING_SUB_RANK_RANGE: int = 1
+
+
+def sub_rank_index(rank_points: int) -> int:
+    # -1 for unranked players, then 0 for Low Huang, 1 for Middle Huang and so on
+    return (rank_points - 1) // SUB_RANK_POINTS
+
+
+def is_frozen(rank_points: int) -> bool:
+    # Players at the top of a High sub-rank would passively enter promos, so they can't be challenged until they start their promos themselves
+    index: int = sub_rank_index(rank_points)
+    return index >= 0 and (rank_points - 1) % SUB_RANK_POINTS == MAX_EXCESS_POINTS and index % len(ELO_SUB_RANKS) == len(ELO_SUB_RANKS) - 1
+
+
+class _Bucket:
+    # Unordered set supporting O(1) insertion, removal and access by position
+    def __init__(self):
+        self._members: list[int] = []
+        self._positions: dict[int, int] = {}
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._positions
+
+    def __getitem__(self, position: int) -> int:
+        return self._members[position]
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def add(self, user_id: int):
+        if user_id not in self._positions:
+            self._positions[user_id] = len(self._members)
+            self._members.append(user_id)
+
+    def position(self, user_id: int) -> int:
+        return self._positions[user_id]
+
+    def remove(self, user_id: int):
+        position: Optional[int] = self._positions.pop(user_id, None)
+        if position is None:
+            return
+
+        # Move the last member into the hole
+        last: int = self._members.pop()
+        if last != user_id:
+            self._members[position] = last
+            self._positions[last] = position
+
+
+@singleton
+class MatchmakingPool:
+    def __init__(self):
+        self._rank_points: dict[int, int] = {}
+        self._majors: dict[int, int] = {}
+        self._buckets: dict[int, _Bucket] = {}
+        self._player_buckets: dict[int, int] = {}
+
+    # ============================================= Special methods =============================================
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._player_buckets
+
+    def __len__(self) -> int:
+        return len(self._player_buckets)
+
+    def __repr__(self) -> str:
+        bucket_sizes: dict[int, int] = {index: len(bucket) for index, bucket in sorted(self._buckets.items())}
+        return f"MatchmakingPool {{eligible: {len(self._player_buckets)}, buckets: {bucket_sizes}}}"
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    # ============================================== "Real" methods =============================================
+
+    async def load(self):
+        self._rank_points = {}
+        self._majors = {}
+        self._buckets = {}
+        self._player_buckets = {}
+
+        player_data = await Users.all().values_list("cultivation__user_id", "cultivation__major", "pvp__rank_points")
+        for user_id, major, rank_points in player_data:
+            if user_id is not None and major is not None:
+                self._majors[user_id] = major
+                if rank_points is not None:
+                    self._rank_points[user_id] = rank_points
+
+                self._reindex(user_id)
+
+        _log("system", f"Loaded {self}")
+
+    def pick(self, user_id: int, rank_points: int) -> Optional[int]:
+        """
+        Pick a random eligible opponent within one sub-rank of the given rank points, every eligible opponent having the same chance to be picked.
+
+        :param user_id:     the player looking for an opponent, never picked
+        :param rank_points: the rank points of that player
+
+        :return: the picked opponent id or None if nobody is eligible
+        """
+        host_index: int = sub_rank_index(rank_points)
+        indexes: range = range(host_index - MATCHMAKING_SUB_RANK_RANGE, host_index + MATCHMAKING_SUB_RANK_RANGE + 1)
+        buckets: list[_Bucket] = [self._buckets[index] for index in indexes if index in self._buckets]
+
+        candidate_count: int = sum(len(bucket) for bucket in buckets)
+        if user_id in self._player_buckets and self._player_buckets[user_id] in indexes:
+            candidate_count -= 1
+
+        if candidate_count <= 0:
+            return None
+
+        position: int = random.randrange(candidate_count)
+        for bucket in buckets:
+            size: int = len(bucket)
+            if user_id in bucket:
+                # Skip over the host position without having to rebuild anything
+                size -= 1
+                if position < size:
+                    return bucket[position + 1 if position >= bucket.position(user_id) else position]
+            elif position < size:
+                return bucket[position]
+
+            position -= size
+
+        return None
+
+    def remove(self, user_id: int):
+        self._rank_points.pop(user_id, None)
+        self._majors.pop(user_id, None)
+        self._unindex(user_id)
+
+    def update_cultivation(self, user_id: int, major: int):
+        if self._majors.get(user_id) != major:
+            self._majors[user_id] = major
+            self._reindex(user_id)
+
+    def update_rank_points(self, user_id: int, rank_points: int):
+        if self._rank_points.get(user_id) != rank_points:
+            self._rank_points[user_id] = rank_points
+            self._reindex(user_id)
+
+    def _reindex(self, user_id: int):
+        self._unindex(user_id)
+        rank_points: Optional[int] = self._rank_points.get(user_id)
+        if rank_points is None or self._majors.get(user_id, 0) < MATCHMAKING_MIN_MAJOR or is_frozen(rank_points):
+            return
+
+        index: int = sub_rank_index(rank_points)
+        bucket: Optional[_Bucket] = self._buckets.get(index)
+        if bucket is None:
+            bucket = _Bucket()
+            self._buckets[index] = bucket
+
+        bucket.add(user_id)
+        self._player_buckets[user_id] = index
+
+    def _unindex(self, user_id: int):
+        index: Optional[int] = self._player_buckets.pop(user_id, None)
+        if index is not None:
+            self._buckets[index].remove(user_id)
+
+
+def _log(user_id: Union[int, str], message: str):
+    log_event(user_id, _SHORT_NAME, message)